@@ -0,0 +1,168 @@
+"""
+Admin dashboard statistics.
+
+compute_stats() reads each table once with conditional aggregation (one
+COUNT/SUM per figure, all in the same SELECT), so the dashboard costs six
+queries however many figures it shows. Rating figures come from the users'
+rating totals and the 7/30-day figures from the DailyMetrics rollup rather
+than scans of the raw tables.
+
+The result is kept as a snapshot in the shared cache. A snapshot younger than
+ADMIN_DASHBOARD_FRESH_SECONDS is served as is; an older one is still served
+while a single refresh job rebuilds it, so admins refreshing the page at the
+same time never each rescan the big tables. Only when there is no snapshot at
+all (or it is older than ADMIN_DASHBOARD_MAX_STALE_SECONDS) does the request
+compute it inline.
+"""
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Avg, Count, Q, Sum
+from django.utils import timezone
+
+from jobs.queue import enqueue
+from metrics.models import DailyMetrics
+from rides.models import Ride, Booking
+from .models import User, DriverProfile, Subscription
+
+SNAPSHOT_KEY = 'admin_dashboard:snapshot'
+REFRESH_LOCK_KEY = 'admin_dashboard:refreshing'
+
+# Rough monthly price of a paid subscription, used for subscription revenue
+SUBSCRIPTION_PRICE = 5000
+
+
+def compute_stats(today=None):
+    """
+    All dashboard figures, in the shape AdminDashboardStatsView returns.
+    Days are local dates, like the DailyMetrics rows they are read from.
+    """
+    today = today or timezone.localdate()
+    last_30_days = today - timedelta(days=30)
+    last_7_days = today - timedelta(days=7)
+    prev_30_days = last_30_days - timedelta(days=30)
+
+    users = User.objects.aggregate(
+        total=Count('id'),
+        drivers=Count('id', filter=Q(role='driver')),
+        passengers=Count('id', filter=Q(role='passenger')),
+        ratings=Sum('rating_count'),
+        rating_points=Sum('rating_sum'),
+    )
+    drivers = DriverProfile.objects.aggregate(
+        verified=Count('id', filter=Q(is_verified_by_admin=True)),
+        pending=Count('id', filter=Q(verification_status='pending')),
+    )
+    rides = Ride.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(status='active')),
+        completed=Count('id', filter=Q(status='completed')),
+    )
+
+    paid = Q(status__in=['confirmed', 'completed'])
+    bookings = Booking.objects.aggregate(
+        total=Count('id'),
+        confirmed=Count('id', filter=Q(status='confirmed')),
+        pending=Count('id', filter=Q(status='pending')),
+        last_30d=Count('id', filter=Q(created_at__gte=last_30_days)),
+        revenue=Sum('total_price', filter=paid),
+        avg_value=Avg('total_price', filter=paid),
+    )
+    # Windowed figures come from the daily rollup (at most 60 rows)
+    trends = DailyMetrics.objects.filter(date__gte=prev_30_days, date__lte=today).aggregate(
+        new_users_30d=Sum('new_users', filter=Q(date__gte=last_30_days)),
+        new_users_prev_30d=Sum('new_users', filter=Q(date__lt=last_30_days)),
+        rides_30d=Sum('rides_created', filter=Q(date__gte=last_30_days)),
+        revenue_30d=Sum('revenue', filter=Q(date__gte=last_30_days)),
+        revenue_7d=Sum('revenue', filter=Q(date__gte=last_7_days)),
+        revenue_today=Sum('revenue', filter=Q(date=today)),
+    )
+    subscriptions = Subscription.objects.aggregate(
+        active=Count('id', filter=Q(is_active=True, expiry_date__gte=today)),
+        trial=Count('id', filter=Q(is_active=True, is_trial=True)),
+        paid=Count('id', filter=Q(is_active=True, is_trial=False)),
+        expired=Count('id', filter=Q(expiry_date__lt=today)),
+    )
+
+    new_users_30d = trends['new_users_30d'] or 0
+    new_users_prev_30d = trends['new_users_prev_30d'] or 0
+    user_growth_rate = 0
+    if new_users_prev_30d > 0:
+        user_growth_rate = ((new_users_30d - new_users_prev_30d) / new_users_prev_30d) * 100
+
+    total_ratings = users['ratings'] or 0
+    avg_rating = (users['rating_points'] or 0) / total_ratings if total_ratings else 0.0
+    zero = Decimal('0.00')
+
+    return {
+        "users": {
+            "total": users['total'],
+            "drivers": users['drivers'],
+            "passengers": users['passengers'],
+            "new_last_30_days": new_users_30d,
+            "growth_rate": round(user_growth_rate, 2),
+        },
+        "drivers": {
+            "total": users['drivers'],
+            "verified": drivers['verified'],
+            "pending_verification": drivers['pending'],
+        },
+        "rides": {
+            "total": rides['total'],
+            "active": rides['active'],
+            "completed": rides['completed'],
+            "last_30_days": trends['rides_30d'] or 0,
+        },
+        "bookings": {
+            "total": bookings['total'],
+            "confirmed": bookings['confirmed'],
+            "pending": bookings['pending'],
+            "last_30_days": bookings['last_30d'],
+        },
+        "revenue": {
+            "total": str(bookings['revenue'] or zero),
+            "last_30_days": str(trends['revenue_30d'] or zero),
+            "last_7_days": str(trends['revenue_7d'] or zero),
+            "today": str(trends['revenue_today'] or zero),
+            "subscription_revenue": subscriptions['paid'] * SUBSCRIPTION_PRICE,
+            "average_booking_value": str(round(bookings['avg_value'] or zero, 2)),
+        },
+        "subscriptions": {
+            "active": subscriptions['active'],
+            "trial": subscriptions['trial'],
+            "paid": subscriptions['paid'],
+            "expired": subscriptions['expired'],
+        },
+        "ratings": {
+            "total": total_ratings,
+            "average": round(avg_rating, 2),
+        },
+    }
+
+
+def refresh_snapshot():
+    """Rebuild the snapshot now and return it"""
+    snapshot = {'built_at': time.time(), 'stats': compute_stats()}
+    cache.set(SNAPSHOT_KEY, snapshot, timeout=settings.ADMIN_DASHBOARD_MAX_STALE_SECONDS)
+    cache.delete(REFRESH_LOCK_KEY)
+    return snapshot
+
+
+def get_stats():
+    """
+    Dashboard figures and their age in seconds, from the snapshot when
+    possible. A stale snapshot schedules one background refresh.
+    """
+    snapshot = cache.get(SNAPSHOT_KEY)
+    if snapshot is None:
+        snapshot = refresh_snapshot()
+
+    age = time.time() - snapshot['built_at']
+    if age > settings.ADMIN_DASHBOARD_FRESH_SECONDS:
+        # Only the first request to see it stale schedules the rebuild
+        if cache.add(REFRESH_LOCK_KEY, 1, timeout=settings.ADMIN_DASHBOARD_REFRESH_TIMEOUT_SECONDS):
+            enqueue('accounts.refresh_dashboard_snapshot')
+    return snapshot['stats'], age
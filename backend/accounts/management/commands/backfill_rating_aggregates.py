@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from accounts.models import User
+from rides.models import Rating
+
+
+class Command(BaseCommand):
+    help = "Recompute users' rating totals and trust flags from their received ratings"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        received = Rating.objects.filter(reviewee=OuterRef('pk')).order_by().values('reviewee')
+        rating_sum = Coalesce(
+            Subquery(received.annotate(total=Sum('score')).values('total'), output_field=IntegerField()), 0
+        )
+        rating_count = Coalesce(
+            Subquery(received.annotate(total=Count('id')).values('total'), output_field=IntegerField()), 0
+        )
+
+        updated = 0
+        last_id = 0
+        while True:
+            ids = list(
+                User.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            updated += User.objects.filter(id__in=ids).update(
+                rating_sum=rating_sum,
+                rating_count=rating_count,
+                **User.trust_flags(rating_sum, rating_count),
+            )
+            last_id = ids[-1]
+
+        self.stdout.write(f"Recomputed rating totals for {updated} user(s)")
@@ -0,0 +1,136 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Avg, Sum
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from accounts import dashboard
+from accounts.models import User, DriverProfile, Subscription
+from metrics import rollup
+from rides.models import Ride, Booking, Rating
+
+
+def legacy_stats():
+    """The per-figure queries AdminDashboardStatsView used to run"""
+    today = date.today()
+    last_30_days = today - timedelta(days=30)
+    last_7_days = today - timedelta(days=7)
+    paid = ['confirmed', 'completed']
+
+    User.objects.count()
+    User.objects.filter(role="driver").count()
+    User.objects.filter(role="passenger").count()
+    User.objects.filter(date_joined__gte=last_30_days).count()
+    DriverProfile.objects.filter(is_verified_by_admin=True).count()
+    DriverProfile.objects.filter(verification_status='pending').count()
+    Ride.objects.count()
+    Ride.objects.filter(status="active").count()
+    Ride.objects.filter(status="completed").count()
+    Ride.objects.filter(created_at__gte=last_30_days).count()
+    Booking.objects.count()
+    Booking.objects.filter(status='confirmed').count()
+    Booking.objects.filter(status='pending').count()
+    Booking.objects.filter(created_at__gte=last_30_days).count()
+    Booking.objects.filter(status__in=paid).aggregate(total=Sum('total_price'))
+    Booking.objects.filter(status__in=paid, created_at__gte=last_30_days).aggregate(total=Sum('total_price'))
+    Booking.objects.filter(status__in=paid, created_at__gte=last_7_days).aggregate(total=Sum('total_price'))
+    Booking.objects.filter(status__in=paid, created_at__date=today).aggregate(total=Sum('total_price'))
+    Subscription.objects.filter(is_active=True, is_trial=False).count()
+    Booking.objects.filter(status__in=paid).aggregate(avg=Avg('total_price'))
+    Subscription.objects.filter(is_active=True, expiry_date__gte=today).count()
+    Subscription.objects.filter(is_trial=True, is_active=True).count()
+    Subscription.objects.filter(is_trial=False, is_active=True).count()
+    Subscription.objects.filter(expiry_date__lt=today).count()
+    Rating.objects.count()
+    Rating.objects.aggregate(avg=Avg('score'))
+    User.objects.filter(
+        date_joined__gte=last_30_days - timedelta(days=30), date_joined__lt=last_30_days
+    ).count()
+
+
+def seed(users, rides_per_driver, bookings_per_ride):
+    now = timezone.now()
+    today = timezone.localdate()
+    people = User.objects.bulk_create([
+        User(
+            email=f'bench{i}@example.com', username=f'bench{i}',
+            role='driver' if i % 5 == 0 else 'passenger',
+            date_joined=now - timedelta(days=random.randint(0, 90)),
+        )
+        for i in range(users)
+    ])
+    Subscription.objects.bulk_create([
+        Subscription(
+            user=user, plan_type=user.role, is_trial=random.random() < 0.5,
+            expiry_date=today + timedelta(days=random.randint(-30, 30)),
+        )
+        for user in people
+    ])
+    drivers = [user for user in people if user.role == 'driver']
+    passengers = [user for user in people if user.role == 'passenger']
+
+    rides = Ride.objects.bulk_create([
+        Ride(
+            driver=driver, start_location='Kigali', destination='Musanze',
+            departure_time=now + timedelta(days=1), price_per_seat=2000, available_seats=4,
+            status=random.choice(['active', 'completed', 'cancelled']),
+        )
+        for driver in drivers for _ in range(rides_per_driver)
+    ])
+    bookings = Booking.objects.bulk_create([
+        Booking(
+            ride=ride, passenger=random.choice(passengers), seats_booked=1,
+            total_price=Decimal('2000.00'),
+            status=random.choice(['pending', 'confirmed', 'completed', 'cancelled']),
+        )
+        for ride in rides for _ in range(bookings_per_ride)
+    ])
+    # bulk_create skips the incremental rollup, so fill it the way a backfill would
+    rollup.rebuild(rollup.day_of(now - timedelta(days=90)), rollup.day_of(now + timedelta(days=1)))
+    return len(people), len(rides), len(bookings)
+
+
+class Command(BaseCommand):
+    help = "Compare query count and latency of the admin dashboard stats, before and after"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument(
+            '--seed-users', type=int, default=0,
+            help="Add this many synthetic users (with rides and bookings) for the run; rolled back afterwards",
+        )
+        parser.add_argument('--rides-per-driver', type=int, default=20)
+        parser.add_argument('--bookings-per-ride', type=int, default=3)
+
+    def measure(self, label, func, iterations):
+        with CaptureQueriesContext(connection) as queries:
+            func()
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        elapsed_ms = (time.perf_counter() - start) / iterations * 1000
+        self.stdout.write(f"{label:<32} {len(queries):>8} {elapsed_ms:>12.2f}")
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        with transaction.atomic():
+            if options['seed_users']:
+                counts = seed(options['seed_users'], options['rides_per_driver'], options['bookings_per_ride'])
+                self.stdout.write("Seeded %d users, %d rides, %d bookings" % counts)
+
+            self.stdout.write(f"{'variant':<32} {'queries':>8} {'ms/request':>12}")
+            self.measure("before (per-figure queries)", legacy_stats, iterations)
+            self.measure("after (conditional aggregates)", dashboard.compute_stats, iterations)
+
+            cache.delete(dashboard.SNAPSHOT_KEY)
+            dashboard.refresh_snapshot()
+            self.measure("after (snapshot hit)", dashboard.get_stats, iterations)
+            cache.delete(dashboard.SNAPSHOT_KEY)
+
+            transaction.set_rollback(True)
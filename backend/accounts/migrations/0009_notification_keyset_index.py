@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_alter_user_role'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='accounts_no_user_id_e684d6_idx'),
+        ),
+    ]
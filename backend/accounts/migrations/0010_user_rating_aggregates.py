@@ -0,0 +1,42 @@
+# Generated by Django 4.2 on 2026-10-17 21:07
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    User = apps.get_model('accounts', 'User')
+    Rating = apps.get_model('rides', 'Rating')
+
+    received = Rating.objects.filter(reviewee=OuterRef('pk')).order_by().values('reviewee')
+    User.objects.update(
+        rating_sum=Coalesce(Subquery(
+            received.annotate(total=Sum('score')).values('total'), output_field=IntegerField()
+        ), 0),
+        rating_count=Coalesce(Subquery(
+            received.annotate(total=Count('id')).values('total'), output_field=IntegerField()
+        ), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0009_notification_keyset_index'),
+        ('rides', '0004_rating'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+    ]
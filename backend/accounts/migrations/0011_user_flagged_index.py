@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0010_user_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(condition=models.Q(('is_warned', True), ('is_restricted', True), _connector='OR'), fields=['-date_joined', '-id'], name='accounts_user_flagged_idx'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models import Case, F, Value, When
+from django.db.models.lookups import LessThan
 from django.conf import settings
 
 
@@ -19,31 +21,73 @@ class User(AbstractUser):
     email_verification_code = models.CharField(max_length=6, null=True, blank=True)
     code_created_at = models.DateTimeField(null=True, blank=True)
     fcm_token = models.CharField(max_length=255, blank=True, null=True)
+    # Running totals of received ratings, kept by add_rating()
+    rating_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+
+    # Trust thresholds on the average rating
+    RESTRICT_BELOW = 2
+    WARN_BELOW = 3
+    # Counted as blocked on the admin dashboard
+    BLOCKED_BELOW = 2.5
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'phone', 'role']
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Only flagged users are indexed (AdminFlaggedUsersView)
+            models.Index(
+                fields=['-date_joined', '-id'],
+                condition=models.Q(is_warned=True) | models.Q(is_restricted=True),
+                name='accounts_user_flagged_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.email
 
+    @classmethod
+    def blocked_q(cls):
+        """Users rated below BLOCKED_BELOW on average (none if unrated)"""
+        return models.Q(rating_sum__lt=F('rating_count') * cls.BLOCKED_BELOW)
+
     def average_rating(self):
-        ratings = self.received_ratings.all()
-        if ratings.exists():
-            return round(sum(r.score for r in ratings) / ratings.count(), 2)
+        if self.rating_count:
+            return round(self.rating_sum / self.rating_count, 2)
         return 0
 
+    @classmethod
+    def trust_flags(cls, rating_sum, rating_count):
+        """
+        is_warned / is_restricted as expressions over a rating sum and count,
+        for use in an UPDATE; average < threshold is sum < threshold * count
+        """
+        restricted = LessThan(rating_sum, cls.RESTRICT_BELOW * rating_count)
+        warned = LessThan(rating_sum, cls.WARN_BELOW * rating_count)
+        return {
+            'is_restricted': Case(When(restricted, then=Value(True)), default=Value(False)),
+            'is_warned': Case(When(warned, then=Value(True)), default=Value(False)),
+        }
+
     def evaluate_trust_status(self):
-        avg = self.average_rating()
-        if avg < 2.0 and self.received_ratings.exists():
-            self.is_restricted = True
-            self.is_warned = True
-        elif avg < 3.0 and self.received_ratings.exists():
-            self.is_warned = True
-            self.is_restricted = False
-        else:
-            self.is_warned = False
-            self.is_restricted = False
-        self.save()
+        self.is_restricted = self.rating_sum < self.RESTRICT_BELOW * self.rating_count
+        self.is_warned = self.rating_sum < self.WARN_BELOW * self.rating_count
+        self.save(update_fields=['is_warned', 'is_restricted'])
+
+    def add_rating(self, score):
+        """
+        Count a new rating and re-check trust status in one UPDATE, so
+        concurrent ratings can't lose increments or leave stale flags
+        """
+        new_sum = F('rating_sum') + score
+        new_count = F('rating_count') + 1
+        User.objects.filter(pk=self.pk).update(
+            rating_sum=new_sum,
+            rating_count=new_count,
+            **self.trust_flags(new_sum, new_count),
+        )
+        self.refresh_from_db(fields=['rating_sum', 'rating_count', 'is_warned', 'is_restricted'])
 
 
 class PassengerProfile(models.Model):
@@ -117,5 +161,10 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id']),
+        ]
+
     def __str__(self):
         return f"{self.user.email} - {self.title}"
\ No newline at end of file
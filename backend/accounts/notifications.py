@@ -1,6 +1,68 @@
-from firebase_admin import messaging
+import logging
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from jobs.queue import enqueue
 from .models import Notification
 
+logger = logging.getLogger(__name__)
+
+
+def notification_group(user_id):
+    """Channel layer group holding every open notification socket of a user"""
+    return f"notifications_{user_id}"
+
+
+def publish_notifications(notifications):
+    """
+    Push freshly created Notification rows to their users' sockets
+    (chat.consumers.NotificationConsumer) once the transaction commits.
+    """
+    from .serializers import NotificationSerializer
+
+    events = [
+        (notification_group(n.user_id), NotificationSerializer(n).data)
+        for n in notifications
+    ]
+    if not events:
+        return
+
+    def publish():
+        layer = get_channel_layer()
+        if layer is None:
+            return
+        for group, data in events:
+            try:
+                async_to_sync(layer.group_send)(group, {
+                    "type": "notification.created",
+                    "notification": data,
+                })
+            except Exception as e:
+                # Clients still see it on their next fetch
+                logger.warning(f"Realtime notification publish failed: {e}")
+
+    transaction.on_commit(publish)
+
+
+def create_notification(user, title, message):
+    """Save an in-app notification and deliver it to open sockets"""
+    notification = Notification.objects.create(user=user, title=title, message=message)
+    publish_notifications([notification])
+    return notification
+
+
+def create_notifications(rows):
+    """Bulk version of create_notification for (user, title, message) rows"""
+    notifications = Notification.objects.bulk_create([
+        Notification(user=user, title=title, message=message)
+        for user, title, message in rows
+    ])
+    publish_notifications(notifications)
+    return notifications
+
+
 def send_push_notification(user, title, body, data=None):
     """
     Send push notification to user
@@ -13,34 +75,44 @@ def send_push_notification(user, title, body, data=None):
     """
     
     # Always save to database
-    Notification.objects.create(
-        user=user,
-        title=title,
-        message=body
-    )
-    print(f"📧 Notification saved to DB for {user.email}: {title}")
+    create_notification(user, title, body)
+    logger.debug("Notification saved for %s: %s", user.email, title)
     
-    # Try to send push notification if user has FCM token
-    fcm_token = getattr(user, 'fcm_token', None)
-    
-    if not fcm_token:
-        print(f"⚠️  No FCM token for user {user.email} - notification saved to DB only")
+    # Delivery goes through the job queue so requests never wait on FCM
+    if not getattr(user, 'fcm_token', None):
+        logger.debug("No FCM token for %s; notification saved to DB only", user.email)
         return
-    
-    try:
-        # Create Firebase message
-        message = messaging.Message(
-            notification=messaging.Notification(
-                title=title,
-                body=body,
-            ),
-            data=data or {},
-            token=fcm_token,
-        )
-        
-        # Send notification
-        response = messaging.send(message)
-        print(f"✅ Push notification sent successfully: {response}")
-        
-    except Exception as e:
-        print(f"❌ Error sending push notification: {e}")
\ No newline at end of file
+
+    enqueue('accounts.deliver_push', user_id=user.id, title=title, body=body, data=data or {})
+
+
+def send_bulk_push_notification(notices):
+    """
+    Notify many users at once (ride-wide events).
+
+    Args:
+        notices: iterable of (user, title, body, data) tuples
+
+    Writes every Notification row with a single bulk_create and queues one
+    batch delivery job; see accounts.tasks.deliver_push_batch.
+    """
+    notices = list(notices)
+    if not notices:
+        return
+
+    create_notifications((user, title, body) for user, title, body, data in notices)
+
+    messages = [
+        {
+            'user_id': user.id,
+            'token': user.fcm_token,
+            'title': title,
+            'body': body,
+            'data': data or {},
+        }
+        for user, title, body, data in notices
+        if getattr(user, 'fcm_token', None)
+    ]
+    logger.info("%d notifications saved, %d queued for push", len(notices), len(messages))
+    if messages:
+        enqueue('accounts.deliver_push_batch', messages=messages)
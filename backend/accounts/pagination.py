@@ -0,0 +1,201 @@
+import base64
+import json
+
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Opaque-cursor (keyset) pagination over (ordering_field, id).
+
+    Each page is fetched with an indexed range condition on the last row of
+    the previous page instead of an OFFSET, so response time does not grow
+    with history. Pagination only kicks in when the client sends `cursor` or
+    `page_size`; older app versions that expect a plain list keep working,
+    but that list stops after API_UNPAGED_MAX_ITEMS rows, with the cursor
+    for the rest in the Link and X-Next-Cursor headers. New endpoints set
+    optional = False to always return pages.
+    """
+    ordering_field = 'created_at'
+    descending = True
+    # Return each page oldest-first even though pages walk backwards in time
+    # (chat history: newest page first, rendered chronologically).
+    chronological_pages = False
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+    optional = True
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.start(request)
+        self.value_field = queryset.model._meta.get_field(self.ordering_field)
+
+        queryset = queryset.order_by(*self.get_ordering())
+        position = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(self.after(position))
+
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = self.position_of(rows[-1]) if self.has_next else None
+
+        if self.chronological_pages:
+            rows.reverse()
+        return rows
+
+    def start(self, request):
+        params = request.query_params
+        self.request = request
+        self.unpaged = (
+            self.optional
+            and self.cursor_query_param not in params
+            and self.page_size_query_param not in params
+        )
+        self.page_size = settings.API_UNPAGED_MAX_ITEMS if self.unpaged else self.get_page_size(request)
+
+    def get_paginated_response(self, data):
+        if self.unpaged:
+            headers = {}
+            if self.next_position is not None:
+                headers['Link'] = f'<{self.get_next_link()}>; rel="next"'
+                headers['X-Next-Cursor'] = self.encode_cursor(self.next_position)
+            return Response(data, headers=headers)
+        return Response({
+            'next': self.get_next_link(),
+            'next_cursor': self.encode_cursor(self.next_position),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.API_PAGE_SIZE
+        return max(1, min(page_size, settings.API_MAX_PAGE_SIZE))
+
+    def get_ordering(self):
+        prefix = '-' if self.descending else ''
+        return (f'{prefix}{self.ordering_field}', f'{prefix}id')
+
+    def after(self, position):
+        """Rows strictly past the (value, id) position in page order"""
+        value, pk = position
+        op = 'lt' if self.descending else 'gt'
+        return (
+            Q(**{f'{self.ordering_field}__{op}': value})
+            | Q(**{self.ordering_field: value, f'id__{op}': pk})
+        )
+
+    def position_of(self, row):
+        return getattr(row, self.ordering_field), row.pk
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def encode_cursor(self, position):
+        if position is None:
+            return None
+        value, pk = position
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        raw = json.dumps([value, pk], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            value, pk = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            if isinstance(self.value_field, models.DateTimeField):
+                value = parse_datetime(value)
+                if value is None:
+                    raise ValueError
+            return value, int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+
+class CreatedAtPagination(KeysetPagination):
+    """Newest first on (created_at, id)"""
+    ordering_field = 'created_at'
+    descending = True
+
+
+class UpdatedAtPagination(KeysetPagination):
+    """Most recently active first on (updated_at, id)"""
+    ordering_field = 'updated_at'
+    descending = True
+
+
+class DepartureTimePagination(KeysetPagination):
+    """Soonest departure first on (departure_time, id)"""
+    ordering_field = 'departure_time'
+    descending = False
+
+
+class MessageHistoryPagination(KeysetPagination):
+    """Newest page first, each page in chronological order"""
+    ordering_field = 'created_at'
+    descending = True
+    chronological_pages = True
+
+
+class DateJoinedPagination(KeysetPagination):
+    """Newest accounts first on (date_joined, id), always paginated"""
+    ordering_field = 'date_joined'
+    descending = True
+    optional = False
+
+
+class SortedListPagination(KeysetPagination):
+    """
+    The same cursor contract over rows already sorted in Python, for
+    orderings the database can't index (e.g. distance from a point).
+    `sort_key(row)` is a tuple of numbers ending in the row id, increasing
+    in page order; the cursor is the key of the last row sent.
+    """
+
+    def paginate_list(self, rows, request, sort_key):
+        self.start(request)
+        position = self.decode_cursor(request)
+        if position is not None:
+            rows = [row for row in rows if sort_key(row) > position]
+
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = sort_key(rows[-1]) if self.has_next else None
+        return rows
+
+    def encode_cursor(self, position):
+        if position is None:
+            return None
+        raw = json.dumps(list(position), separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            position = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+            if not isinstance(position, list) or not all(
+                isinstance(value, (int, float)) and not isinstance(value, bool) for value in position
+            ):
+                raise ValueError
+            return tuple(position)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
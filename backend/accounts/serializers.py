@@ -4,6 +4,7 @@ from .models import PassengerProfile, DriverProfile
 from datetime import date, timedelta
 from .models import Subscription
 from .models import Notification  # <-- ADD THIS LINE
+from metrics import rollup
 
 
 User = get_user_model()
@@ -21,6 +22,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         user = User(**validated_data)
         user.set_password(password)
         user.save()
+        rollup.user_joined(user)
 
         # Auto create profile
         if user.role == 'passenger':
@@ -68,3 +70,14 @@ class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
         model = Notification
         fields = "__all__"
+
+
+class FlaggedUserSerializer(serializers.ModelSerializer):
+    average_rating = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = User
+        fields = [
+            'id', 'username', 'email', 'phone', 'role',
+            'rating_count', 'average_rating', 'is_warned', 'is_restricted', 'date_joined',
+        ]
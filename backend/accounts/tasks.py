@@ -0,0 +1,110 @@
+import logging
+
+from django.db.models import Q
+from firebase_admin import exceptions, messaging
+
+from jobs.queue import PartialFailure, task
+from . import dashboard
+from .email_service import send_verification_email, send_welcome_email
+from .models import User
+
+logger = logging.getLogger(__name__)
+
+# FCM accepts at most 500 messages per batch request
+FCM_BATCH_SIZE = 500
+
+# Errors that mean the token itself is dead, as opposed to a transient failure
+INVALID_TOKEN_ERRORS = (
+    messaging.UnregisteredError,
+    messaging.SenderIdMismatchError,
+    exceptions.InvalidArgumentError,
+)
+
+
+@task('accounts.deliver_push')
+def deliver_push(user_id, title, body, data=None):
+    """Send a push notification over FCM; raising lets the worker retry"""
+    user = User.objects.filter(id=user_id).only('id', 'fcm_token').first()
+    if user is None or not user.fcm_token:
+        return
+
+    message = messaging.Message(
+        notification=messaging.Notification(title=title, body=body),
+        data=data or {},
+        token=user.fcm_token,
+    )
+    try:
+        messaging.send(message)
+    except INVALID_TOKEN_ERRORS:
+        # The app was uninstalled or the token rotated; retrying won't help
+        User.objects.filter(id=user_id, fcm_token=user.fcm_token).update(fcm_token=None)
+
+
+def send_push_batch(messages):
+    """
+    Send queued push messages with FCM batch sends.
+
+    Returns a per-recipient report: {user_id: 'sent' | 'invalid_token' |
+    'failed'}, plus the list of messages that failed transiently.
+    """
+    report = {}
+    failed = []
+
+    for start in range(0, len(messages), FCM_BATCH_SIZE):
+        chunk = messages[start:start + FCM_BATCH_SIZE]
+        batch = messaging.send_each([
+            messaging.Message(
+                notification=messaging.Notification(title=m['title'], body=m['body']),
+                data=m['data'],
+                token=m['token'],
+            )
+            for m in chunk
+        ])
+        for m, response in zip(chunk, batch.responses):
+            if response.success:
+                report[m['user_id']] = 'sent'
+            elif isinstance(response.exception, INVALID_TOKEN_ERRORS):
+                report[m['user_id']] = 'invalid_token'
+            else:
+                report[m['user_id']] = 'failed'
+                failed.append(m)
+
+    return report, failed
+
+
+@task('accounts.deliver_push_batch')
+def deliver_push_batch(messages):
+    report, failed = send_push_batch(messages)
+
+    # One UPDATE for every dead token; only clear it if it wasn't rotated
+    # since the message was queued
+    dead = [m for m in messages if report.get(m['user_id']) == 'invalid_token']
+    if dead:
+        stale = Q()
+        for m in dead:
+            stale |= Q(id=m['user_id'], fcm_token=m['token'])
+        User.objects.filter(stale).update(fcm_token=None)
+
+    sent = sum(1 for outcome in report.values() if outcome == 'sent')
+    logger.info("Push batch: %d sent, %d invalid tokens, %d failed", sent, len(dead), len(failed))
+
+    if failed:
+        # Retry only the recipients that didn't get it
+        raise PartialFailure(f"{len(failed)} push messages failed", {'messages': failed})
+
+
+@task('accounts.send_welcome_email')
+def welcome_email(email, username, role):
+    if not send_welcome_email(email, username, role):
+        raise RuntimeError(f"Welcome email to {email} failed")
+
+
+@task('accounts.send_verification_email')
+def verification_email(email, username, code):
+    if not send_verification_email(email, username, code):
+        raise RuntimeError(f"Verification email to {email} failed")
+
+
+@task('accounts.refresh_dashboard_snapshot')
+def refresh_dashboard_snapshot():
+    dashboard.refresh_snapshot()
@@ -1,3 +1,236 @@
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from firebase_admin import exceptions, messaging
+from rest_framework.test import APIClient
+
+from jobs.models import Job
+from jobs.queue import PartialFailure, get_task, run_job
+from rides.models import Ride, Booking, Rating
+from . import dashboard
+from .models import Notification, User
+from .notifications import send_bulk_push_notification
+from .tasks import send_push_batch
+
+
+def make_user(email, role='passenger', **fields):
+    return User.objects.create_user(
+        email=email, username=email.split('@')[0], password='pass1234', role=role, **fields
+    )
+
+
+class RatingAggregateTests(TestCase):
+    def setUp(self):
+        self.driver = make_user('driver@example.com', 'driver')
+
+    def flags(self):
+        return (self.driver.is_warned, self.driver.is_restricted)
+
+    def test_add_rating_keeps_totals_and_flags(self):
+        self.driver.add_rating(5)
+        self.driver.add_rating(1)
+        self.assertEqual((self.driver.rating_sum, self.driver.rating_count), (6, 2))
+        # An average of exactly WARN_BELOW is not warned
+        self.assertEqual(self.flags(), (False, False))
+
+        self.driver.add_rating(1)
+        self.assertEqual(self.driver.average_rating(), 2.33)
+        self.assertEqual(self.flags(), (True, False))
+
+        self.driver.add_rating(1)
+        self.assertEqual(self.flags(), (True, False))
+        self.driver.add_rating(1)
+        self.assertEqual((self.driver.rating_sum, self.driver.rating_count), (9, 5))
+        self.assertEqual(self.flags(), (True, True))
+
+        self.driver.refresh_from_db()
+        self.assertEqual(self.flags(), (True, True))
+
+    def test_unrated_user_is_not_flagged(self):
+        self.driver.evaluate_trust_status()
+        self.assertEqual(self.flags(), (False, False))
+        self.assertEqual(self.driver.average_rating(), 0)
+
+    def test_backfill_repairs_drifted_totals(self):
+        ride = Ride.objects.create(
+            driver=self.driver,
+            start_location='Kigali',
+            destination='Musanze',
+            departure_time=timezone.now() + timedelta(days=1),
+            price_per_seat=2000,
+            available_seats=3,
+        )
+        for i, score in enumerate((1, 2)):
+            passenger = make_user(f'passenger{i}@example.com')
+            booking = Booking.objects.create(
+                ride=ride, passenger=passenger, seats_booked=1, total_price=2000,
+            )
+            Rating.objects.create(booking=booking, reviewer=passenger, reviewee=self.driver, score=score)
+        unrated = make_user('unrated@example.com', rating_sum=4, rating_count=1, is_warned=True)
+        User.objects.filter(id=self.driver.id).update(rating_sum=50, rating_count=10)
+
+        call_command('backfill_rating_aggregates', batch_size=1, stdout=StringIO())
+
+        self.driver.refresh_from_db()
+        self.assertEqual((self.driver.rating_sum, self.driver.rating_count), (3, 2))
+        self.assertEqual(self.flags(), (True, True))
+        unrated.refresh_from_db()
+        self.assertEqual(
+            (unrated.rating_sum, unrated.rating_count, unrated.is_warned, unrated.is_restricted),
+            (0, 0, False, False),
+        )
+
+
+class AdminUserListTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('admin@example.com', is_staff=True))
+
+    def test_blocked_count_uses_the_average_threshold(self):
+        make_user('low@example.com', rating_sum=12, rating_count=5)   # 2.4
+        make_user('edge@example.com', rating_sum=5, rating_count=2)   # 2.5
+        make_user('fine@example.com', rating_sum=20, rating_count=5)
+
+        self.assertEqual(User.objects.filter(User.blocked_q()).count(), 1)
+        users = self.client.get('/api/accounts/admin/dashboard/').data['users']
+        self.assertEqual(users['blocked_users_count'], 1)
+
+    def test_flagged_users_are_paged_newest_first(self):
+        joined = timezone.now()
+        flagged = []
+        for i in range(5):
+            user = make_user(
+                f'flagged{i}@example.com', is_warned=True, is_restricted=i % 2 == 0,
+                date_joined=joined - timedelta(days=i // 2),
+            )
+            flagged.append(user)
+        make_user('clean@example.com')
+
+        seen, cursor = [], None
+        while True:
+            params = {'page_size': 2}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.client.get('/api/accounts/admin/flagged-users/', params).data
+            self.assertLessEqual(len(data['results']), 2)
+            seen += [row['id'] for row in data['results']]
+            cursor = data['next_cursor']
+            if cursor is None:
+                break
+
+        newest_first = sorted(flagged, key=lambda user: (user.date_joined, user.id), reverse=True)
+        self.assertEqual(seen, [user.id for user in newest_first])
+
+        restricted = self.client.get('/api/accounts/admin/flagged-users/', {'status': 'restricted'}).data
+        self.assertEqual(
+            {row['id'] for row in restricted['results']},
+            {user.id for user in flagged if user.is_restricted},
+        )
+
+
+@override_settings(JOBS_RUN_EAGERLY=False, ADMIN_DASHBOARD_FRESH_SECONDS=60)
+class DashboardSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        make_user('first@example.com')
+
+    def age_snapshot(self, seconds):
+        snapshot = cache.get(dashboard.SNAPSHOT_KEY)
+        snapshot['built_at'] -= seconds
+        cache.set(dashboard.SNAPSHOT_KEY, snapshot)
+
+    def test_stale_snapshot_is_served_while_one_refresh_runs(self):
+        stats, age = dashboard.get_stats()
+        self.assertEqual(stats['users']['total'], 1)
+        self.assertLess(age, 1)
+
+        make_user('second@example.com')
+        self.assertEqual(dashboard.get_stats()[0]['users']['total'], 1)
+        self.assertFalse(Job.objects.exists())
+
+        self.age_snapshot(120)
+        for _ in range(3):
+            stats, age = dashboard.get_stats()
+            self.assertEqual(stats['users']['total'], 1)
+            self.assertGreater(age, 60)
+        job = Job.objects.get()
+        self.assertEqual(job.task, 'accounts.refresh_dashboard_snapshot')
+
+        self.assertTrue(run_job(job))
+        stats, age = dashboard.get_stats()
+        self.assertEqual(stats['users']['total'], 2)
+        self.assertLess(age, 1)
+
+        # The lock is released with the refresh, so the next stale read schedules again
+        self.age_snapshot(120)
+        dashboard.get_stats()
+        self.assertEqual(Job.objects.count(), 1)
+
+    def test_missing_snapshot_is_computed_inline(self):
+        self.assertEqual(dashboard.get_stats()[0]['users']['total'], 1)
+        self.assertIsNotNone(cache.get(dashboard.SNAPSHOT_KEY))
+        self.assertFalse(Job.objects.exists())
+
+
+def mixed_batch():
+    """FCM's answer to three messages: sent, dead token, transient failure"""
+    return messaging.BatchResponse([
+        messaging.SendResponse({'name': 'sent-0'}, None),
+        messaging.SendResponse(None, messaging.UnregisteredError('gone')),
+        messaging.SendResponse(None, exceptions.UnavailableError('try later')),
+    ])
+
+
+@override_settings(JOBS_RUN_EAGERLY=False)
+class BulkPushTests(TestCase):
+    def setUp(self):
+        self.users = [
+            make_user(f'user{i}@example.com', fcm_token=f'token-{i}' if i < 3 else None)
+            for i in range(4)
+        ]
+
+    @mock.patch('accounts.tasks.messaging.send_each')
+    def test_one_bulk_insert_and_a_report_per_recipient(self, send_each):
+        notices = [(user, 'Ride cancelled', 'Sorry', {'ride_id': '1'}) for user in self.users]
+        with mock.patch.object(
+            Notification.objects, 'bulk_create', wraps=Notification.objects.bulk_create
+        ) as bulk_create:
+            send_bulk_push_notification(notices)
+        bulk_create.assert_called_once()
+        self.assertEqual(Notification.objects.count(), 4)
+
+        job = Job.objects.get()
+        messages = job.payload['messages']
+        self.assertEqual([m['user_id'] for m in messages], [user.id for user in self.users[:3]])
+
+        send_each.return_value = mixed_batch()
+        with self.assertRaises(PartialFailure) as failure:
+            get_task('accounts.deliver_push_batch')(**job.payload)
+
+        send_each.assert_called_once()
+        self.assertEqual(failure.exception.payload, {'messages': [messages[2]]})
+        tokens = dict(User.objects.filter(id__in=[u.id for u in self.users]).values_list('id', 'fcm_token'))
+        self.assertEqual(
+            [tokens[user.id] for user in self.users], ['token-0', None, 'token-2', None]
+        )
+
+    @mock.patch('accounts.tasks.messaging.send_each')
+    def test_report_names_each_recipient(self, send_each):
+        messages = [
+            {'user_id': user.id, 'token': user.fcm_token, 'title': 't', 'body': 'b', 'data': {}}
+            for user in self.users[:3]
+        ]
+        send_each.return_value = mixed_batch()
+
+        report, failed = send_push_batch(messages)
+        self.assertEqual(report, {
+            self.users[0].id: 'sent',
+            self.users[1].id: 'invalid_token',
+            self.users[2].id: 'failed',
+        })
+        self.assertEqual(failed, [messages[2]])
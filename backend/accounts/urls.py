@@ -3,6 +3,7 @@ from .views import (
     RegisterView,
     UserNotificationsView,
     AdminDashboardView,
+    AdminFlaggedUsersView,
     SubscriptionView,
     CreateSubscriptionView,
     ProcessPaymentView,
@@ -50,6 +51,7 @@ urlpatterns = [
 
     # Admin
     path('admin/dashboard/', AdminDashboardView.as_view(), name='admin_dashboard'),
+    path('admin/flagged-users/', AdminFlaggedUsersView.as_view(), name='admin_flagged_users'),
     path('admin/verify-driver/<int:driver_id>/', AdminVerifyDriverView.as_view(), name='admin_verify_driver'),
     path('admin/pending-drivers/', AdminGetPendingDriversView.as_view(), name='admin_pending_drivers'),
     path('admin/dashboard/stats/', AdminDashboardStatsView.as_view(), name='admin_dashboard_stats'),
@@ -4,7 +4,7 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
-from .serializers import RegisterSerializer, NotificationSerializer
+from .serializers import RegisterSerializer, NotificationSerializer, FlaggedUserSerializer
 from .models import Notification
 from django.db.models import Sum
 from rest_framework.permissions import IsAdminUser
@@ -22,11 +22,15 @@ from datetime import datetime
 from .models import DriverProfile
 from rides.models import Ride, Booking, Rating
 from django.db.models import Sum, Count, Q, Avg
-from django.db.models.functions import TruncDate, TruncMonth
+from django.db.models.functions import TruncMonth
 from datetime import datetime, timedelta
 from decimal import Decimal
 from rest_framework.decorators import api_view, permission_classes
-from .email_service import send_verification_email, send_welcome_email
+from jobs.queue import enqueue
+from .pagination import CreatedAtPagination, DateJoinedPagination
+from metrics import rollup
+from metrics.models import DailyMetrics, DriverStats, DriverDailyStats
+from . import dashboard
 
 User = get_user_model()
 import logging
@@ -142,11 +146,8 @@ class RegisterView(generics.CreateAPIView):
             is_trial=True,
         )
 
-        # ✅ Fix: don't let email failure block registration
-        try:
-            send_welcome_email(user.email, user.username, user.role)
-        except Exception as e:
-            logger.warning(f"Welcome email failed (non-critical): {e}")
+        # Sent by the job worker so registration never waits on the mail API
+        enqueue('accounts.send_welcome_email', email=user.email, username=user.username, role=user.role)
 
         refresh = RefreshToken.for_user(user)
         return Response({
@@ -161,6 +162,13 @@ class UserNotificationsView(APIView):
 
     def get(self, request):
         notifications = Notification.objects.filter(user=request.user).order_by("-created_at")
+
+        paginator = CreatedAtPagination()
+        page = paginator.paginate_queryset(notifications, request, view=self)
+        if page is not None:
+            serializer = NotificationSerializer(page, many=True)
+            return paginator.get_paginated_response(serializer.data)
+
         serializer = NotificationSerializer(notifications, many=True)
         return Response(serializer.data)
 
@@ -169,9 +177,12 @@ class AdminDashboardView(APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        total_users = User.objects.count()
-        total_drivers = User.objects.filter(role="driver").count()
-        total_passengers = User.objects.filter(role="passenger").count()
+        users = User.objects.aggregate(
+            total=Count('id'),
+            drivers=Count('id', filter=Q(role="driver")),
+            passengers=Count('id', filter=Q(role="passenger")),
+            blocked=Count('id', filter=User.blocked_q()),
+        )
         total_rides = Ride.objects.count()
         active_rides = Ride.objects.filter(status="active").count()
         completed_rides = Ride.objects.filter(status="completed").count()
@@ -180,17 +191,12 @@ class AdminDashboardView(APIView):
             status="completed"
         ).aggregate(total=Sum("total_price"))["total"] or 0
 
-        blocked_users = [
-            user.id for user in User.objects.all()
-            if user.average_rating() < 2.5 and user.received_ratings.exists()
-        ]
-
         return Response({
             "users": {
-                "total": total_users,
-                "drivers": total_drivers,
-                "passengers": total_passengers,
-                "blocked_users_count": len(blocked_users)
+                "total": users['total'],
+                "drivers": users['drivers'],
+                "passengers": users['passengers'],
+                "blocked_users_count": users['blocked']
             },
             "rides": {
                 "total": total_rides,
@@ -206,6 +212,21 @@ class AdminDashboardView(APIView):
         })
 
 
+class AdminFlaggedUsersView(generics.ListAPIView):
+    """Warned or restricted users, newest first; ?status=warned|restricted"""
+    permission_classes = [IsAdminUser]
+    serializer_class = FlaggedUserSerializer
+    pagination_class = DateJoinedPagination
+
+    def get_queryset(self):
+        flag = self.request.query_params.get('status')
+        if flag == 'restricted':
+            return User.objects.filter(is_restricted=True)
+        if flag == 'warned':
+            return User.objects.filter(is_warned=True, is_restricted=False)
+        return User.objects.filter(Q(is_warned=True) | Q(is_restricted=True))
+
+
 class SubscriptionView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -298,15 +319,14 @@ class SendEmailVerificationView(APIView):
         user.email_verification_token = token
         user.save()
         verification_link = f"{settings.SITE_URL}/api/accounts/verify-email/{token}"
-        success = send_verification_email(user.email, user.username, verification_link)
-        if success:
-            return Response(
-                {"message": "Verification email sent successfully"},
-                status=status.HTTP_200_OK
-            )
+        enqueue(
+            'accounts.send_verification_email',
+            email=user.email, username=user.username, code=verification_link,
+        )
+        # Only queued here; the job retries and dead-letters a failed send
         return Response(
-            {"error": "Failed to send email"},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            {"message": "Verification email queued"},
+            status=status.HTTP_202_ACCEPTED
         )
 
 
@@ -532,118 +552,8 @@ class AdminDashboardStatsView(APIView):
     permission_classes = [IsAdminUser]
 
     def get(self, request):
-        today = date.today()
-        last_30_days = today - timedelta(days=30)
-        last_7_days = today - timedelta(days=7)
-
-        total_users = User.objects.count()
-        total_drivers = User.objects.filter(role="driver").count()
-        total_passengers = User.objects.filter(role="passenger").count()
-        new_users_30d = User.objects.filter(date_joined__gte=last_30_days).count()
-        verified_drivers = DriverProfile.objects.filter(is_verified_by_admin=True).count()
-        pending_verification = DriverProfile.objects.filter(verification_status='pending').count()
-
-        total_rides = Ride.objects.count()
-        active_rides = Ride.objects.filter(status="active").count()
-        completed_rides = Ride.objects.filter(status="completed").count()
-        rides_30d = Ride.objects.filter(created_at__gte=last_30_days).count()
-
-        total_bookings = Booking.objects.count()
-        confirmed_bookings = Booking.objects.filter(status='confirmed').count()
-        pending_bookings = Booking.objects.filter(status='pending').count()
-        bookings_30d = Booking.objects.filter(created_at__gte=last_30_days).count()
-
-        total_revenue = Booking.objects.filter(
-            status__in=['confirmed', 'completed']
-        ).aggregate(total=Sum('total_price'))['total'] or Decimal('0.00')
-
-        revenue_30d = Booking.objects.filter(
-            status__in=['confirmed', 'completed'],
-            created_at__gte=last_30_days
-        ).aggregate(total=Sum('total_price'))['total'] or Decimal('0.00')
-
-        revenue_7d = Booking.objects.filter(
-            status__in=['confirmed', 'completed'],
-            created_at__gte=last_7_days
-        ).aggregate(total=Sum('total_price'))['total'] or Decimal('0.00')
-
-        revenue_today = Booking.objects.filter(
-            status__in=['confirmed', 'completed'],
-            created_at__date=today
-        ).aggregate(total=Sum('total_price'))['total'] or Decimal('0.00')
-
-        subscription_revenue = Subscription.objects.filter(
-            is_active=True, is_trial=False
-        ).count() * 5000
-
-        avg_booking_value = Booking.objects.filter(
-            status__in=['confirmed', 'completed']
-        ).aggregate(avg=Avg('total_price'))['avg'] or Decimal('0.00')
-
-        active_subscriptions = Subscription.objects.filter(
-            is_active=True, expiry_date__gte=today
-        ).count()
-        trial_subscriptions = Subscription.objects.filter(is_trial=True, is_active=True).count()
-        paid_subscriptions = Subscription.objects.filter(is_trial=False, is_active=True).count()
-        expired_subscriptions = Subscription.objects.filter(expiry_date__lt=today).count()
-
-        total_ratings = Rating.objects.count()
-        avg_driver_rating = Rating.objects.aggregate(avg=Avg('score'))['avg'] or 0.0
-
-        prev_30_days = last_30_days - timedelta(days=30)
-        prev_users = User.objects.filter(
-            date_joined__gte=prev_30_days,
-            date_joined__lt=last_30_days
-        ).count()
-
-        user_growth_rate = 0
-        if prev_users > 0:
-            user_growth_rate = ((new_users_30d - prev_users) / prev_users) * 100
-
-        return Response({
-            "users": {
-                "total": total_users,
-                "drivers": total_drivers,
-                "passengers": total_passengers,
-                "new_last_30_days": new_users_30d,
-                "growth_rate": round(user_growth_rate, 2),
-            },
-            "drivers": {
-                "total": total_drivers,
-                "verified": verified_drivers,
-                "pending_verification": pending_verification,
-            },
-            "rides": {
-                "total": total_rides,
-                "active": active_rides,
-                "completed": completed_rides,
-                "last_30_days": rides_30d,
-            },
-            "bookings": {
-                "total": total_bookings,
-                "confirmed": confirmed_bookings,
-                "pending": pending_bookings,
-                "last_30_days": bookings_30d,
-            },
-            "revenue": {
-                "total": str(total_revenue),
-                "last_30_days": str(revenue_30d),
-                "last_7_days": str(revenue_7d),
-                "today": str(revenue_today),
-                "subscription_revenue": subscription_revenue,
-                "average_booking_value": str(round(avg_booking_value, 2)),
-            },
-            "subscriptions": {
-                "active": active_subscriptions,
-                "trial": trial_subscriptions,
-                "paid": paid_subscriptions,
-                "expired": expired_subscriptions,
-            },
-            "ratings": {
-                "total": total_ratings,
-                "average": round(avg_driver_rating, 2),
-            }
-        })
+        stats, age = dashboard.get_stats()
+        return Response(stats, headers={"Age": str(int(age))})
 
 
 class AdminRevenueChartView(APIView):
@@ -651,23 +561,19 @@ class AdminRevenueChartView(APIView):
 
     def get(self, request):
         period = request.query_params.get('period', 'daily')
+        # Read from the daily rollup: at most a few hundred rows
         if period == 'daily':
-            thirty_days_ago = date.today() - timedelta(days=30)
-            revenue_data = Booking.objects.filter(
-                status__in=['confirmed', 'completed'],
-                created_at__date__gte=thirty_days_ago
-            ).annotate(date=TruncDate('created_at')).values('date').annotate(
-                revenue=Sum('total_price'),
-                bookings=Count('id')
-            ).order_by('date')
+            thirty_days_ago = timezone.localdate() - timedelta(days=30)
+            revenue_data = DailyMetrics.objects.filter(
+                date__gte=thirty_days_ago, bookings__gt=0
+            ).values('date', 'revenue', 'bookings').order_by('date')
         else:
-            twelve_months_ago = date.today() - timedelta(days=365)
-            revenue_data = Booking.objects.filter(
-                status__in=['confirmed', 'completed'],
-                created_at__date__gte=twelve_months_ago
-            ).annotate(month=TruncMonth('created_at')).values('month').annotate(
-                revenue=Sum('total_price'),
-                bookings=Count('id')
+            twelve_months_ago = timezone.localdate() - timedelta(days=365)
+            revenue_data = DailyMetrics.objects.filter(
+                date__gte=twelve_months_ago, bookings__gt=0
+            ).annotate(month=TruncMonth('date')).values('month').annotate(
+                revenue=Sum('revenue'),
+                bookings=Sum('bookings')
             ).order_by('month')
 
         chart_data = []
@@ -681,22 +587,46 @@ class AdminRevenueChartView(APIView):
 
 
 class AdminTopDriversView(APIView):
+    """Drivers by earnings; ?window=7d|30d|all (default all)"""
     permission_classes = [IsAdminUser]
 
+    WINDOWS = {'7d': 7, '30d': 30, 'all': None}
+
     def get(self, request):
         limit = int(request.query_params.get('limit', 10))
-        top_drivers = User.objects.filter(role='driver').annotate(
-            total_rides=Count('driver_rides', filter=Q(driver_rides__status='completed')),
-            total_earnings=Sum('driver_rides__bookings__total_price',
-                             filter=Q(driver_rides__bookings__status__in=['confirmed', 'completed']))
-        ).filter(total_rides__gt=0).order_by('-total_earnings')[:limit]
+        window = request.query_params.get('window', 'all')
+        if window not in self.WINDOWS:
+            return Response(
+                {"error": "window must be one of 7d, 30d, all"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        days = self.WINDOWS[window]
+        if days is None:
+            # Ordered scan of the leaderboard index, profiles joined in
+            top_stats = DriverStats.objects.filter(completed_rides__gt=0).select_related(
+                'driver', 'driver__driverprofile'
+            ).order_by('-earnings', '-driver')[:limit]
+            leaders = [(stats.driver, stats.completed_rides, stats.earnings) for stats in top_stats]
+        else:
+            start, _ = rollup.date_range(days)
+            top_stats = DriverDailyStats.objects.filter(date__gte=start).values('driver').annotate(
+                total_rides=Sum('completed_rides'),
+                total_earnings=Sum('earnings')
+            ).filter(total_rides__gt=0).order_by('-total_earnings', '-driver')[:limit]
+            drivers = User.objects.select_related('driverprofile').in_bulk(
+                [row['driver'] for row in top_stats]
+            )
+            leaders = [
+                (drivers[row['driver']], row['total_rides'], row['total_earnings'])
+                for row in top_stats
+            ]
 
         drivers_data = []
-        for driver in top_drivers:
+        for driver, total_rides, total_earnings in leaders:
             try:
-                profile = driver.driverprofile
-                car_model = profile.car_model
-            except:
+                car_model = driver.driverprofile.car_model
+            except DriverProfile.DoesNotExist:
                 car_model = "N/A"
             drivers_data.append({
                 'id': driver.id,
@@ -704,8 +634,8 @@ class AdminTopDriversView(APIView):
                 'email': driver.email,
                 'phone': driver.phone,
                 'car_model': car_model,
-                'total_rides': driver.total_rides,
-                'total_earnings': str(driver.total_earnings or 0),
+                'total_rides': total_rides,
+                'total_earnings': str(total_earnings or 0),
                 'rating': driver.average_rating(),
             })
         return Response(drivers_data)
@@ -763,11 +693,10 @@ class MyRatingsView(APIView):
 
     def get(self, request):
         from rides.models import Rating
-        from django.db.models import Avg
         ratings = Rating.objects.filter(reviewee=request.user).select_related(
             'reviewer', 'booking'
         ).order_by('-created_at')
-        avg_rating = ratings.aggregate(Avg('score'))['score__avg'] or 0.0
+        avg_rating = request.user.average_rating()
         ratings_data = []
         for rating in ratings:
             ratings_data.append({
@@ -779,7 +708,7 @@ class MyRatingsView(APIView):
             })
         return Response({
             'average_rating': round(avg_rating, 1),
-            'total_ratings': ratings.count(),
+            'total_ratings': request.user.rating_count,
             'ratings': ratings_data,
         })
 
@@ -798,14 +727,11 @@ def send_email_verification_code(request):
     user.code_created_at = timezone.now()
     user.save()
 
-    # ✅ Actually send the email now
-    try:
-        send_verification_email(user.email, user.username, code)
-    except Exception as e:
-        logger.warning(f"Verification email failed: {e}")
+    enqueue('accounts.send_verification_email', email=user.email, username=user.username, code=code)
 
+    # 200 rather than 202: released apps check for it
     return Response({
-        "message": "Verification code sent successfully"
+        "message": "Verification code queued"
     }, status=status.HTTP_200_OK)
 
 @api_view(['POST'])
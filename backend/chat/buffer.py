@@ -0,0 +1,144 @@
+"""
+Write-behind buffer for chat messages.
+
+With CHAT_WRITE_BEHIND on, ChatConsumer broadcasts a message straight away
+and hands it to this per-process buffer instead of inserting it. The buffer
+is flushed with one bulk_create when it reaches CHAT_WRITE_BEHIND_BATCH_SIZE
+messages or CHAT_WRITE_BEHIND_FLUSH_SECONDS after the first pending message,
+and once more when the process exits.
+
+If a batch can't be written it is appended to a spool file (JSON lines,
+fsynced) and `manage.py replay_chat_spool` inserts it later. Every message
+carries a client_id, so replaying a batch twice stores it once.
+"""
+import asyncio
+import atexit
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import defaultdict
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from .models import ChatRoom, Message
+
+logger = logging.getLogger(__name__)
+
+_spool_lock = threading.Lock()
+
+
+def message_to_record(message):
+    return {
+        'chat_room_id': message.chat_room_id,
+        'sender_id': message.sender_id,
+        'content': message.content,
+        'client_id': str(message.client_id),
+        'created_at': message.created_at.isoformat(),
+    }
+
+
+def record_to_message(record):
+    return Message(
+        chat_room_id=record['chat_room_id'],
+        sender_id=record['sender_id'],
+        content=record['content'],
+        client_id=uuid.UUID(record['client_id']),
+        created_at=parse_datetime(record['created_at']),
+    )
+
+
+def spool(messages, path=None):
+    """Append messages to the spool file and fsync it"""
+    path = path or settings.CHAT_WRITE_BEHIND_SPOOL_PATH
+    with _spool_lock, open(path, 'a', encoding='utf-8') as f:
+        for message in messages:
+            f.write(json.dumps(message_to_record(message)) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def write_messages(messages):
+    """
+    Insert a batch, skipping messages whose client_id is already stored, and
+    update each room's last message and unread counters
+    """
+    stored = set(
+        Message.objects.filter(client_id__in=[m.client_id for m in messages])
+        .values_list('client_id', flat=True)
+    )
+    new = [m for m in messages if m.client_id not in stored]
+    if not new:
+        return
+
+    with transaction.atomic():
+        Message.objects.bulk_create(new, ignore_conflicts=True)
+        # ignore_conflicts doesn't hand back primary keys
+        ids = dict(
+            Message.objects.filter(client_id__in=[m.client_id for m in new])
+            .values_list('client_id', 'id')
+        )
+        by_room = defaultdict(list)
+        for message in new:
+            message.id = ids[message.client_id]
+            by_room[message.chat_room_id].append(message)
+
+        rooms = ChatRoom.objects.filter(id__in=by_room).only('id', 'driver_id', 'passenger_id')
+        for room in rooms:
+            ChatRoom.objects.record_messages(room, by_room[room.id])
+
+
+class MessageBuffer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = []
+        self._atexit_registered = False
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, message):
+        """Queue an unsaved Message; call from the event loop"""
+        with self._lock:
+            self._pending.append(message)
+            size = len(self._pending)
+            if not self._atexit_registered:
+                atexit.register(self.flush)
+                self._atexit_registered = True
+
+        if size >= settings.CHAT_WRITE_BEHIND_BATCH_SIZE:
+            self._schedule(0)
+        elif size == 1:
+            self._schedule(settings.CHAT_WRITE_BEHIND_FLUSH_SECONDS)
+
+    def _schedule(self, delay):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        loop.call_later(delay, lambda: loop.create_task(self.aflush()))
+
+    def flush(self):
+        """Write everything pending; returns the number of messages handled"""
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if not batch:
+            return 0
+
+        try:
+            write_messages(batch)
+        except Exception as e:
+            logger.error(f"Chat flush of {len(batch)} messages failed, spooling: {e}")
+            spool(batch)
+        return len(batch)
+
+    async def aflush(self):
+        return await database_sync_to_async(self.flush)()
+
+
+message_buffer = MessageBuffer()
@@ -0,0 +1,79 @@
+"""
+Wire formats for the chat and notification websockets.
+
+Clients pick one through the websocket subprotocol header at connect time,
+listing the ones they support in order of preference:
+
+    ishare.msgpack  binary frames, MessagePack
+    ishare.cbor     binary frames, CBOR
+    ishare.json     text frames, JSON (also used when no subprotocol is sent)
+
+Every codec carries the same event dicts; see benchmark_ws_codecs for their
+relative cost and frame size.
+"""
+import json
+
+import cbor2
+import msgpack
+
+
+class DecodeError(ValueError):
+    pass
+
+
+class JSONCodec:
+    subprotocol = 'ishare.json'
+    binary = False
+
+    def encode(self, event):
+        return json.dumps(event, separators=(',', ':'), ensure_ascii=False)
+
+    def decode(self, frame):
+        try:
+            return json.loads(frame)
+        except ValueError as e:
+            raise DecodeError(str(e))
+
+
+class MsgpackCodec:
+    subprotocol = 'ishare.msgpack'
+    binary = True
+
+    def encode(self, event):
+        return msgpack.packb(event, use_bin_type=True)
+
+    def decode(self, frame):
+        try:
+            return msgpack.unpackb(frame, raw=False)
+        except (ValueError, TypeError, msgpack.UnpackException) as e:
+            raise DecodeError(str(e))
+
+
+class CBORCodec:
+    subprotocol = 'ishare.cbor'
+    binary = True
+
+    def encode(self, event):
+        return cbor2.dumps(event)
+
+    def decode(self, frame):
+        try:
+            return cbor2.loads(frame)
+        except (ValueError, TypeError, cbor2.CBORDecodeError) as e:
+            raise DecodeError(str(e))
+
+
+DEFAULT_CODEC = JSONCodec()
+
+CODECS = {
+    codec.subprotocol: codec
+    for codec in (MsgpackCodec(), CBORCodec(), DEFAULT_CODEC)
+}
+
+
+def negotiate(subprotocols):
+    """First codec the client offered that we support, else JSON"""
+    for name in subprotocols or ():
+        if name in CODECS:
+            return CODECS[name]
+    return DEFAULT_CODEC
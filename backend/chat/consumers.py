@@ -1,54 +1,222 @@
-import json
+import uuid
 from channels.generic.websocket import AsyncWebsocketConsumer
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from .buffer import message_buffer
+from .codecs import DecodeError, negotiate
 from .models import ChatRoom, Message
 from django.contrib.auth import get_user_model
-from asgiref.sync import sync_to_async
+from django.db.models import Q
+from channels.db import database_sync_to_async
+from accounts.models import Notification
+from accounts.notifications import notification_group
 
 User = get_user_model()
 
-class ChatConsumer(AsyncWebsocketConsumer):
+
+class EventConsumer(AsyncWebsocketConsumer):
+    """
+    Websocket consumer that speaks dict events in the codec the client
+    negotiated (see chat.codecs): JSON text frames by default, msgpack or
+    CBOR binary frames on request.
+    """
+
+    async def accept_with_codec(self):
+        self.codec = negotiate(self.scope.get('subprotocols'))
+        offered = self.scope.get('subprotocols') or []
+        await self.accept(self.codec.subprotocol if self.codec.subprotocol in offered else None)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        frame = bytes_data if self.codec.binary else text_data
+        if frame is None:
+            return
+        try:
+            event = self.codec.decode(frame)
+        except DecodeError:
+            return
+        if isinstance(event, dict):
+            await self.receive_event(event)
+
+    async def receive_event(self, event):
+        pass
+
+    async def send_event(self, event):
+        frame = self.codec.encode(event)
+        if self.codec.binary:
+            await self.send(bytes_data=frame)
+        else:
+            await self.send(text_data=frame)
+
+
+class ChatConsumer(EventConsumer):
+    """
+    Live chat for one booking's ChatRoom.
+
+    Membership is checked once at connect; the room and its participants are
+    kept on the consumer, so storing a message is one INSERT plus the room
+    summary UPDATE.
+    """
 
     async def connect(self):
         self.chat_room_id = self.scope['url_route']['kwargs']['chat_room_id']
         self.room_group_name = f"chat_{self.chat_room_id}"
 
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.chat_room = await self.get_chat_room(user.id)
+        if self.chat_room is None:
+            await self.close(code=4403)
+            return
+        self.user = user
+        self.participant_ids = {self.chat_room.driver_id, self.chat_room.passenger_id}
+
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
 
-        await self.accept()
+        await self.accept_with_codec()
 
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name
-        )
+        if getattr(self, "chat_room", None) is not None:
+            await self.channel_layer.group_discard(
+                self.room_group_name,
+                self.channel_name
+            )
 
-    async def receive(self, text_data):
-        data = json.loads(text_data)
-        message = data['message']
-        user = self.scope["user"]
+    async def receive_event(self, data):
+        message = data.get('message')
+        if not isinstance(message, str) or not message.strip():
+            return
 
-        saved_message = await self.save_message(user, message)
+        try:
+            client_id = uuid.UUID(str(data.get('client_id') or uuid.uuid4()))
+        except ValueError:
+            client_id = uuid.uuid4()
+
+        chat_message = Message(
+            chat_room=self.chat_room,
+            sender=self.user,
+            content=message,
+            client_id=client_id,
+        )
+
+        if settings.CHAT_WRITE_BEHIND:
+            # Broadcast now; chat.buffer inserts it with the next batch
+            message_buffer.add(chat_message)
+        elif not await self.save_message(chat_message):
+            # Resent message we already stored and broadcast
+            return
 
         await self.channel_layer.group_send(
             self.room_group_name,
             {
                 "type": "chat_message",
+                "id": chat_message.id,
+                "client_id": str(client_id),
                 "message": message,
-                "sender": user.username,
+                "sender": self.user.username,
+                "sender_id": self.user.id,
+                "created_at": chat_message.created_at.isoformat(),
             }
         )
 
     async def chat_message(self, event):
-        await self.send(text_data=json.dumps(event))
-
-    @sync_to_async
-    def save_message(self, user, content):
-        chat_room = ChatRoom.objects.get(id=self.chat_room_id)
-        return Message.objects.create(
-            chat_room=chat_room,
-            sender=user,
-            content=content
-        )
+        await self.send_event(event)
+
+    @database_sync_to_async
+    def get_chat_room(self, user_id):
+        """The room, if the user is its driver or passenger"""
+        return ChatRoom.objects.filter(
+            Q(driver_id=user_id) | Q(passenger_id=user_id),
+            id=self.chat_room_id,
+        ).only('id', 'driver_id', 'passenger_id').first()
+
+    @database_sync_to_async
+    def save_message(self, chat_message):
+        try:
+            with transaction.atomic():
+                chat_message.save(force_insert=True)
+                ChatRoom.objects.record_messages(self.chat_room, [chat_message])
+        except IntegrityError:
+            return False
+        return True
+
+
+def location_frame(event):
+    """What a client receives for a rides.location update event"""
+    return {
+        "type": "location",
+        "ride_id": event["ride_id"],
+        "user_id": event["user_id"],
+        "role": event["role"],
+        "location": event["location"],
+    }
+
+
+class NotificationConsumer(EventConsumer):
+    """
+    Live in-app notifications for the connected user.
+
+    Sends the unread count on connect, then every new notification as it is
+    created (see accounts.notifications.publish_notifications). Clients mark
+    notifications read with {"action": "mark_read", "ids": [...]} or
+    {"action": "mark_read"} for all of them. Live positions from the other
+    side of the user's rides (rides.location) arrive on the same socket.
+    """
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.user_id = user.id
+        self.group_name = notification_group(self.user_id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept_with_codec()
+
+        self.unread_count = await self.count_unread()
+        await self.send_unread_count()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, "group_name"):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_event(self, data):
+        if data.get("action") == "mark_read":
+            self.unread_count = await self.mark_read(data.get("ids"))
+            await self.send_unread_count()
+
+    async def notification_created(self, event):
+        self.unread_count += 1
+        await self.send_event({
+            "type": "notification",
+            "notification": event["notification"],
+            "unread_count": self.unread_count,
+        })
+
+    async def location_update(self, event):
+        # Live position of the other side of a ride (rides.location)
+        await self.send_event(location_frame(event))
+
+    async def send_unread_count(self):
+        await self.send_event({
+            "type": "unread_count",
+            "count": self.unread_count,
+        })
+
+    @database_sync_to_async
+    def count_unread(self):
+        return Notification.objects.filter(user_id=self.user_id, is_read=False).count()
+
+    @database_sync_to_async
+    def mark_read(self, ids):
+        unread = Notification.objects.filter(user_id=self.user_id, is_read=False)
+        if ids:
+            unread = unread.filter(id__in=[i for i in ids if isinstance(i, int)])
+        unread.update(is_read=True)
+        return Notification.objects.filter(user_id=self.user_id, is_read=False).count()
@@ -0,0 +1,77 @@
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from chat.codecs import CODECS
+from chat.consumers import location_frame
+from rides import location
+
+
+def sample_events():
+    now = timezone.now().isoformat()
+    chat_message = {
+        "type": "chat_message",
+        "id": 48213,
+        "client_id": str(uuid.uuid4()),
+        "message": "Niko hafi kugera, ndi kuri Nyabugogo 🚗",
+        "sender": "passenger42",
+        "sender_id": 1042,
+        "created_at": now,
+    }
+    notification = {
+        "type": "notification",
+        "notification": {
+            "id": 90311,
+            "title": "Booking Confirmed! ✅",
+            "message": "Your booking for Kigali → Musanze has been confirmed!",
+            "is_read": False,
+            "created_at": now,
+            "user": 1042,
+        },
+        "unread_count": 3,
+    }
+    # Built the way rides.location and NotificationConsumer build a live ping
+    context = {"driver_id": 1007, "passengers": {1042: 7731}}
+    point = location.make_point({"lat": -1.944072, "lng": 30.061885, "heading": 184.5, "speed": 11.2})
+    location_update = location_frame(location.location_event(context, 5120, 1007, point))
+    return {
+        "chat_message": chat_message,
+        "notification": notification,
+        "location": location_update,
+        "chat_burst_x20": {"type": "batch", "events": [chat_message] * 20},
+    }
+
+
+class Command(BaseCommand):
+    help = "Compare encode/decode cost and frame size of the websocket codecs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        self.stdout.write(
+            f"{'event':<16} {'codec':<16} {'bytes':>6} {'encode µs':>10} {'decode µs':>10}"
+        )
+
+        for name, event in sample_events().items():
+            for subprotocol, codec in CODECS.items():
+                frame = codec.encode(event)
+                assert codec.decode(frame) == event
+                size = len(frame.encode() if isinstance(frame, str) else frame)
+
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    codec.encode(event)
+                encode_us = (time.perf_counter() - start) / iterations * 1e6
+
+                start = time.perf_counter()
+                for _ in range(iterations):
+                    codec.decode(frame)
+                decode_us = (time.perf_counter() - start) / iterations * 1e6
+
+                self.stdout.write(
+                    f"{name:<16} {subprotocol:<16} {size:>6} {encode_us:>10.2f} {decode_us:>10.2f}"
+                )
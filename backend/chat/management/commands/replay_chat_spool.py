@@ -0,0 +1,37 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from chat.buffer import record_to_message, write_messages
+
+
+class Command(BaseCommand):
+    help = "Insert chat messages that the write-behind buffer had to spool to disk"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=settings.CHAT_WRITE_BEHIND_SPOOL_PATH)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        replaying = f"{path}.replaying"
+
+        # Take the spool out of the way first so running consumers start a
+        # fresh one; a leftover .replaying file is from an interrupted run
+        if not os.path.exists(replaying):
+            if not os.path.exists(path):
+                self.stdout.write("Nothing to replay")
+                return
+            os.replace(path, replaying)
+
+        with open(replaying, encoding='utf-8') as f:
+            messages = [record_to_message(json.loads(line)) for line in f if line.strip()]
+
+        size = options['batch_size']
+        for start in range(0, len(messages), size):
+            write_messages(messages[start:start + size])
+
+        os.remove(replaying)
+        self.stdout.write(f"Replayed {len(messages)} spooled messages")
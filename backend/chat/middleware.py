@@ -0,0 +1,34 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+User = get_user_model()
+
+
+@database_sync_to_async
+def get_user_for_token(raw_token):
+    try:
+        token = AccessToken(raw_token)
+        return User.objects.get(id=token['user_id'], is_active=True)
+    except (TokenError, KeyError, User.DoesNotExist):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticate websockets with the app's JWT access token, passed as
+    `?token=<access>` since mobile websocket clients can't set headers.
+    Without a token the session user from AuthMiddlewareStack is kept.
+    """
+
+    async def __call__(self, scope, receive, send):
+        params = parse_qs(scope.get('query_string', b'').decode())
+        raw_token = params.get('token', [None])[0]
+        if raw_token:
+            scope = dict(scope, user=await get_user_for_token(raw_token))
+        return await super().__call__(scope, receive, send)
@@ -0,0 +1,58 @@
+# Generated by Django 4.2 on 2026-10-17 20:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_room_summary(apps, schema_editor):
+    ChatRoom = apps.get_model('chat', 'ChatRoom')
+    Message = apps.get_model('chat', 'Message')
+
+    latest = Message.objects.filter(chat_room=OuterRef('pk')).order_by('-created_at', '-id')
+
+    def unread_from(sender_field):
+        return Coalesce(Subquery(
+            Message.objects.filter(
+                chat_room=OuterRef('pk'), is_read=False, sender=OuterRef(sender_field)
+            ).order_by().values('chat_room').annotate(n=Count('id')).values('n')
+        ), 0)
+
+    ChatRoom.objects.update(
+        last_message_id=Subquery(latest.values('id')[:1]),
+        last_message_at=Subquery(latest.values('created_at')[:1]),
+        driver_unread_count=unread_from('passenger'),
+        passenger_unread_count=unread_from('driver'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_message_client_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='driver_unread_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.message'),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='last_message_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='passenger_unread_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_room_summary, migrations.RunPython.noop),
+    ]
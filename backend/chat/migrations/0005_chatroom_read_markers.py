@@ -0,0 +1,43 @@
+# Generated by Django 4.2 on 2026-10-17 20:56
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_read_markers(apps, schema_editor):
+    ChatRoom = apps.get_model('chat', 'ChatRoom')
+    Message = apps.get_model('chat', 'Message')
+
+    def newest_read_from(sender_field):
+        return Coalesce(Subquery(
+            Message.objects.filter(
+                chat_room=OuterRef('pk'), is_read=True, sender=OuterRef(sender_field)
+            ).order_by().values('chat_room').annotate(newest=Max('id')).values('newest')
+        ), 0)
+
+    ChatRoom.objects.update(
+        driver_read_up_to=newest_read_from('passenger'),
+        passenger_read_up_to=newest_read_from('driver'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0004_chatroom_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chatroom',
+            name='driver_read_up_to',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chatroom',
+            name='passenger_read_up_to',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_read_markers, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,45 @@
 # Create new file: backend/chat/models.py
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Coalesce
 from django.conf import settings
+from django.utils import timezone
 from rides.models import Booking
 
+
+class ChatRoomQuerySet(models.QuerySet):
+    def record_messages(self, chat_room, messages):
+        """
+        Fold newly stored messages into the room's denormalized fields in one
+        UPDATE: the latest message, and the unread count of whoever didn't
+        send them. Counters use F() so concurrent senders never lose updates,
+        and the last message only moves forward in time.
+        """
+        if not messages:
+            return
+        latest = max(messages, key=lambda m: (m.created_at, m.id))
+        from_driver = sum(1 for m in messages if m.sender_id == chat_room.driver_id)
+        from_passenger = len(messages) - from_driver
+
+        is_newer = Q(last_message_at__isnull=True) | Q(last_message_at__lte=latest.created_at)
+        self.filter(id=chat_room.id).update(
+            last_message_id=Case(
+                When(is_newer, then=Value(latest.id)),
+                default=F('last_message_id'),
+                output_field=models.BigIntegerField(),
+            ),
+            last_message_at=Case(
+                When(is_newer, then=Value(latest.created_at)),
+                default=F('last_message_at'),
+                output_field=models.DateTimeField(),
+            ),
+            passenger_unread_count=F('passenger_unread_count') + from_driver,
+            driver_unread_count=F('driver_unread_count') + from_passenger,
+            updated_at=timezone.now(),
+        )
+
+
 class ChatRoom(models.Model):
     """Chat room between driver and passenger for a specific booking"""
     booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='chat_room')
@@ -19,11 +55,55 @@ class ChatRoom(models.Model):
     )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Denormalized for the chat list; maintained by record_messages() and
+    # mark_read_by() so listing rooms never touches the messages table
+    last_message = models.ForeignKey(
+        'Message',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+    last_message_at = models.DateTimeField(null=True, blank=True)
+    driver_unread_count = models.IntegerField(default=0)
+    passenger_unread_count = models.IntegerField(default=0)
+    # Id of the newest message each participant had seen when they last
+    # marked the room read; lets chat sync report read receipts as a delta
+    driver_read_up_to = models.BigIntegerField(default=0)
+    passenger_read_up_to = models.BigIntegerField(default=0)
+
+    objects = ChatRoomQuerySet.as_manager()
 
     class Meta:
         unique_together = ['driver', 'passenger', 'booking']
         ordering = ['-updated_at']
 
+    def unread_count_for(self, user):
+        if user.id == self.driver_id:
+            return self.driver_unread_count
+        if user.id == self.passenger_id:
+            return self.passenger_unread_count
+        return 0
+
+    def mark_read_by(self, user):
+        """Mark the other participant's messages read and reset the counter"""
+        role = 'driver' if user.id == self.driver_id else 'passenger'
+        counter = f'{role}_unread_count'
+        marker = f'{role}_read_up_to'
+        with transaction.atomic():
+            # Reset the counter first: on Postgres this locks the room row, so
+            # a message committed after our UPDATE below is counted again
+            ChatRoom.objects.filter(id=self.id).update(**{
+                counter: 0,
+                marker: Coalesce(F('last_message_id'), F(marker)),
+            })
+            updated = Message.objects.filter(
+                chat_room_id=self.id,
+                is_read=False
+            ).exclude(sender_id=user.id).update(is_read=True)
+        setattr(self, counter, 0)
+        return updated
+
     def __str__(self):
         return f"Chat: {self.passenger.username} - {self.driver.username} (Booking #{self.booking.id})"
 
@@ -34,10 +114,18 @@ class Message(models.Model):
     sender = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     content = models.TextField()
     is_read = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Set when the message is sent, not when it reaches the database; with
+    # write-behind (chat.buffer) rows are inserted a little later in batches
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+    # Idempotency key from the sender, so a replayed or resent message is
+    # stored once
+    client_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
 
     class Meta:
         ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['chat_room', '-created_at', '-id']),
+        ]
 
     def __str__(self):
         return f"{self.sender.username}: {self.content[:50]}"
@@ -1 +1,8 @@
-websocket_urlpatterns = []
\ No newline at end of file
+from django.urls import path
+
+from . import consumers
+
+websocket_urlpatterns = [
+    path('ws/chat/<int:chat_room_id>/', consumers.ChatConsumer.as_asgi()),
+    path('ws/notifications/', consumers.NotificationConsumer.as_asgi()),
+]
@@ -1,10 +1,13 @@
 from rest_framework import serializers
+from accounts.mixins import EagerLoadingSerializerMixin
 from .models import ChatRoom, Message
 
-class MessageSerializer(serializers.ModelSerializer):
+class MessageSerializer(EagerLoadingSerializerMixin, serializers.ModelSerializer):
     sender_name = serializers.CharField(source='sender.username', read_only=True)
     sender_role = serializers.CharField(source='sender.role', read_only=True)
 
+    select_related_fields = ('sender',)
+
     class Meta:
         model = Message
         fields = [
@@ -21,12 +24,14 @@ class MessageSerializer(serializers.ModelSerializer):
 
 
 
-class ChatRoomSerializer(serializers.ModelSerializer):
+class ChatRoomSerializer(EagerLoadingSerializerMixin, serializers.ModelSerializer):
     driver_name = serializers.CharField(source='driver.username', read_only=True)
     passenger_name = serializers.CharField(source='passenger.username', read_only=True)
     last_message = serializers.SerializerMethodField()
     unread_count = serializers.SerializerMethodField()
     booking_details = serializers.SerializerMethodField()
+
+    select_related_fields = ('driver', 'passenger', 'booking__ride', 'last_message__sender')
     
     class Meta:
         model = ChatRoom
@@ -35,7 +40,7 @@ class ChatRoomSerializer(serializers.ModelSerializer):
         read_only_fields = ['driver', 'passenger', 'created_at', 'updated_at']
     
     def get_last_message(self, obj):
-        last_msg = obj.messages.last()
+        last_msg = obj.last_message
         if last_msg:
             return {
                 'content': last_msg.content,
@@ -47,7 +52,7 @@ class ChatRoomSerializer(serializers.ModelSerializer):
     def get_unread_count(self, obj):
         request = self.context.get('request')
         if request and request.user:
-            return obj.messages.filter(is_read=False).exclude(sender=request.user).count()
+            return obj.unread_count_for(request.user)
         return 0
     
     def get_booking_details(self, obj):
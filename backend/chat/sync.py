@@ -0,0 +1,102 @@
+"""
+Delta sync for chat ("what changed since I was last connected").
+
+The client keeps one opaque cursor per room. A cursor records the newest
+message id it has and both participants' read markers; a sync request sends
+all of them at once and gets back only rooms that changed, each with its new
+messages and read markers and a fresh cursor. Message ids are used rather
+than timestamps because ids only grow, even when messages are inserted late
+in write-behind batches.
+"""
+import base64
+
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+
+from .models import ChatRoom, Message
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(message_id, driver_read_up_to, passenger_read_up_to):
+    raw = f"{message_id}.{driver_read_up_to}.{passenger_read_up_to}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(encoded):
+    """(message_id, driver_read_up_to, passenger_read_up_to); None for no cursor"""
+    if not encoded:
+        return None
+    try:
+        padded = encoded + '=' * (-len(encoded) % 4)
+        parts = base64.urlsafe_b64decode(padded.encode()).decode().split('.')
+        message_id, driver_read, passenger_read = (int(p) for p in parts)
+    except (TypeError, ValueError, UnicodeDecodeError):
+        raise InvalidCursor(encoded)
+    return message_id, driver_read, passenger_read
+
+
+def room_cursor(room, message_id):
+    return encode_cursor(message_id, room.driver_read_up_to, room.passenger_read_up_to)
+
+
+def sync_rooms(user, cursors, limit):
+    """
+    Changes across every room of `user` since the given cursors.
+
+    cursors maps room id -> decoded cursor (or None for a room the client
+    has never synced). At most `limit` messages, the newest ones, come back
+    per room; `has_more` tells the client to page the rest of the history
+    through ChatMessagesView. Two queries in total.
+    """
+    rooms = list(
+        ChatRoom.objects.filter(Q(driver=user) | Q(passenger=user)).only(
+            'id', 'driver_id', 'passenger_id', 'last_message_id', 'last_message_at',
+            'driver_unread_count', 'passenger_unread_count',
+            'driver_read_up_to', 'passenger_read_up_to',
+        )
+    )
+
+    changed = []
+    since = {}
+    for room in rooms:
+        cursor = cursors.get(room.id)
+        seen = cursor[0] if cursor else 0
+        newest = room.last_message_id or 0
+        if cursor and newest <= seen and cursor[1:] == (room.driver_read_up_to, room.passenger_read_up_to):
+            continue
+        changed.append(room)
+        if newest > seen:
+            since[room.id] = seen
+
+    messages_by_room = {room_id: [] for room_id in since}
+    if since:
+        condition = Q()
+        for room_id, seen in since.items():
+            condition |= Q(chat_room_id=room_id, id__gt=seen)
+        newest_first = (
+            Message.objects.filter(condition)
+            .select_related('sender')
+            .annotate(position=Window(
+                RowNumber(),
+                partition_by=F('chat_room_id'),
+                order_by=F('id').desc(),
+            ))
+            .filter(position__lte=limit + 1)
+            .order_by('chat_room_id', 'id')
+        )
+        for message in newest_first:
+            messages_by_room[message.chat_room_id].append(message)
+
+    results = []
+    for room in changed:
+        cursor = cursors.get(room.id)
+        messages = messages_by_room.get(room.id, [])
+        has_more = len(messages) > limit
+        if has_more:
+            messages = messages[1:]
+        newest = max((cursor[0] if cursor else 0), room.last_message_id or 0)
+        results.append((room, messages, has_more, room_cursor(room, newest)))
+    return results
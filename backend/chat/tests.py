@@ -1,3 +1,263 @@
-from django.test import TestCase
+import os
+import tempfile
+import unittest
+import uuid
+from datetime import timedelta
+from io import StringIO
 
-# Create your tests here.
+import msgpack
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import User
+from config.asgi import application
+from rides.models import Ride, Booking
+from .buffer import message_buffer, spool
+from .models import ChatRoom, Message
+
+# e.g. "redis://localhost:6379/14,redis://localhost:6379/15" to exercise
+# sharding; the Redis tests are skipped when it isn't set
+REDIS_TEST_HOSTS = [h for h in os.environ.get('CHANNEL_REDIS_TEST_HOSTS', '').split(',') if h]
+
+
+def make_room():
+    driver = User.objects.create_user(
+        email='driver@example.com', username='driver', password='pass1234', role='driver'
+    )
+    passenger = User.objects.create_user(
+        email='passenger@example.com', username='passenger', password='pass1234', role='passenger'
+    )
+    ride = Ride.objects.create(
+        driver=driver,
+        start_location='Kigali',
+        destination='Musanze',
+        departure_time=timezone.now() + timedelta(days=1),
+        price_per_seat=2000,
+        available_seats=3,
+    )
+    booking = Booking.objects.create(
+        ride=ride, passenger=passenger, seats_booked=1, total_price=2000, status='confirmed'
+    )
+    return ChatRoom.objects.create(booking=booking, driver=driver, passenger=passenger)
+
+
+def connect_as(user, path):
+    return WebsocketCommunicator(application, f"{path}?token={AccessToken.for_user(user)}")
+
+
+class ChatConsumerTests(TransactionTestCase):
+    def setUp(self):
+        self.room = make_room()
+        self.path = f"/ws/chat/{self.room.id}/"
+
+    def test_message_reaches_every_socket_in_the_room(self):
+        async def scenario():
+            driver = connect_as(self.room.driver, self.path)
+            passenger = connect_as(self.room.passenger, self.path)
+            self.assertTrue((await driver.connect())[0])
+            self.assertTrue((await passenger.connect())[0])
+
+            await passenger.send_json_to({"message": "On my way"})
+            for socket in (driver, passenger):
+                event = await socket.receive_json_from(timeout=5)
+                self.assertEqual(event["message"], "On my way")
+                self.assertEqual(event["sender"], "passenger")
+
+            await driver.disconnect()
+            await passenger.disconnect()
+
+        async_to_sync(scenario)()
+        self.assertEqual(Message.objects.filter(chat_room=self.room).count(), 1)
+
+    def test_binary_subprotocol_is_negotiated(self):
+        async def scenario():
+            socket = WebsocketCommunicator(
+                application,
+                f"{self.path}?token={AccessToken.for_user(self.room.driver)}",
+                subprotocols=["ishare.msgpack", "ishare.json"],
+            )
+            connected, subprotocol = await socket.connect()
+            self.assertTrue(connected)
+            self.assertEqual(subprotocol, "ishare.msgpack")
+
+            await socket.send_to(bytes_data=msgpack.packb({"message": "Muraho"}))
+            event = msgpack.unpackb(await socket.receive_from(timeout=5), raw=False)
+            self.assertEqual(event["message"], "Muraho")
+            await socket.disconnect()
+
+        async_to_sync(scenario)()
+
+    def test_outsiders_are_rejected(self):
+        outsider = User.objects.create_user(
+            email='other@example.com', username='other', password='pass1234', role='passenger'
+        )
+
+        async def scenario():
+            socket = connect_as(outsider, self.path)
+            connected, code = await socket.connect()
+            self.assertFalse(connected)
+            self.assertEqual(code, 4403)
+
+            anonymous = WebsocketCommunicator(application, self.path)
+            connected, code = await anonymous.connect()
+            self.assertFalse(connected)
+            self.assertEqual(code, 4401)
+
+        async_to_sync(scenario)()
+
+    def test_each_message_is_one_insert_and_one_room_update(self):
+        async def scenario():
+            socket = connect_as(self.room.driver, self.path)
+            await socket.connect()
+            queries = CaptureQueriesContext(connection)
+            await sync_to_async(queries.__enter__)()
+            await socket.send_json_to({"message": "Leaving now"})
+            await socket.receive_json_from(timeout=5)
+            await sync_to_async(queries.__exit__)(None, None, None)
+            await socket.disconnect()
+            return queries
+
+        queries = async_to_sync(scenario)()
+        statements = [
+            q['sql'].split()[0] for q in queries
+            if q['sql'] not in ('BEGIN', 'COMMIT')
+        ]
+        self.assertEqual(statements, ['INSERT', 'UPDATE'])
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.passenger_unread_count, 1)
+        self.assertEqual(self.room.last_message.content, "Leaving now")
+
+
+    @override_settings(CHAT_WRITE_BEHIND=True, CHAT_WRITE_BEHIND_FLUSH_SECONDS=60)
+    def test_write_behind_broadcasts_first_and_flushes_in_bulk(self):
+        async def scenario():
+            socket = connect_as(self.room.driver, self.path)
+            await socket.connect()
+            for text in ("one", "two", "three"):
+                await socket.send_json_to({"message": text})
+                event = await socket.receive_json_from(timeout=5)
+                self.assertIsNone(event["id"])
+            await socket.disconnect()
+
+        async_to_sync(scenario)()
+        self.assertEqual(Message.objects.count(), 0)
+        self.assertEqual(message_buffer.flush(), 3)
+        self.assertEqual(
+            list(Message.objects.order_by('created_at').values_list('content', flat=True)),
+            ["one", "two", "three"],
+        )
+        self.room.refresh_from_db()
+        self.assertEqual(self.room.last_message.content, "three")
+        self.assertEqual(self.room.passenger_unread_count, 3)
+
+    def test_spooled_messages_are_replayed_once(self):
+        message = Message(chat_room=self.room, sender=self.room.passenger,
+                          content="Offline", client_id=uuid.uuid4())
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'spool.jsonl')
+            spool([message], path)
+            spool([message], path)
+            call_command('replay_chat_spool', path=path, stdout=StringIO())
+            self.assertFalse(os.path.exists(path))
+        self.assertEqual(Message.objects.filter(client_id=message.client_id).count(), 1)
+
+
+class ChatSyncTests(TestCase):
+    def setUp(self):
+        self.room = make_room()
+        self.client = APIClient()
+        self.client.force_authenticate(self.room.driver)
+
+    def send(self, user, content):
+        client = APIClient()
+        client.force_authenticate(user)
+        client.post(f'/api/chat/{self.room.id}/messages/', {'content': content}, format='json')
+
+    def sync(self, cursors):
+        return self.client.post('/api/chat/sync/', {'rooms': cursors}, format='json').data['rooms']
+
+    def test_only_changes_since_the_cursor_are_returned(self):
+        self.send(self.room.passenger, "first")
+        [room] = self.sync({})
+        self.assertEqual([m['content'] for m in room['messages']], ["first"])
+        cursors = {str(self.room.id): room['cursor']}
+
+        self.assertEqual(self.sync(cursors), [])
+
+        self.send(self.room.passenger, "second")
+        [room] = self.sync(cursors)
+        self.assertEqual([m['content'] for m in room['messages']], ["second"])
+        self.assertEqual(room['unread_count'], 2)
+
+
+class ChatRoomListTests(TestCase):
+    def setUp(self):
+        self.room = make_room()
+        booking = self.room.booking
+        self.rooms = [self.room]
+        for i in range(4):
+            passenger = User.objects.create_user(
+                email=f'p{i}@example.com', username=f'p{i}', password='pass1234', role='passenger'
+            )
+            other = Booking.objects.create(
+                ride=booking.ride, passenger=passenger, seats_booked=1, total_price=2000, status='confirmed'
+            )
+            self.rooms.append(ChatRoom.objects.create(booking=other, driver=self.room.driver, passenger=passenger))
+        # The oldest room has the latest message, so it must come first
+        ChatRoom.objects.filter(id=self.room.id).update(updated_at=timezone.now() + timedelta(minutes=5))
+        self.client = APIClient()
+        self.client.force_authenticate(self.room.driver)
+
+    def test_pages_follow_recent_activity_without_gaps(self):
+        ids, cursor = [], None
+        while True:
+            params = {'page_size': 2}
+            if cursor:
+                params['cursor'] = cursor
+            page = self.client.get('/api/chat/my-chats/', params).data
+            ids += [room['id'] for room in page['results']]
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+
+        unpaged = [room['id'] for room in self.client.get('/api/chat/my-chats/').data]
+        self.assertEqual(ids, unpaged)
+        self.assertEqual(ids[0], self.room.id)
+        self.assertEqual(sorted(ids), sorted(room.id for room in self.rooms))
+
+
+@unittest.skipUnless(REDIS_TEST_HOSTS, "CHANNEL_REDIS_TEST_HOSTS not set")
+class RedisChannelLayerTests(unittest.TestCase):
+    """Two layer instances stand in for two daphne workers"""
+
+    def make_layer(self):
+        from channels_redis.core import RedisChannelLayer
+        return RedisChannelLayer(hosts=REDIS_TEST_HOSTS, prefix='ishare-test')
+
+    def test_group_send_crosses_nodes(self):
+        async def scenario():
+            node_a = self.make_layer()
+            node_b = self.make_layer()
+            try:
+                for room_id in range(1, 6):
+                    group = f"chat_{room_id}"
+                    channel = await node_a.new_channel()
+                    await node_a.group_add(group, channel)
+                    await node_b.group_send(group, {"type": "chat_message", "message": f"hi {room_id}"})
+                    event = await node_a.receive(channel)
+                    self.assertEqual(event["message"], f"hi {room_id}")
+                    await node_a.group_discard(group, channel)
+            finally:
+                await node_a.flush()
+                await node_b.flush()
+                await node_a.close_pools()
+                await node_b.close_pools()
+
+        async_to_sync(scenario)()
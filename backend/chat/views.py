@@ -2,11 +2,15 @@ from rest_framework import generics, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db import models
+from django.db import models, transaction
 from .models import ChatRoom, Message
 from .serializers import ChatRoomSerializer, MessageSerializer
 from rides.models import Booking
 from rest_framework.exceptions import PermissionDenied
+from accounts.pagination import MessageHistoryPagination, UpdatedAtPagination
+from accounts.mixins import EagerLoadingViewMixin
+from django.conf import settings
+from .sync import decode_cursor, sync_rooms
 
 class GetOrCreateChatRoomView(APIView):
     """Get or create a chat room for a booking"""
@@ -54,25 +58,30 @@ class GetOrCreateChatRoomView(APIView):
             )
 
 
-class MyChatRoomsView(generics.ListAPIView):
+class MyChatRoomsView(EagerLoadingViewMixin, generics.ListAPIView):
     """Get all chat rooms for current user"""
     serializer_class = ChatRoomSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = UpdatedAtPagination
 
     def get_queryset(self):
         user = self.request.user
+        # Same order as the paginator, so paged and unpaged lists agree
         return ChatRoom.objects.filter(
             models.Q(driver=user) | models.Q(passenger=user)
-        ).select_related('driver', 'passenger', 'booking', 'booking__ride')
+        ).select_related(
+            'driver', 'passenger', 'booking', 'booking__ride', 'last_message__sender'
+        ).order_by('-updated_at', '-id')
 
     def get_serializer_context(self):
         return {'request': self.request}
 
 
-class ChatMessagesView(generics.ListCreateAPIView):
+class ChatMessagesView(EagerLoadingViewMixin, generics.ListCreateAPIView):
     """Get messages for a chat room and send new messages"""
     serializer_class = MessageSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = MessageHistoryPagination
 
     def get_queryset(self):
         chat_room_id = self.kwargs.get('chat_room_id')
@@ -100,10 +109,12 @@ class ChatMessagesView(generics.ListCreateAPIView):
             if self.request.user != chat_room.driver and self.request.user != chat_room.passenger:
                 raise PermissionError("You don't have access to this chat")
             
-            serializer.save(
-                chat_room=chat_room,
-                sender=self.request.user
-            )
+            with transaction.atomic():
+                message = serializer.save(
+                    chat_room=chat_room,
+                    sender=self.request.user
+                )
+                ChatRoom.objects.record_messages(chat_room, [message])
             
         except ChatRoom.DoesNotExist:
             raise ValueError("Chat room not found")
@@ -125,10 +136,7 @@ class MarkMessagesAsReadView(APIView):
                 )
             
             # Mark all messages NOT sent by current user as read
-            Message.objects.filter(
-                chat_room=chat_room,
-                is_read=False
-            ).exclude(sender=request.user).update(is_read=True)
+            chat_room.mark_read_by(request.user)
             
             return Response({"message": "Messages marked as read"})
             
@@ -136,4 +144,53 @@ class MarkMessagesAsReadView(APIView):
             return Response(
                 {"error": "Chat room not found"},
                 status=status.HTTP_404_NOT_FOUND
-            )
\ No newline at end of file
+            )
+
+
+class ChatSyncView(APIView):
+    """
+    Catch up on every chat room in one request after reconnecting.
+
+    POST {"rooms": {"<room id>": "<cursor>", ...}, "limit": 50}. Rooms the
+    client has no cursor for are included with their latest messages; rooms
+    with nothing new are left out. Store the returned cursor per room.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        rooms = request.data.get('rooms') or {}
+        if not isinstance(rooms, dict):
+            return Response(
+                {"error": "rooms must be an object of room id to cursor"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            cursors = {int(room_id): decode_cursor(cursor) for room_id, cursor in rooms.items()}
+        except (ValueError, TypeError):
+            return Response(
+                {"error": "Invalid room id or cursor"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            limit = int(request.data.get('limit', settings.API_PAGE_SIZE))
+        except (TypeError, ValueError):
+            limit = settings.API_PAGE_SIZE
+        limit = max(1, min(limit, settings.API_MAX_PAGE_SIZE))
+
+        results = []
+        for room, messages, has_more, cursor in sync_rooms(request.user, cursors, limit):
+            results.append({
+                'id': room.id,
+                'cursor': cursor,
+                'messages': MessageSerializer(messages, many=True).data,
+                'has_more': has_more,
+                'unread_count': room.unread_count_for(request.user),
+                'read_up_to': {
+                    'driver': room.driver_read_up_to,
+                    'passenger': room.passenger_read_up_to,
+                },
+            })
+
+        return Response({'rooms': results})
@@ -2,17 +2,22 @@ import os
 from channels.routing import ProtocolTypeRouter, URLRouter
 from django.core.asgi import get_asgi_application
 from channels.auth import AuthMiddlewareStack
-import chat.routing
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 django_asgi_app = get_asgi_application()
 
+# Imported after Django is set up; consumers and middleware load models
+import chat.routing
+from chat.middleware import JWTAuthMiddleware
+
 application = ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AuthMiddlewareStack(
-        URLRouter(
-            chat.routing.websocket_urlpatterns
+        JWTAuthMiddleware(
+            URLRouter(
+                chat.routing.websocket_urlpatterns
+            )
         )
     ),
 })
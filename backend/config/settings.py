@@ -34,6 +34,8 @@ INSTALLED_APPS = [
     'chat',
     'channels',
     'wallet',
+    'jobs',
+    'metrics',
     
     
 
@@ -106,6 +108,82 @@ REST_FRAMEWORK = {
     ),
 }
 
+# Shared cache: Redis when REDIS_URL is set, per-process memory otherwise
+REDIS_URL = config('REDIS_URL', default='')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            # Live location tracks and trails need more than the default 300
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
+
+# Lifetime of a cached ride search result (also its time bucket)
+RIDE_SEARCH_CACHE_SECONDS = config('RIDE_SEARCH_CACHE_SECONDS', default=60, cast=int)
+
+# How long seats stay reserved while a MoMo payment completes
+SEAT_HOLD_TTL_SECONDS = config('SEAT_HOLD_TTL_SECONDS', default=300, cast=int)
+
+# Extra time a hold whose MoMo payment is still pending keeps its seats
+# before the sweeper expires it
+SEAT_HOLD_PAYMENT_GRACE_SECONDS = config('SEAT_HOLD_PAYMENT_GRACE_SECONDS', default=600, cast=int)
+
+# How long before departure drivers and passengers get a ride reminder
+RIDE_REMINDER_LEAD_MINUTES = config('RIDE_REMINDER_LEAD_MINUTES', default=60, cast=int)
+
+# Live locations (see rides.location): points kept per track, minimum gap
+# between stored/pushed pings, key lifetime, and how long a ride's
+# participant list is cached
+LOCATION_BUFFER_SIZE = config('LOCATION_BUFFER_SIZE', default=30, cast=int)
+LOCATION_MIN_INTERVAL_SECONDS = config('LOCATION_MIN_INTERVAL_SECONDS', default=2, cast=int)
+LOCATION_TTL_SECONDS = config('LOCATION_TTL_SECONDS', default=3600, cast=int)
+LOCATION_CONTEXT_SECONDS = config('LOCATION_CONTEXT_SECONDS', default=60, cast=int)
+# Pickup/drop-off geofences (see rides.geofence)
+GEOFENCE_ARRIVING_METERS = config('GEOFENCE_ARRIVING_METERS', default=500, cast=int)
+GEOFENCE_AT_METERS = config('GEOFENCE_AT_METERS', default=75, cast=int)
+
+# Driver trails for completed rides (see rides.trails): how long raw points
+# wait in the cache for completion, and how far the stored route may stray
+# from them
+RIDE_TRAIL_TTL_SECONDS = config('RIDE_TRAIL_TTL_SECONDS', default=6 * 3600, cast=int)
+RIDE_TRAIL_TOLERANCE_METERS = config('RIDE_TRAIL_TOLERANCE_METERS', default=15, cast=float)
+
+# Recurring rides: days of concrete Ride rows kept ahead of now, and how far
+# ahead search returns virtual occurrences (default / maximum)
+RIDE_SCHEDULE_WINDOW_DAYS = config('RIDE_SCHEDULE_WINDOW_DAYS', default=14, cast=int)
+RIDE_SCHEDULE_SEARCH_DAYS = config('RIDE_SCHEDULE_SEARCH_DAYS', default=60, cast=int)
+RIDE_SCHEDULE_MAX_SEARCH_DAYS = config('RIDE_SCHEDULE_MAX_SEARCH_DAYS', default=365, cast=int)
+
+# Background jobs (see jobs.queue). Run eagerly in-process when no worker
+# is available, e.g. local development.
+JOBS_RUN_EAGERLY = config('JOBS_RUN_EAGERLY', default=False, cast=bool)
+JOBS_MAX_ATTEMPTS = config('JOBS_MAX_ATTEMPTS', default=5, cast=int)
+JOBS_LOCK_TIMEOUT_SECONDS = config('JOBS_LOCK_TIMEOUT_SECONDS', default=600, cast=int)
+JOBS_RETRY_BASE_SECONDS = config('JOBS_RETRY_BASE_SECONDS', default=30, cast=int)
+JOBS_RETRY_MAX_SECONDS = config('JOBS_RETRY_MAX_SECONDS', default=3600, cast=int)
+
+# Admin dashboard snapshot (see accounts.dashboard): served as is while
+# fresh, served stale while one job rebuilds it, recomputed inline past the
+# max stale age
+ADMIN_DASHBOARD_FRESH_SECONDS = config('ADMIN_DASHBOARD_FRESH_SECONDS', default=60, cast=int)
+ADMIN_DASHBOARD_MAX_STALE_SECONDS = config('ADMIN_DASHBOARD_MAX_STALE_SECONDS', default=900, cast=int)
+ADMIN_DASHBOARD_REFRESH_TIMEOUT_SECONDS = config('ADMIN_DASHBOARD_REFRESH_TIMEOUT_SECONDS', default=120, cast=int)
+
+# Page size for keyset-paginated list endpoints (see accounts.pagination)
+API_PAGE_SIZE = config('API_PAGE_SIZE', default=20, cast=int)
+API_MAX_PAGE_SIZE = config('API_MAX_PAGE_SIZE', default=100, cast=int)
+# Lists requested without cursor/page_size (older app versions) stop here
+API_UNPAGED_MAX_ITEMS = config('API_UNPAGED_MAX_ITEMS', default=200, cast=int)
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(days=1),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
@@ -174,9 +252,41 @@ ASGI_APPLICATION = "config.asgi.application"
 
 USE_MOCK_PAYMENT = True
 
-CHANNEL_LAYERS = {
-    "default": {
-        "BACKEND": "channels.layers.InMemoryChannelLayer"
+# Websocket fan-out. With several daphne workers every node must share a
+# Redis layer; list more than one host to shard channels and groups across
+# them. Without Redis, groups only reach sockets on the same process.
+CHANNEL_REDIS_HOSTS = [
+    host.strip()
+    for host in config('CHANNEL_REDIS_HOSTS', default=REDIS_URL).split(',')
+    if host.strip()
+]
+
+if CHANNEL_REDIS_HOSTS:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels_redis.core.RedisChannelLayer",
+            "CONFIG": {
+                "hosts": CHANNEL_REDIS_HOSTS,
+                "prefix": config('CHANNEL_REDIS_PREFIX', default='ishare'),
+                "capacity": config('CHANNEL_LAYER_CAPACITY', default=1000, cast=int),
+                "expiry": config('CHANNEL_LAYER_EXPIRY_SECONDS', default=60, cast=int),
+            },
+        }
     }
-}
+else:
+    CHANNEL_LAYERS = {
+        "default": {
+            "BACKEND": "channels.layers.InMemoryChannelLayer"
+        }
+    }
+# Chat write-behind (see chat.buffer): broadcast first and insert messages in
+# batches of up to BATCH_SIZE, at most FLUSH_SECONDS later. Batches that
+# can't be written go to the spool file; replay it with replay_chat_spool.
+CHAT_WRITE_BEHIND = config('CHAT_WRITE_BEHIND', default=False, cast=bool)
+CHAT_WRITE_BEHIND_BATCH_SIZE = config('CHAT_WRITE_BEHIND_BATCH_SIZE', default=200, cast=int)
+CHAT_WRITE_BEHIND_FLUSH_SECONDS = config('CHAT_WRITE_BEHIND_FLUSH_SECONDS', default=0.25, cast=float)
+CHAT_WRITE_BEHIND_SPOOL_PATH = config(
+    'CHAT_WRITE_BEHIND_SPOOL_PATH', default=os.path.join(BASE_DIR, 'chat_spool.jsonl')
+)
+
 CSRF_TRUSTED_ORIGINS = [origin for origin in config('CSRF_TRUSTED_ORIGINS', default='').split(',') if origin]
\ No newline at end of file
@@ -0,0 +1,15 @@
+from django.contrib import admin
+from .models import Job, DeadLetterJob
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ("task", "status", "attempts", "run_at", "locked_by")
+    list_filter = ("status", "task")
+
+
+@admin.register(DeadLetterJob)
+class DeadLetterJobAdmin(admin.ModelAdmin):
+    list_display = ("task", "attempts", "failed_at")
+    list_filter = ("task",)
+    search_fields = ("last_error",)
@@ -0,0 +1,35 @@
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs.queue import claim_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (push notifications, emails, ...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--sleep', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true',
+                            help='Process the currently due jobs and exit')
+
+    def handle(self, *args, **options):
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stdout.write(f"Job worker {worker_id} started")
+
+        while True:
+            close_old_connections()
+            jobs = claim_jobs(worker_id, options['batch_size'])
+            succeeded = sum(run_job(job) for job in jobs)
+            if jobs:
+                self.stdout.write(f"Ran {len(jobs)} jobs ({succeeded} succeeded)")
+
+            if options['once'] and not jobs:
+                break
+            if not jobs:
+                time.sleep(options['sleep'])
@@ -0,0 +1,149 @@
+"""
+Database-backed job queue (transactional outbox).
+
+Request handlers call `enqueue()`, which is a single INSERT in the same
+transaction as the rest of the request, and return. `manage.py run_jobs`
+claims due jobs in batches and runs the registered task functions, retrying
+with exponential backoff and moving jobs that keep failing to DeadLetterJob.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job, DeadLetterJob
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+class PartialFailure(Exception):
+    """
+    Raised by a task that finished part of its work; the job is retried
+    (or dead-lettered) with `payload` holding only what is left to do.
+    """
+    def __init__(self, message, payload):
+        super().__init__(message)
+        self.payload = payload
+
+
+def task(name):
+    """Register a function as a background task under `name`"""
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def get_task(name):
+    return _registry[name]
+
+
+def enqueue(name, run_at=None, max_attempts=None, **payload):
+    """
+    Queue a task. Payload values must be JSON-serializable (pass ids, not
+    model instances). With JOBS_RUN_EAGERLY the task runs inline instead,
+    which is handy in development when no worker is running.
+    """
+    if settings.JOBS_RUN_EAGERLY:
+        try:
+            get_task(name)(**payload)
+        except Exception:
+            logger.exception("Eager job %s failed", name)
+        return None
+
+    return Job.objects.create(
+        task=name,
+        payload=payload,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+
+def _due_jobs(now):
+    stale = now - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT_SECONDS)
+    # Jobs left "running" by a worker that died are picked up again
+    return Q(status='pending', run_at__lte=now) | Q(status='running', locked_at__lt=stale)
+
+
+def claim_jobs(worker_id, batch_size):
+    """
+    Atomically mark up to batch_size due jobs as ours and return them.
+
+    On Postgres this is SELECT ... FOR UPDATE SKIP LOCKED, so workers never
+    block on each other. SQLite has no row locks; there we claim with a
+    conditional UPDATE, which only touches rows that are still due.
+    """
+    now = timezone.now()
+    due = _due_jobs(now)
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                Job.objects.select_for_update(skip_locked=True)
+                .filter(due)
+                .order_by('run_at')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            Job.objects.filter(id__in=ids).update(
+                status='running', locked_at=now, locked_by=worker_id
+            )
+    else:
+        ids = list(
+            Job.objects.filter(due).order_by('run_at').values_list('id', flat=True)[:batch_size]
+        )
+        Job.objects.filter(due, id__in=ids).update(
+            status='running', locked_at=now, locked_by=worker_id
+        )
+
+    return list(Job.objects.filter(id__in=ids, locked_by=worker_id, locked_at=now))
+
+
+def backoff_delay(attempts):
+    """Exponential backoff with jitter, capped"""
+    delay = settings.JOBS_RETRY_BASE_SECONDS * (2 ** (attempts - 1))
+    delay = min(delay, settings.JOBS_RETRY_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def run_job(job):
+    """Run one claimed job; returns True if it succeeded"""
+    try:
+        get_task(job.task)(**job.payload)
+    except Exception as e:
+        job.attempts += 1
+        if isinstance(e, PartialFailure):
+            job.payload = e.payload
+        job.last_error = f"{e!r}\n{traceback.format_exc()}"
+        logger.warning("Job %s #%s failed (attempt %s): %r", job.task, job.id, job.attempts, e)
+
+        if job.attempts >= job.max_attempts:
+            with transaction.atomic():
+                DeadLetterJob.objects.create(
+                    task=job.task,
+                    payload=job.payload,
+                    attempts=job.attempts,
+                    last_error=job.last_error,
+                    created_at=job.created_at,
+                )
+                job.delete()
+        else:
+            Job.objects.filter(id=job.id).update(
+                status='pending',
+                payload=job.payload,
+                attempts=job.attempts,
+                last_error=job.last_error,
+                run_at=timezone.now() + backoff_delay(job.attempts),
+                locked_at=None,
+                locked_by='',
+            )
+        return False
+
+    job.delete()
+    return True
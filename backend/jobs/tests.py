@@ -0,0 +1,83 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import Job, DeadLetterJob
+from .queue import claim_jobs, enqueue, run_job, task
+
+calls = []
+
+
+@task('jobs.tests.record')
+def record(**payload):
+    calls.append(payload)
+
+
+@task('jobs.tests.fail')
+def fail(**payload):
+    raise RuntimeError("boom")
+
+
+@override_settings(
+    JOBS_RUN_EAGERLY=False, JOBS_MAX_ATTEMPTS=3,
+    JOBS_RETRY_BASE_SECONDS=10, JOBS_RETRY_MAX_SECONDS=25,
+)
+@mock.patch.object(connection.features, 'has_select_for_update_skip_locked', False)
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def claim(self, worker='worker-1'):
+        return claim_jobs(worker, batch_size=10)
+
+    def make_due(self, job):
+        Job.objects.filter(id=job.id).update(run_at=timezone.now() - timedelta(seconds=1))
+
+    def test_claimed_job_runs_once(self):
+        enqueue('jobs.tests.record', user_id=7)
+
+        jobs = self.claim()
+        self.assertEqual([job.status for job in jobs], ['running'])
+        self.assertEqual(self.claim('worker-2'), [])
+
+        self.assertTrue(run_job(jobs[0]))
+        self.assertEqual(calls, [{'user_id': 7}])
+        self.assertFalse(Job.objects.exists())
+
+    def test_failing_job_backs_off_then_dead_letters(self):
+        job = enqueue('jobs.tests.fail', user_id=7)
+
+        for attempt, delay in ((1, 10), (2, 20)):
+            before = timezone.now()
+            self.assertFalse(run_job(self.claim()[0]))
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts), ('pending', attempt))
+            self.assertIn('boom', job.last_error)
+            self.assertGreaterEqual(job.run_at, before + timedelta(seconds=delay * 0.8))
+            self.assertLessEqual(job.run_at, timezone.now() + timedelta(seconds=delay * 1.2))
+            self.assertEqual(self.claim(), [])
+            self.make_due(job)
+
+        self.assertFalse(run_job(self.claim()[0]))
+        self.assertFalse(Job.objects.exists())
+        dead = DeadLetterJob.objects.get()
+        self.assertEqual((dead.task, dead.payload, dead.attempts), ('jobs.tests.fail', {'user_id': 7}, 3))
+
+    def test_backoff_is_capped(self):
+        job = enqueue('jobs.tests.fail', max_attempts=10)
+        Job.objects.filter(id=job.id).update(attempts=5)
+
+        before = timezone.now()
+        run_job(self.claim()[0])
+        job.refresh_from_db()
+        self.assertLessEqual(job.run_at, before + timedelta(seconds=25 * 1.2 + 1))
+
+    def test_job_of_a_dead_worker_is_claimed_again(self):
+        job = enqueue('jobs.tests.record')
+        self.claim()
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual([j.id for j in self.claim('worker-2')], [job.id])
@@ -0,0 +1,20 @@
+from django.contrib import admin
+from .models import DailyMetrics, DriverStats, DriverDailyStats
+
+
+@admin.register(DailyMetrics)
+class DailyMetricsAdmin(admin.ModelAdmin):
+    list_display = ("date", "revenue", "bookings", "new_users", "rides_created", "rides_completed")
+    date_hierarchy = "date"
+
+
+@admin.register(DriverStats)
+class DriverStatsAdmin(admin.ModelAdmin):
+    list_display = ("driver", "completed_rides", "earnings", "updated_at")
+    search_fields = ("driver__email",)
+
+
+@admin.register(DriverDailyStats)
+class DriverDailyStatsAdmin(admin.ModelAdmin):
+    list_display = ("driver", "date", "completed_rides", "earnings")
+    date_hierarchy = "date"
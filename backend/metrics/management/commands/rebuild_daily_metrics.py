@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from metrics import rollup
+
+
+class Command(BaseCommand):
+    help = "Recompute DailyMetrics rows from bookings, users and rides (backfills, repairs)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=400, help="Rebuild this many days up to today")
+        parser.add_argument('--since', help="Rebuild from this date (YYYY-MM-DD) up to today instead")
+
+    def handle(self, *args, **options):
+        start, end = rollup.date_range(options['days'])
+        if options['since']:
+            try:
+                start = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError("--since must be a YYYY-MM-DD date")
+
+        written = rollup.rebuild(start, end)
+        self.stdout.write(f"Rebuilt daily metrics for {start} to {end}: {written} day(s) with activity")
@@ -0,0 +1,31 @@
+# Generated by Django 4.2 on 2026-10-17 21:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('bookings', models.IntegerField(default=0)),
+                ('new_users', models.IntegerField(default=0)),
+                ('rides_created', models.IntegerField(default=0)),
+                ('rides_completed', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'daily metrics',
+                'ordering': ['date'],
+            },
+        ),
+    ]
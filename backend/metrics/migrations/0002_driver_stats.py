@@ -0,0 +1,58 @@
+# Generated by Django 4.2 on 2026-10-17 21:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_user_flagged_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('metrics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriverDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('completed_rides', models.IntegerField(default=0)),
+                ('earnings', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+            options={
+                'verbose_name_plural': 'driver daily stats',
+            },
+        ),
+        migrations.CreateModel(
+            name='DriverStats',
+            fields=[
+                ('driver', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='driver_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('completed_rides', models.IntegerField(default=0)),
+                ('earnings', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'driver stats',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='driverstats',
+            index=models.Index(fields=['-earnings', '-driver'], name='metrics_driver_leaderboard'),
+        ),
+        migrations.AddField(
+            model_name='driverdailystats',
+            name='driver',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='driver_daily_stats', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='driverdailystats',
+            index=models.Index(fields=['date', 'driver'], name='metrics_dri_date_030d78_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='driverdailystats',
+            constraint=models.UniqueConstraint(fields=('driver', 'date'), name='unique_driver_day'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import migrations
+from django.db.models import Max, Min
+from django.utils import timezone
+
+
+def backfill_rollups(apps, schema_editor):
+    from metrics import rollup
+
+    User = apps.get_model('accounts', 'User')
+    Ride = apps.get_model('rides', 'Ride')
+    Booking = apps.get_model('rides', 'Booking')
+
+    earliest = [
+        User.objects.aggregate(first=Min('date_joined'))['first'],
+        Ride.objects.aggregate(first=Min('created_at'))['first'],
+        Ride.objects.aggregate(first=Min('departure_time'))['first'],
+        Booking.objects.aggregate(first=Min('created_at'))['first'],
+    ]
+    earliest = [moment for moment in earliest if moment is not None]
+    if not earliest:
+        return
+    # Completed rides count on their departure day, which may be after today
+    last_departure = Ride.objects.filter(status='completed').aggregate(last=Max('departure_time'))['last']
+    end = max(timezone.now(), last_departure or timezone.now())
+    rollup.rebuild(rollup.day_of(min(earliest)), rollup.day_of(end), apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('metrics', '0002_driver_stats'),
+        ('rides', '0012_booking_stop_points'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.db import models
+
+
+class DailyMetrics(models.Model):
+    """
+    Per-day totals for the admin dashboard, kept up to date in place by
+    metrics.rollup as bookings and rides change state.
+
+    revenue/bookings count paid (confirmed or completed) bookings on the day
+    they were made; rides_completed counts completed rides on their
+    departure day.
+    """
+    date = models.DateField(unique=True)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    bookings = models.IntegerField(default=0)
+    new_users = models.IntegerField(default=0)
+    rides_created = models.IntegerField(default=0)
+    rides_completed = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['date']
+        verbose_name_plural = 'daily metrics'
+
+    def __str__(self):
+        return f"Metrics for {self.date}"
+
+
+class DriverStats(models.Model):
+    """
+    All-time leaderboard figures per driver, kept by metrics.rollup when
+    rides complete. Earnings are the completed bookings of completed rides.
+    """
+    driver = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='driver_stats'
+    )
+    completed_rides = models.IntegerField(default=0)
+    earnings = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'driver stats'
+        indexes = [
+            models.Index(fields=['-earnings', '-driver'], name='metrics_driver_leaderboard'),
+        ]
+
+    def __str__(self):
+        return f"Stats for {self.driver_id}"
+
+
+class DriverDailyStats(models.Model):
+    """Per-driver, per-day figures (by departure day) for windowed leaderboards"""
+    driver = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='driver_daily_stats'
+    )
+    date = models.DateField()
+    completed_rides = models.IntegerField(default=0)
+    earnings = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        verbose_name_plural = 'driver daily stats'
+        constraints = [
+            models.UniqueConstraint(fields=['driver', 'date'], name='unique_driver_day'),
+        ]
+        indexes = [
+            models.Index(fields=['date', 'driver']),
+        ]
+
+    def __str__(self):
+        return f"Stats for {self.driver_id} on {self.date}"
@@ -0,0 +1,173 @@
+"""
+Incremental updates to the DailyMetrics and driver stats rollups.
+
+Every change is an UPDATE ... SET field = field + delta on the row
+(created on first use), so concurrent requests never lose increments and
+nothing is recomputed from the raw tables. Call these inside the same
+transaction as the state change they describe. rebuild() recomputes a date
+range from the raw tables (and the all-time driver stats), for backfills and
+after bulk edits.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.apps import apps as global_apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DailyMetrics, DriverStats, DriverDailyStats
+
+PAID_STATUSES = ('confirmed', 'completed')
+
+def day_of(moment=None):
+    return timezone.localdate(moment) if moment is not None else timezone.localdate()
+
+
+def _increment(model, lookup, deltas):
+    """UPDATE the row matching lookup by deltas, creating it if needed"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**lookup).update(**updates):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        # Another request created the row first
+        model.objects.filter(**lookup).update(**updates)
+
+
+def add(day, **deltas):
+    """Add deltas to one day's counters"""
+    _increment(DailyMetrics, {'date': day}, deltas)
+
+
+def count_bookings(bookings, sign):
+    """Count bookings in (sign=1) or out of (sign=-1) paid revenue"""
+    per_day = defaultdict(lambda: [Decimal('0'), 0])
+    for booking in bookings:
+        totals = per_day[day_of(booking.created_at)]
+        totals[0] += booking.total_price
+        totals[1] += 1
+    for day, (revenue, count) in per_day.items():
+        add(day, revenue=sign * revenue, bookings=sign * count)
+
+
+def booking_status_changed(booking, old_status, new_status):
+    sign = (new_status in PAID_STATUSES) - (old_status in PAID_STATUSES)
+    if sign:
+        count_bookings([booking], sign)
+
+
+def user_joined(user):
+    add(day_of(user.date_joined), new_users=1)
+
+
+def rides_created(count, day=None):
+    add(day or day_of(), rides_created=count)
+
+
+def ride_completed(ride, earnings):
+    """A ride completed with `earnings` from its completed bookings"""
+    day = day_of(ride.departure_time)
+    add(day, rides_completed=1)
+    _increment(DriverDailyStats, {'driver_id': ride.driver_id, 'date': day},
+               {'completed_rides': 1, 'earnings': earnings})
+    _increment(DriverStats, {'driver_id': ride.driver_id},
+               {'completed_rides': 1, 'earnings': earnings})
+
+
+def rebuild(start, end, apps=global_apps):
+    """
+    Recompute every day from start to end (inclusive) from the raw tables
+    and replace their rows. Returns the number of days written. Migrations
+    pass their historical `apps`.
+    """
+    User = apps.get_model('accounts', 'User')
+    Booking = apps.get_model('rides', 'Booking')
+    Ride = apps.get_model('rides', 'Ride')
+    DailyMetrics = apps.get_model('metrics', 'DailyMetrics')
+
+    days = {}
+
+    def collect(queryset, date_field, **aggregates):
+        rows = (
+            queryset.filter(**{f'{date_field}__date__gte': start, f'{date_field}__date__lte': end})
+            .annotate(day=TruncDate(date_field)).values('day')
+            .annotate(**aggregates).order_by()
+        )
+        for row in rows:
+            totals = days.setdefault(row.pop('day'), {})
+            totals.update(row)
+
+    collect(
+        Booking.objects.filter(status__in=PAID_STATUSES), 'created_at',
+        revenue=Sum('total_price'), bookings=Count('id'),
+    )
+    collect(User.objects.all(), 'date_joined', new_users=Count('id'))
+    collect(Ride.objects.all(), 'created_at', rides_created=Count('id'))
+    collect(Ride.objects.filter(status='completed'), 'departure_time', rides_completed=Count('id'))
+
+    with transaction.atomic():
+        DailyMetrics.objects.filter(date__gte=start, date__lte=end).delete()
+        DailyMetrics.objects.bulk_create([
+            DailyMetrics(date=day, **totals) for day, totals in sorted(days.items())
+        ])
+        _rebuild_driver_stats(start, end, apps)
+    return len(days)
+
+
+def _driver_totals(rides, bookings, *group_by):
+    """{key: [completed_rides, earnings]} grouped by driver and group_by"""
+    totals = defaultdict(lambda: [0, Decimal('0')])
+    rows = rides.values('driver_id', *group_by).annotate(n=Count('id')).order_by()
+    for row in rows:
+        totals[tuple(row[field] for field in ('driver_id',) + group_by)][0] = row['n']
+    rows = (
+        bookings.annotate(driver_id=F('ride__driver_id'))
+        .values('driver_id', *group_by).annotate(total=Sum('total_price')).order_by()
+    )
+    for row in rows:
+        totals[tuple(row[field] for field in ('driver_id',) + group_by)][1] = row['total'] or Decimal('0')
+    return totals
+
+
+def _rebuild_driver_stats(start, end, apps):
+    Booking = apps.get_model('rides', 'Booking')
+    Ride = apps.get_model('rides', 'Ride')
+    DriverStats = apps.get_model('metrics', 'DriverStats')
+    DriverDailyStats = apps.get_model('metrics', 'DriverDailyStats')
+
+    rides = Ride.objects.filter(status='completed')
+    bookings = Booking.objects.filter(status='completed', ride__status='completed')
+
+    daily = _driver_totals(
+        rides.filter(departure_time__date__gte=start, departure_time__date__lte=end)
+        .annotate(day=TruncDate('departure_time')),
+        bookings.filter(ride__departure_time__date__gte=start, ride__departure_time__date__lte=end)
+        .annotate(day=TruncDate('ride__departure_time')),
+        'day',
+    )
+    DriverDailyStats.objects.filter(date__gte=start, date__lte=end).delete()
+    DriverDailyStats.objects.bulk_create([
+        DriverDailyStats(driver_id=driver_id, date=day, completed_rides=n, earnings=earnings)
+        for (driver_id, day), (n, earnings) in daily.items()
+    ])
+
+    # All-time figures don't depend on the window, so recompute them fully
+    DriverStats.objects.all().delete()
+    DriverStats.objects.bulk_create([
+        DriverStats(driver_id=driver_id, completed_rides=n, earnings=earnings)
+        for (driver_id,), (n, earnings) in _driver_totals(rides, bookings).items()
+    ])
+
+
+def date_range(days):
+    """(start, end) covering the last `days` days including today"""
+    end = day_of()
+    return end - timedelta(days=days - 1), end
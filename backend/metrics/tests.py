@@ -0,0 +1,68 @@
+from datetime import date, timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User, Subscription
+from rides.models import Ride
+from . import rollup
+from .models import DailyMetrics, DriverStats, DriverDailyStats
+
+
+def make_user(email, role):
+    user = User.objects.create_user(
+        email=email, username=email.split('@')[0], password='pass1234', role=role
+    )
+    Subscription.objects.create(
+        user=user, plan_type=role, expiry_date=date.today() + timedelta(days=30)
+    )
+    return user
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.driver = make_user('driver@example.com', 'driver')
+        self.ride = Ride.objects.create(
+            driver=self.driver,
+            start_location='Kigali',
+            destination='Musanze',
+            departure_time=timezone.now() + timedelta(days=1),
+            price_per_seat=2000,
+            available_seats=3,
+        )
+        self.driver_client = APIClient()
+        self.driver_client.force_authenticate(self.driver)
+
+    def book(self, email):
+        client = APIClient()
+        client.force_authenticate(make_user(email, 'passenger'))
+        return client.post('/api/rides/book/', {
+            'ride': self.ride.id, 'seats_booked': 1, 'payment_confirmed': True,
+        }, format='json').data['id']
+
+    def snapshot(self):
+        # new_users and rides_created are counted by the sign-up and ride
+        # views, which these fixtures bypass
+        return (
+            sorted(DailyMetrics.objects.values_list('date', 'revenue', 'bookings', 'rides_completed')),
+            sorted(DriverDailyStats.objects.values_list('driver_id', 'date', 'completed_rides', 'earnings')),
+            sorted(DriverStats.objects.values_list('driver_id', 'completed_rides', 'earnings')),
+        )
+
+    def test_incremental_rollup_matches_a_rebuild(self):
+        cancelled = self.book('first@example.com')
+        kept = self.book('second@example.com')
+        for booking_id in (cancelled, kept):
+            self.driver_client.post(f'/api/rides/bookings/{booking_id}/accept/')
+        self.driver_client.post(f'/api/rides/booking/{cancelled}/update/', {'status': 'cancelled'})
+
+        today = rollup.day_of()
+        self.assertEqual(DailyMetrics.objects.get(date=today).bookings, 1)
+
+        self.assertEqual(self.driver_client.post(f'/api/rides/complete/{self.ride.id}/').status_code, 200)
+        incremental = self.snapshot()
+
+        rollup.rebuild(today - timedelta(days=1), today + timedelta(days=2))
+        self.assertEqual(self.snapshot(), incremental)
+        self.assertEqual(DriverStats.objects.get().completed_rides, 1)
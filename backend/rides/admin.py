@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Ride, Booking, Rating
+from .models import Ride, Booking, Rating, SeatHold, RideSchedule
+from . import search_cache
 
 
 @admin.register(Ride)
@@ -15,6 +16,11 @@ class RideAdmin(admin.ModelAdmin):
     list_filter = ("status", "departure_time")
     search_fields = ("start_location", "destination", "driver__email")
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Admins cancel rides from here, so drop any cached searches showing it
+        search_cache.invalidate_ride(obj)
+
 
 @admin.register(Booking)
 class BookingAdmin(admin.ModelAdmin):
@@ -34,3 +40,17 @@ class RatingAdmin(admin.ModelAdmin):
     list_display = ("reviewer", "reviewee", "score", "created_at")
     list_filter = ("score",)
     search_fields = ("reviewer__email", "reviewee__email")
+
+
+@admin.register(SeatHold)
+class SeatHoldAdmin(admin.ModelAdmin):
+    list_display = ("passenger", "ride", "seats", "status", "expires_at")
+    list_filter = ("status",)
+    search_fields = ("passenger__email", "payment_reference")
+
+
+@admin.register(RideSchedule)
+class RideScheduleAdmin(admin.ModelAdmin):
+    list_display = ("driver", "start_location", "destination", "schedule_type", "end_date", "materialized_until", "is_active")
+    list_filter = ("schedule_type", "is_active")
+    search_fields = ("start_location", "destination", "driver__email")
@@ -0,0 +1,118 @@
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+
+GEOHASH_PRECISION = 9
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_BASE32_INDEX = {c: i for i, c in enumerate(_BASE32)}
+
+# Approximate height (the shorter side) of a geohash cell in km, by precision.
+# A circle of radius r fits inside the 3x3 block around its centre cell as long
+# as r is no bigger than one cell, so these drive the precision we search at.
+_CELL_MIN_SIDE_KM = {
+    1: 4992.6,
+    2: 624.1,
+    3: 156.0,
+    4: 19.5,
+    5: 4.89,
+    6: 0.61,
+    7: 0.153,
+}
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Encode a coordinate pair as a geohash string"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        rng, value = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return ''.join(chars)
+
+
+def decode_geohash_bbox(geohash):
+    """Return (min_lat, min_lng, max_lat, max_lng) of a geohash cell"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+
+    for char in geohash:
+        value = _BASE32_INDEX[char]
+        for shift in range(4, -1, -1):
+            rng = lng_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+
+    return lat_range[0], lng_range[0], lat_range[1], lng_range[1]
+
+
+def neighbouring_cells(geohash):
+    """Return the cell itself plus its (up to) eight neighbours"""
+    min_lat, min_lng, max_lat, max_lng = decode_geohash_bbox(geohash)
+    height = max_lat - min_lat
+    width = max_lng - min_lng
+    centre_lat = (min_lat + max_lat) / 2
+    centre_lng = (min_lng + max_lng) / 2
+
+    cells = []
+    for d_lat in (-1, 0, 1):
+        lat = centre_lat + d_lat * height
+        if lat < -90 or lat > 90:
+            continue
+        for d_lng in (-1, 0, 1):
+            lng = centre_lng + d_lng * width
+            lng = (lng + 180) % 360 - 180
+            cell = encode_geohash(lat, lng, len(geohash))
+            if cell not in cells:
+                cells.append(cell)
+    return cells
+
+
+def precision_for_radius(radius_km):
+    """Finest geohash precision whose cells are still at least radius_km tall"""
+    best = 1
+    for precision, side in sorted(_CELL_MIN_SIDE_KM.items()):
+        if side >= radius_km:
+            best = precision
+    return best
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """Geohash prefixes that together cover a circle around a point"""
+    precision = precision_for_radius(radius_km)
+    return neighbouring_cells(encode_geohash(latitude, longitude, precision))
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance between two points in km"""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    d_phi = math.radians(lat2 - lat1)
+    d_lambda = math.radians(lng2 - lng1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
@@ -0,0 +1,168 @@
+"""
+Pickup and drop-off geofences for rides in progress.
+
+Each confirmed booking on a ride has a pickup and a drop-off fence (its own
+points, or the ride's start and destination). The fences of a ride are put in
+a geohash cell index, registered in the 3x3 block of cells around their
+centre, so a driver ping only looks at the fences registered in its own cell
+instead of every booking.
+
+Progress through a fence only moves forward and is kept per ride in the
+cache; an event is sent when a ping crosses into a later stage:
+
+    pickup:  arriving (GEOFENCE_ARRIVING_METERS) -> at pickup
+             (GEOFENCE_AT_METERS) -> picked up (driver leaves the pickup)
+    dropoff: arrived (GEOFENCE_AT_METERS)
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+from accounts.notifications import send_push_notification
+from .geo import encode_geohash, haversine_km, neighbouring_cells, precision_for_radius
+from .models import Booking
+
+KEY_PREFIX = 'geofence'
+
+OUTSIDE, ARRIVING, AT_STOP, PICKED_UP = 0, 1, 2, 3
+
+# The driver counts as gone from the pickup once this many times the
+# at-stop radius away, so GPS jitter at the kerb doesn't trigger it
+DEPARTURE_FACTOR = 2
+
+
+def _index_key(ride_id):
+    return f'{KEY_PREFIX}:index:{ride_id}'
+
+
+def _stages_key(ride_id):
+    return f'{KEY_PREFIX}:stages:{ride_id}'
+
+
+def index_precision():
+    return precision_for_radius(settings.GEOFENCE_ARRIVING_METERS / 1000)
+
+
+def build_index(ride_id):
+    """{'cells': {cell: [fence_id, ...]}, 'fences': {fence_id: fence}} for a ride"""
+    precision = index_precision()
+    cells = {}
+    fences = {}
+
+    bookings = Booking.objects.filter(ride_id=ride_id, status='confirmed').select_related('ride')
+    for booking in bookings:
+        for kind, point in (('pickup', booking.pickup_point()), ('dropoff', booking.dropoff_point())):
+            if point is None:
+                continue
+            fence_id = f'{booking.id}:{kind}'
+            fences[fence_id] = {
+                'id': fence_id,
+                'booking_id': booking.id,
+                'passenger_id': booking.passenger_id,
+                'kind': kind,
+                'lat': float(point[0]),
+                'lng': float(point[1]),
+            }
+            for cell in neighbouring_cells(encode_geohash(point[0], point[1], precision)):
+                cells.setdefault(cell, []).append(fence_id)
+
+    return {'cells': cells, 'fences': fences}
+
+
+def get_index(ride_id):
+    key = _index_key(ride_id)
+    index = cache.get(key)
+    if index is None:
+        index = build_index(ride_id)
+        cache.set(key, index, timeout=settings.LOCATION_CONTEXT_SECONDS)
+    return index
+
+
+def forget_ride(ride_id, keep_progress=False):
+    """
+    Drop the cached fences of a ride. When only its bookings changed,
+    keep_progress leaves the stages reached so far, so the other passengers
+    aren't notified again.
+    """
+    if keep_progress:
+        cache.delete(_index_key(ride_id))
+    else:
+        cache.delete_many([_index_key(ride_id), _stages_key(ride_id)])
+
+
+def _stage_for(fence, distance_m, current):
+    at_stop = settings.GEOFENCE_AT_METERS
+    if fence['kind'] == 'dropoff':
+        return AT_STOP if distance_m <= at_stop else current
+    if current >= AT_STOP:
+        return PICKED_UP if distance_m > at_stop * DEPARTURE_FACTOR else current
+    if distance_m <= at_stop:
+        return AT_STOP
+    if distance_m <= settings.GEOFENCE_ARRIVING_METERS:
+        return ARRIVING
+    return current
+
+
+def evaluate(ride_id, lat, lng):
+    """
+    Check a driver position against the ride's fences. Returns the
+    (fence, new_stage, distance_m) crossings, already recorded.
+    """
+    index = get_index(ride_id)
+    if not index['fences']:
+        return []
+
+    stages = cache.get(_stages_key(ride_id)) or {}
+    cell = encode_geohash(lat, lng, index_precision())
+    candidates = set(index['cells'].get(cell, ()))
+    # A driver waiting at a pickup may leave the indexed cells in one ping
+    candidates.update(fid for fid, stage in stages.items() if stage == AT_STOP and fid.endswith(':pickup'))
+
+    crossings = []
+    for fence_id in candidates:
+        fence = index['fences'][fence_id]
+        current = stages.get(fence_id, OUTSIDE)
+        distance_m = haversine_km(lat, lng, fence['lat'], fence['lng']) * 1000
+        stage = _stage_for(fence, distance_m, current)
+        if stage > current:
+            stages[fence_id] = stage
+            crossings.append((fence, stage, distance_m))
+
+    if crossings:
+        cache.set(_stages_key(ride_id), stages, timeout=settings.LOCATION_TTL_SECONDS)
+    return crossings
+
+
+def _message(fence, stage, distance_m):
+    if fence['kind'] == 'dropoff':
+        return "You've Arrived 🎉", "You have reached your drop-off point. Thanks for riding with ISHARE!", 'arrived_at_dropoff'
+    if stage == ARRIVING:
+        return "Driver Arriving 🚗", f"Your driver is about {int(round(distance_m, -1))} m away. Get ready!", 'driver_arriving'
+    if stage == AT_STOP:
+        return "Driver Has Arrived 📍", "Your driver is at the pickup point.", 'driver_at_pickup'
+    return "Picked Up ✅", "Enjoy your ride!", 'passenger_picked_up'
+
+
+def notify_crossings(ride_id, crossings):
+    """Tell each passenger about the fences the driver just crossed"""
+    if not crossings:
+        return
+    User = get_user_model()
+    passengers = User.objects.only('id', 'email', 'fcm_token').in_bulk(
+        {fence['passenger_id'] for fence, _, _ in crossings}
+    )
+    for fence, stage, distance_m in crossings:
+        passenger = passengers.get(fence['passenger_id'])
+        if passenger is None:
+            continue
+        title, body, event = _message(fence, stage, distance_m)
+        send_push_notification(
+            user=passenger,
+            title=title,
+            body=body,
+            data={
+                "type": event,
+                "booking_id": str(fence['booking_id']),
+                "ride_id": str(ride_id),
+            }
+        )
@@ -0,0 +1,71 @@
+"""
+Settling seat holds whose MoMo payment went through.
+
+A hold normally becomes a booking from ConfirmSeatHoldView before it
+expires. When the payment completes late, after the sweeper expired the hold
+and put its seats back on sale, settle() takes the seats again if they are
+still free and otherwise refunds the payment to the passenger's wallet, so a
+paid hold always ends in a booking or a refund.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from wallet import ledger
+from wallet.momo_service import MTNMoMoService
+from .models import Booking, SeatHold
+
+
+def settle(hold, stop_points=None):
+    """The booking for a paid hold, or None if its seats were gone and it was refunded"""
+    with transaction.atomic():
+        if hold.claim():
+            booking = Booking.objects.create(
+                ride=hold.ride,
+                passenger=hold.passenger,
+                seats_booked=hold.seats,
+                total_price=hold.total_price,
+                payment_status='paid',
+                **(stop_points or {})
+            )
+            SeatHold.objects.filter(id=hold.id).update(booking=booking)
+            ledger.charge_booking(booking)
+            hold.status, hold.booking = 'confirmed', booking
+            return booking
+
+        lapsed = SeatHold.objects.filter(id=hold.id, status__in=('expired', 'released'))
+        if lapsed.update(status='refunded'):
+            ledger.refund_hold(hold)
+
+    # Either refunded now or settled concurrently by another request
+    hold.refresh_from_db(fields=['status', 'booking'])
+    return hold.booking if hold.status == 'confirmed' else None
+
+
+def settle_overdue(now=None, batch_size=500):
+    """
+    Check the payment of overdue holds that started one: successful ones
+    are settled, failed ones expired; pending ones wait for the grace period.
+    Returns (bookings, refunded holds, ids of rides whose seats changed).
+    """
+    now = now or timezone.now()
+    momo = MTNMoMoService()
+    bookings, refunded, ride_ids = [], [], set()
+
+    overdue = (
+        SeatHold.objects.select_related('ride', 'passenger')
+        .filter(status='active', expires_at__lte=now)
+        .exclude(payment_reference='')
+        .order_by('expires_at')[:batch_size]
+    )
+    for hold in overdue:
+        payment = momo.check_payment_status(hold.payment_reference)
+        if payment.get('status') == 'FAILED':
+            if hold.release('expired'):
+                ride_ids.add(hold.ride_id)
+        elif payment.get('success') and payment.get('status') == 'SUCCESSFUL':
+            booking = settle(hold)
+            if booking is not None:
+                bookings.append(booking)
+            else:
+                refunded.append(hold)
+    return bookings, refunded, ride_ids
@@ -0,0 +1,178 @@
+"""
+Live location store for rides in progress.
+
+Positions never touch the relational database. Each (ride, user) track is a
+fixed-size ring buffer in the shared cache: a sequence counter picks the slot,
+so an append is one INCR plus one SET_MANY whatever the buffer size. The
+latest position is kept under its own key.
+
+Pings arriving faster than LOCATION_MIN_INTERVAL_SECONDS are coalesced: they
+only overwrite the latest position and are not appended or pushed. Accepted
+pings are pushed to the other participants over the channel layer (their
+ws/notifications/ socket).
+
+The driver has one track per ride, shared by every booking on it; a
+passenger's track on a ride is their booking's track. The driver's accepted
+points are also kept, one key per point, as the ride's trail until the ride
+is completed (see rides.trails).
+"""
+import time
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.core.cache import cache
+
+from accounts.notifications import notification_group
+from .models import Booking, Ride
+
+KEY_PREFIX = 'loc'
+
+
+def _track_key(ride_id, user_id):
+    return f'{KEY_PREFIX}:track:{ride_id}:{user_id}'
+
+
+def _context_key(ride_id):
+    return f'{KEY_PREFIX}:ride:{ride_id}'
+
+
+def ride_for_booking(booking_id):
+    """Ride id of a booking; a booking never changes ride, so cache it long"""
+    key = f'{KEY_PREFIX}:booking:{booking_id}'
+    ride_id = cache.get(key)
+    if ride_id is None:
+        ride_id = Booking.objects.filter(id=booking_id).values_list('ride_id', flat=True).first()
+        if ride_id is None:
+            return None
+        cache.set(key, ride_id, timeout=settings.LOCATION_TTL_SECONDS)
+    return ride_id
+
+
+def ride_context(ride_id):
+    """
+    Who may share locations on a ride: {'driver_id': ..., 'passengers':
+    {passenger_id: booking_id}}, or None once the ride isn't active. Cached
+    for LOCATION_CONTEXT_SECONDS so steady pings don't query the database.
+    """
+    key = _context_key(ride_id)
+    context = cache.get(key)
+    if context is not None:
+        return context or None
+
+    driver_id = Ride.objects.filter(id=ride_id, status='active').values_list('driver_id', flat=True).first()
+    if driver_id is None:
+        context = {}
+    else:
+        context = {
+            'driver_id': driver_id,
+            'passengers': dict(
+                Booking.objects.filter(ride_id=ride_id, status__in=['pending', 'confirmed'])
+                .values_list('passenger_id', 'id')
+            ),
+        }
+    cache.set(key, context, timeout=settings.LOCATION_CONTEXT_SECONDS)
+    return context or None
+
+
+def forget_ride(ride_id):
+    """Drop the cached context, e.g. when a ride is completed or cancelled"""
+    cache.delete(_context_key(ride_id))
+
+
+def is_participant(context, user_id):
+    return user_id == context['driver_id'] or user_id in context['passengers']
+
+
+def recipients(context, user_id):
+    """Who should see this user's position"""
+    if user_id == context['driver_id']:
+        return list(context['passengers'])
+    return [context['driver_id']]
+
+
+def make_point(data):
+    """Validate a ping into a compact point dict; raises ValueError"""
+    lat = float(data['lat'])
+    lng = float(data['lng'])
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        raise ValueError("Coordinates out of range")
+
+    point = {'lat': round(lat, 6), 'lng': round(lng, 6), 't': round(time.time(), 1)}
+    for field in ('heading', 'speed', 'accuracy'):
+        if data.get(field) is not None:
+            point[field] = round(float(data[field]), 1)
+    return point
+
+
+def trail_point_key(ride_id, user_id, seq):
+    return f'{_track_key(ride_id, user_id)}:trail:{seq}'
+
+
+def track_length(ride_id, user_id):
+    """Number of points ever appended to a track"""
+    return cache.get(f'{_track_key(ride_id, user_id)}:seq') or 0
+
+
+def record_location(ride_id, user_id, point, keep_trail=False):
+    """
+    Store a ping. Returns True if it was appended to the track (and should
+    be pushed), False if it was coalesced into the latest position only.
+    With keep_trail the point is also kept for the ride's trail.
+    """
+    key = _track_key(ride_id, user_id)
+    ttl = settings.LOCATION_TTL_SECONDS
+
+    if not cache.add(f'{key}:throttle', 1, timeout=settings.LOCATION_MIN_INTERVAL_SECONDS):
+        cache.set(f'{key}:latest', point, timeout=ttl)
+        return False
+
+    # The counter numbers trail points too, so it must outlive them: a
+    # restart at 1 would overwrite the start of a long ride's trail
+    seq_ttl = max(ttl, settings.RIDE_TRAIL_TTL_SECONDS)
+    try:
+        seq = cache.incr(f'{key}:seq')
+    except ValueError:
+        cache.add(f'{key}:seq', 0, timeout=seq_ttl)
+        seq = cache.incr(f'{key}:seq')
+    cache.touch(f'{key}:seq', timeout=seq_ttl)
+
+    slot = seq % settings.LOCATION_BUFFER_SIZE
+    cache.set_many({
+        f'{key}:slot:{slot}': point,
+        f'{key}:latest': point,
+    }, timeout=ttl)
+    if keep_trail:
+        cache.set(trail_point_key(ride_id, user_id, seq), point, timeout=settings.RIDE_TRAIL_TTL_SECONDS)
+    return True
+
+
+def latest(ride_id, user_id):
+    return cache.get(f'{_track_key(ride_id, user_id)}:latest')
+
+
+def history(ride_id, user_id):
+    """Buffered points of a track, oldest first"""
+    key = _track_key(ride_id, user_id)
+    slots = cache.get_many([f'{key}:slot:{slot}' for slot in range(settings.LOCATION_BUFFER_SIZE)])
+    return sorted(slots.values(), key=lambda point: point['t'])
+
+
+def location_event(context, ride_id, user_id, point):
+    """Channel-layer event carrying one accepted ping"""
+    return {
+        'type': 'location.update',
+        'ride_id': ride_id,
+        'user_id': user_id,
+        'role': 'driver' if user_id == context['driver_id'] else 'passenger',
+        'location': point,
+    }
+
+
+def publish_location(context, ride_id, user_id, point):
+    layer = get_channel_layer()
+    if layer is None:
+        return
+    event = location_event(context, ride_id, user_id, point)
+    for recipient in recipients(context, user_id):
+        async_to_sync(layer.group_send)(notification_group(recipient), event)
@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from rides.models import RideSchedule
+from rides import search_cache
+
+
+class Command(BaseCommand):
+    help = "Create Ride rows for recurring schedules up to the rolling window"
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        window_end = now + timedelta(days=settings.RIDE_SCHEDULE_WINDOW_DAYS)
+
+        schedules = RideSchedule.objects.filter(
+            is_active=True,
+            end_date__gte=now,
+        ).filter(
+            Q(materialized_until__isnull=True) | Q(materialized_until__lt=window_end)
+        )
+
+        created = 0
+        for schedule in schedules.iterator():
+            rides = schedule.materialize(window_end)
+            if rides:
+                search_cache.invalidate_ride(rides[0])
+            created += len(rides)
+
+        self.stdout.write(f"Materialized {created} ride(s) up to {window_end:%Y-%m-%d}")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from rides.models import Ride, SeatHold
+from rides import holds, location, search_cache
+from rides.views import notify_new_booking
+
+
+class Command(BaseCommand):
+    help = "Settle paid seat holds, expire unpaid ones and put their seats back on sale"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        # Paid holds become bookings before anything is expired
+        bookings, refunded, ride_ids = holds.settle_overdue(batch_size=options['batch_size'])
+        for booking in bookings:
+            location.forget_ride(booking.ride_id)
+            notify_new_booking(booking)
+
+        ride_ids |= SeatHold.objects.release_expired(batch_size=options['batch_size'])
+
+        rides = Ride.objects.filter(id__in=ride_ids).only(
+            'start_location', 'destination', 'start_geohash', 'destination_geohash'
+        )
+        for ride in rides:
+            search_cache.invalidate_ride(ride)
+
+        self.stdout.write(
+            f"Settled {len(bookings)} paid hold(s), refunded {len(refunded)}; "
+            f"released expired holds on {len(ride_ids)} ride(s)"
+        )
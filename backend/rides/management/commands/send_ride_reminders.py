@@ -0,0 +1,64 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+from django.utils import timezone
+
+from accounts.notifications import send_bulk_push_notification
+from rides.models import Ride, Booking
+
+
+class Command(BaseCommand):
+    help = "Remind drivers and passengers of rides departing soon (run every few minutes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=settings.RIDE_REMINDER_LEAD_MINUTES)
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        due = Ride.objects.filter(
+            status='active',
+            reminder_sent=False,
+            departure_time__gt=now,
+            departure_time__lte=now + timedelta(minutes=options['minutes']),
+        )
+        # Claim each ride first so an overlapping run can't remind twice
+        ride_ids = [
+            ride_id for ride_id in due.values_list('id', flat=True)
+            if Ride.objects.filter(id=ride_id, reminder_sent=False).update(reminder_sent=True)
+        ]
+        if not ride_ids:
+            self.stdout.write("No rides to remind")
+            return
+
+        rides = Ride.objects.filter(id__in=ride_ids).select_related('driver').prefetch_related(
+            Prefetch(
+                'bookings',
+                queryset=Booking.objects.filter(status='confirmed').select_related('passenger'),
+                to_attr='confirmed_bookings',
+            )
+        )
+
+        notices = []
+        for ride in rides:
+            departs = timezone.localtime(ride.departure_time).strftime('%H:%M')
+            data = {"type": "ride_reminder", "ride_id": str(ride.id)}
+            notices.append((
+                ride.driver,
+                "Ride Reminder 🚗",
+                f"Your ride {ride.start_location} → {ride.destination} departs at {departs}.",
+                data,
+            ))
+            notices.extend(
+                (
+                    booking.passenger,
+                    "Ride Reminder 🚗",
+                    f"Your ride to {ride.destination} departs at {departs}. Be ready at {ride.start_location}!",
+                    {**data, "booking_id": str(booking.id)},
+                )
+                for booking in ride.confirmed_bookings
+            )
+
+        send_bulk_push_notification(notices)
+        self.stdout.write(f"Sent {len(notices)} reminders for {len(ride_ids)} ride(s)")
@@ -0,0 +1,17 @@
+# Generated by Django 4.2 on 2026-10-17 20:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0006_ride_coordinates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['passenger', '-created_at', '-id'], name='rides_booki_passeng_95e655_idx'),
+        ),
+    ]
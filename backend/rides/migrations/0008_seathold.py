@@ -0,0 +1,36 @@
+# Generated by Django 4.2 on 2026-10-17 20:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('rides', '0007_booking_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seats', models.IntegerField()),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('phone_number', models.CharField(blank=True, max_length=15)),
+                ('payment_reference', models.CharField(blank=True, max_length=100)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('confirmed', 'Confirmed'), ('released', 'Released'), ('expired', 'Expired')], default='active', max_length=20)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('booking', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='seat_hold', to='rides.booking')),
+                ('passenger', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_holds', to=settings.AUTH_USER_MODEL)),
+                ('ride', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_holds', to='rides.ride')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='seathold',
+            index=models.Index(fields=['status', 'expires_at'], name='rides_seath_status_fb6c2b_idx'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2 on 2026-10-17 20:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('rides', '0008_seathold'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RideSchedule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_location', models.CharField(max_length=255)),
+                ('destination', models.CharField(max_length=255)),
+                ('start_latitude', models.FloatField(blank=True, null=True)),
+                ('start_longitude', models.FloatField(blank=True, null=True)),
+                ('destination_latitude', models.FloatField(blank=True, null=True)),
+                ('destination_longitude', models.FloatField(blank=True, null=True)),
+                ('first_departure', models.DateTimeField()),
+                ('end_date', models.DateTimeField()),
+                ('price_per_seat', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('available_seats', models.IntegerField()),
+                ('schedule_type', models.CharField(choices=[('daily', 'Daily (Mon-Fri)'), ('weekend', 'Weekend'), ('monthly', 'Monthly')], max_length=20)),
+                ('materialized_until', models.DateTimeField(blank=True, null=True)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='rideschedule',
+            name='driver',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ride_schedules', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='ride',
+            name='schedule',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='rides', to='rides.rideschedule'),
+        ),
+        migrations.AddConstraint(
+            model_name='ride',
+            constraint=models.UniqueConstraint(fields=('schedule', 'departure_time'), name='unique_schedule_occurrence'),
+        ),
+        migrations.AddIndex(
+            model_name='rideschedule',
+            index=models.Index(fields=['is_active', 'materialized_until'], name='rides_rides_is_acti_e1aac4_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0009_rideschedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ride',
+            name='reminder_sent',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2 on 2026-10-17 21:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0010_ride_reminder_sent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ride',
+            name='route_distance_km',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ride',
+            name='route_polyline',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 21:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0012_booking_stop_points'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='seathold',
+            name='status',
+            field=models.CharField(choices=[('active', 'Active'), ('confirmed', 'Confirmed'), ('released', 'Released'), ('expired', 'Expired'), ('refunded', 'Refunded')], default='active', max_length=20),
+        ),
+    ]
@@ -1,5 +1,48 @@
-from django.db import models
+from collections import defaultdict
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q, Case, When, Value
 from django.conf import settings
+from django.utils import timezone
+from django.core.validators import MinValueValidator, MaxValueValidator
+from metrics import rollup
+from .geo import encode_geohash
+
+
+class RideQuerySet(models.QuerySet):
+    def reserve_seats(self, ride_id, seats):
+        """
+        Atomically take seats from an active ride.
+
+        A single conditional UPDATE, so concurrent bookings can never push
+        available_seats below zero. Returns True if the seats were taken.
+        """
+        return self.filter(
+            id=ride_id,
+            status='active',
+            available_seats__gte=seats,
+        ).update(available_seats=F('available_seats') - seats) == 1
+
+    def release_seats(self, ride_id, seats):
+        """Atomically give seats back to a ride"""
+        return self.filter(id=ride_id).update(
+            available_seats=F('available_seats') + seats
+        ) == 1
+
+    def release_seats_bulk(self, seats_by_ride):
+        """Give seats back to many rides in a single UPDATE"""
+        if not seats_by_ride:
+            return 0
+        return self.filter(id__in=seats_by_ride).update(
+            available_seats=F('available_seats') + Case(
+                *[When(id=ride_id, then=Value(seats)) for ride_id, seats in seats_by_ride.items()],
+                default=Value(0),
+                output_field=models.IntegerField(),
+            )
+        )
 
 
 class Ride(models.Model):
@@ -17,6 +60,26 @@ class Ride(models.Model):
     )
     start_location = models.CharField(max_length=255)
     destination = models.CharField(max_length=255)
+    start_latitude = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    start_longitude = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
+    destination_latitude = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    destination_longitude = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
+    # Geohash cells of the pickup/drop-off points, kept in sync on save so
+    # radius searches can use indexed prefix lookups instead of scanning.
+    start_geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
+    destination_geohash = models.CharField(max_length=12, blank=True, db_index=True, editable=False)
     departure_time = models.DateTimeField()
     price_per_seat = models.DecimalField(max_digits=10, decimal_places=2)
     available_seats = models.IntegerField()
@@ -26,10 +89,49 @@ class Ride(models.Model):
         default='active'
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    reminder_sent = models.BooleanField(default=False)
+    # Route actually driven, stored when the ride is completed (rides.trails)
+    route_polyline = models.TextField(blank=True, editable=False)
+    route_distance_km = models.FloatField(null=True, blank=True, editable=False)
+    schedule = models.ForeignKey(
+        'RideSchedule',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='rides'
+    )
+
+    objects = RideQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['schedule', 'departure_time'],
+                name='unique_schedule_occurrence',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.start_location} → {self.destination}"
 
+    def update_geohashes(self):
+        """Recompute the geohash cells from the stored coordinates"""
+        if self.start_latitude is not None and self.start_longitude is not None:
+            self.start_geohash = encode_geohash(self.start_latitude, self.start_longitude)
+        else:
+            self.start_geohash = ''
+        if self.destination_latitude is not None and self.destination_longitude is not None:
+            self.destination_geohash = encode_geohash(self.destination_latitude, self.destination_longitude)
+        else:
+            self.destination_geohash = ''
+
+    def save(self, *args, **kwargs):
+        self.update_geohashes()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'start_geohash', 'destination_geohash'}
+        super().save(*args, **kwargs)
+
 
 class Booking(models.Model):
     STATUS_CHOICES = (
@@ -69,6 +171,45 @@ class Booking(models.Model):
         default='pending'
     )
     created_at = models.DateTimeField(auto_now_add=True)
+    # Where this passenger is picked up / dropped off, when it differs from
+    # the ride's own start and destination (used for arrival geofences)
+    pickup_latitude = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    pickup_longitude = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
+    dropoff_latitude = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(-90), MaxValueValidator(90)]
+    )
+    dropoff_longitude = models.FloatField(
+        null=True, blank=True,
+        validators=[MinValueValidator(-180), MaxValueValidator(180)]
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['passenger', '-created_at', '-id']),
+        ]
+
+    def pickup_point(self):
+        """(lat, lng) of the pickup, falling back to the ride's start"""
+        if self.pickup_latitude is not None and self.pickup_longitude is not None:
+            return self.pickup_latitude, self.pickup_longitude
+        if self.ride.start_latitude is not None and self.ride.start_longitude is not None:
+            return self.ride.start_latitude, self.ride.start_longitude
+        return None
+
+    def dropoff_point(self):
+        """(lat, lng) of the drop-off, falling back to the ride's destination"""
+        if self.dropoff_latitude is not None and self.dropoff_longitude is not None:
+            return self.dropoff_latitude, self.dropoff_longitude
+        if self.ride.destination_latitude is not None and self.ride.destination_longitude is not None:
+            return self.ride.destination_latitude, self.ride.destination_longitude
+        return None
 
     def __str__(self):
         return f"{self.passenger.email} → {self.ride}"
@@ -95,3 +236,254 @@ class Rating(models.Model):
 
     def __str__(self):
         return f"{self.reviewer} rated {self.reviewee} - {self.score}"
+
+
+class SeatHoldQuerySet(models.QuerySet):
+    def release_expired(self, now=None, batch_size=500):
+        """
+        Expire overdue holds and return their seats, a batch at a time.
+        Holds with a MoMo payment in flight get SEAT_HOLD_PAYMENT_GRACE_SECONDS
+        more, so a payment that completes late still finds its seats.
+
+        Each batch is one SELECT (row-locked, skipping rows another worker
+        holds), one UPDATE of the holds and one UPDATE of the rides.
+        Returns the ids of the rides that got seats back.
+        """
+        now = now or timezone.now()
+        grace = timedelta(seconds=settings.SEAT_HOLD_PAYMENT_GRACE_SECONDS)
+        ride_ids = set()
+
+        while True:
+            with transaction.atomic():
+                expired = list(
+                    self.select_for_update(skip_locked=True)
+                    .filter(status='active', expires_at__lte=now)
+                    .filter(Q(payment_reference='') | Q(expires_at__lte=now - grace))
+                    .order_by('expires_at')
+                    .values_list('id', 'ride_id', 'seats')[:batch_size]
+                )
+                if not expired:
+                    break
+
+                self.filter(id__in=[hold_id for hold_id, _, _ in expired]).update(status='expired')
+
+                seats_by_ride = defaultdict(int)
+                for _, ride_id, seats in expired:
+                    seats_by_ride[ride_id] += seats
+                Ride.objects.release_seats_bulk(seats_by_ride)
+                ride_ids.update(seats_by_ride)
+
+            if len(expired) < batch_size:
+                break
+
+        return ride_ids
+
+
+class SeatHold(models.Model):
+    """Seats set aside on a ride while the passenger completes payment"""
+    STATUS_CHOICES = (
+        ('active', 'Active'),
+        ('confirmed', 'Confirmed'),
+        ('released', 'Released'),
+        ('expired', 'Expired'),
+        ('refunded', 'Refunded'),
+    )
+
+    ride = models.ForeignKey(
+        Ride,
+        on_delete=models.CASCADE,
+        related_name='seat_holds'
+    )
+    passenger = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='seat_holds'
+    )
+    seats = models.IntegerField()
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    phone_number = models.CharField(max_length=15, blank=True)
+    payment_reference = models.CharField(max_length=100, blank=True)
+    status = models.CharField(
+        max_length=20,
+        choices=STATUS_CHOICES,
+        default='active'
+    )
+    expires_at = models.DateTimeField()
+    booking = models.OneToOneField(
+        Booking,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='seat_hold'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = SeatHoldQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'expires_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.passenger} holds {self.seats} seat(s) on {self.ride}"
+
+    def release(self, new_status='released'):
+        """Give the seats back if the hold is still active"""
+        with transaction.atomic():
+            if SeatHold.objects.filter(id=self.id, status='active').update(status=new_status) != 1:
+                return False
+            Ride.objects.release_seats(self.ride_id, self.seats)
+        self.status = new_status
+        return True
+
+    def claim(self):
+        """
+        Mark a paid hold confirmed. If the hold was already expired or
+        released, its seats are taken again when still free; returns False
+        when they are gone.
+        """
+        with transaction.atomic():
+            if SeatHold.objects.filter(id=self.id, status='active').update(status='confirmed'):
+                return True
+            lapsed = SeatHold.objects.filter(id=self.id, status__in=('expired', 'released'))
+            if not lapsed.update(status='confirmed'):
+                return False
+            if Ride.objects.reserve_seats(self.ride_id, self.seats):
+                return True
+            transaction.set_rollback(True)
+            return False
+
+
+class RideSchedule(models.Model):
+    """
+    A recurring ride stored as a rule.
+
+    Concrete Ride rows are only created for a rolling window ahead of now
+    (see materialize); later occurrences are generated on the fly.
+    """
+    SCHEDULE_CHOICES = (
+        ('daily', 'Daily (Mon-Fri)'),
+        ('weekend', 'Weekend'),
+        ('monthly', 'Monthly'),
+    )
+
+    driver = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='ride_schedules'
+    )
+    start_location = models.CharField(max_length=255)
+    destination = models.CharField(max_length=255)
+    start_latitude = models.FloatField(null=True, blank=True)
+    start_longitude = models.FloatField(null=True, blank=True)
+    destination_latitude = models.FloatField(null=True, blank=True)
+    destination_longitude = models.FloatField(null=True, blank=True)
+    first_departure = models.DateTimeField()
+    end_date = models.DateTimeField()
+    price_per_seat = models.DecimalField(max_digits=10, decimal_places=2)
+    available_seats = models.IntegerField()
+    schedule_type = models.CharField(max_length=20, choices=SCHEDULE_CHOICES)
+    # Occurrences up to (and including) this time exist as Ride rows
+    materialized_until = models.DateTimeField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_active', 'materialized_until']),
+        ]
+
+    def __str__(self):
+        return f"{self.schedule_type}: {self.start_location} → {self.destination}"
+
+    def occurrences(self, after, until):
+        """Departure times in (after, until], clipped to the schedule's range"""
+        until = min(until, self.end_date)
+        if until < self.first_departure:
+            return
+
+        if self.schedule_type == 'monthly':
+            months = 0
+            if after >= self.first_departure:
+                delta = relativedelta(after, self.first_departure)
+                months = delta.years * 12 + delta.months
+            current = self.first_departure + relativedelta(months=months)
+            while current <= until:
+                if current > after:
+                    yield current
+                months += 1
+                current = self.first_departure + relativedelta(months=months)
+            return
+
+        days = 0
+        if after >= self.first_departure:
+            days = (after - self.first_departure).days
+        current = self.first_departure + timedelta(days=days)
+        while current <= until:
+            weekday = current.weekday()
+            if current > after and (
+                (self.schedule_type == 'daily' and weekday < 5)
+                or (self.schedule_type == 'weekend' and weekday >= 5)
+            ):
+                yield current
+            days += 1
+            current = self.first_departure + timedelta(days=days)
+
+    def build_ride(self, departure_time):
+        """Unsaved Ride for one occurrence of this schedule"""
+        ride = Ride(
+            driver_id=self.driver_id,
+            start_location=self.start_location,
+            destination=self.destination,
+            start_latitude=self.start_latitude,
+            start_longitude=self.start_longitude,
+            destination_latitude=self.destination_latitude,
+            destination_longitude=self.destination_longitude,
+            departure_time=departure_time,
+            price_per_seat=self.price_per_seat,
+            available_seats=self.available_seats,
+            status='active',
+            schedule=self,
+        )
+        ride.update_geohashes()
+        return ride
+
+    def materialize(self, until):
+        """
+        Create Ride rows for every occurrence up to `until` with one
+        bulk INSERT. Safe to run concurrently: occurrences that already
+        exist are skipped by the (schedule, departure_time) constraint.
+        """
+        if self.materialized_until is not None and self.materialized_until >= until:
+            return []
+
+        after = self.materialized_until or self.first_departure - timedelta(microseconds=1)
+        # Never backfill occurrences that have already departed
+        after = max(after, timezone.now())
+        rides = [self.build_ride(departure) for departure in self.occurrences(after, until)]
+        # ignore_conflicts doesn't report how many rows went in, so count them
+        existing = Ride.objects.filter(schedule=self).count()
+        Ride.objects.bulk_create(rides, ignore_conflicts=True)
+        rollup.rides_created(Ride.objects.filter(schedule=self).count() - existing)
+
+        self.materialized_until = until
+        RideSchedule.objects.filter(id=self.id).update(materialized_until=until)
+        return rides
+
+    def materialize_occurrence(self, departure_time):
+        """Get or create the Ride for one occurrence, e.g. to book it"""
+        if departure_time not in self.occurrences(departure_time - timedelta(microseconds=1), departure_time):
+            return None
+        ride = Ride.objects.filter(schedule=self, departure_time=departure_time).first()
+        if ride is not None:
+            return ride
+        ride = self.build_ride(departure_time)
+        try:
+            with transaction.atomic():
+                ride.save()
+                rollup.rides_created(1)
+        except IntegrityError:
+            # Materialized concurrently; only the insert that won is counted
+            ride = Ride.objects.get(schedule=self, departure_time=departure_time)
+        return ride
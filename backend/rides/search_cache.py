@@ -0,0 +1,180 @@
+"""
+Result cache for SearchRideView.
+
+Entries are keyed on the normalized query string and a time bucket, plus the
+current version of every tag the search depends on:
+
+* text searches depend on a (start term, destination term) pair;
+* radius searches depend on the geohash cells they probe.
+
+When a ride is created, booked, completed or cancelled we bump only the tags
+that ride could match, so unrelated corridors stay cached. Versions are random
+tokens rather than counters, so an evicted version can never collide with an
+older one. Text pairs are registered per time bucket in numbered slots (an
+atomic add() to claim the pair, incr() to take a slot), so concurrent searches
+never overwrite each other's pairs and no single key is rewritten per search.
+Everything goes through Django's cache framework (locmem in tests,
+Redis in production).
+"""
+import hashlib
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .geo import covering_cells
+
+KEY_PREFIX = 'ride_search'
+GEO_PRECISIONS = range(1, 8)
+
+# Query params that describe *where*; everything else (cursor, page_size, ...)
+# still goes into the key but carries no tags.
+TEXT_PARAMS = ('start_location', 'destination')
+GEO_PARAMS = (
+    ('start', 'start_lat', 'start_lng', 'radius_km'),
+    ('dest', 'dest_lat', 'dest_lng', 'dest_radius_km'),
+)
+
+
+def normalize_term(value):
+    return ' '.join((value or '').lower().split())
+
+
+def _bucket_seconds():
+    return settings.RIDE_SEARCH_CACHE_SECONDS
+
+
+def _current_bucket():
+    return int(time.time() // _bucket_seconds())
+
+
+def _pair_tag(start, destination):
+    return f'{KEY_PREFIX}:tag:text:{start}|{destination}'
+
+
+def _geo_tag(kind, cell):
+    return f'{KEY_PREFIX}:tag:geo:{kind}:{cell}'
+
+
+def _tags_for_request(params, default_radius_km):
+    start = normalize_term(params.get('start_location'))
+    destination = normalize_term(params.get('destination'))
+    tags = []
+
+    for kind, lat_param, lng_param, radius_param in GEO_PARAMS:
+        if params.get(lat_param) is None:
+            continue
+        try:
+            lat = float(params.get(lat_param))
+            lng = float(params.get(lng_param))
+            radius = float(params.get(radius_param, default_radius_km))
+            cells = covering_cells(lat, lng, radius)
+        except (TypeError, ValueError, KeyError):
+            continue
+        tags.extend(_geo_tag(kind, cell) for cell in cells)
+
+    # A radius search without text terms only depends on its cells; anything
+    # else depends on the text pair (an empty term matches every ride).
+    pair = None
+    if not tags or start or destination:
+        pair = (start, destination)
+        tags.append(_pair_tag(start, destination))
+
+    return pair, tags
+
+
+def _tag_versions(tags):
+    """Current version token per tag, creating missing ones"""
+    versions = cache.get_many(tags)
+    for tag in tags:
+        if tag not in versions:
+            token = uuid.uuid4().hex
+            # add() so that two racing requests agree on one token
+            if not cache.add(tag, token, timeout=None):
+                token = cache.get(tag, token)
+            versions[tag] = token
+    return versions
+
+
+def _pairs_key(bucket, suffix):
+    return f'{KEY_PREFIX}:pairs:{bucket}:{suffix}'
+
+
+def _remember_pair(pair, bucket):
+    """
+    Record that a text pair is being cached in this bucket, so invalidation
+    knows which pairs exist. Each pair takes one slot per bucket; slots
+    expire with the bucket, so nothing needs pruning.
+    """
+    timeout = _bucket_seconds() * 2
+    digest = hashlib.sha1(repr(pair).encode()).hexdigest()
+    if not cache.add(_pairs_key(bucket, f'seen:{digest}'), 1, timeout=timeout):
+        return
+    counter = _pairs_key(bucket, 'count')
+    cache.add(counter, 0, timeout=timeout)
+    slot = cache.incr(counter)
+    cache.set(_pairs_key(bucket, slot), pair, timeout=timeout)
+
+
+def _known_pairs():
+    """Text pairs cached in the current or previous bucket"""
+    bucket = _current_bucket()
+    keys = []
+    for b in (bucket - 1, bucket):
+        count = cache.get(_pairs_key(b, 'count')) or 0
+        keys.extend(_pairs_key(b, slot) for slot in range(1, count + 1))
+    return set(cache.get_many(keys).values())
+
+
+def cache_key(request, default_radius_km):
+    """Cache key for a search request under the current tag versions"""
+    params = request.query_params
+    bucket = _current_bucket()
+    pair, tags = _tags_for_request(params, default_radius_km)
+    if pair is not None:
+        _remember_pair(pair, bucket)
+
+    normalized = sorted(
+        (name, normalize_term(value) if name in TEXT_PARAMS else value)
+        for name, value in params.items()
+    )
+    versions = _tag_versions(tags)
+    raw = repr((request.get_host(), normalized, [versions[t] for t in tags]))
+    digest = hashlib.sha1(raw.encode()).hexdigest()
+    return f'{KEY_PREFIX}:result:v2:{bucket}:{digest}'
+
+
+def get(key):
+    """Cached (data, headers) of a search response, or None"""
+    return cache.get(key)
+
+
+def store(key, result):
+    cache.set(key, result, timeout=_bucket_seconds())
+
+
+def invalidate_ride(ride):
+    """
+    Drop cached searches that could include this ride.
+
+    Works with anything that has start_location/destination and optional
+    start_geohash/destination_geohash attributes.
+    """
+    start_location = normalize_term(ride.start_location)
+    destination = normalize_term(ride.destination)
+
+    tags = [
+        _pair_tag(start, dest)
+        for start, dest in _known_pairs()
+        if start in start_location and dest in destination
+    ]
+    for kind, geohash in (
+        ('start', getattr(ride, 'start_geohash', '')),
+        ('dest', getattr(ride, 'destination_geohash', '')),
+    ):
+        if geohash:
+            tags.extend(_geo_tag(kind, geohash[:p]) for p in GEO_PRECISIONS)
+
+    if tags:
+        cache.set_many({tag: uuid.uuid4().hex for tag in tags}, timeout=None)
@@ -1,11 +1,17 @@
 from rest_framework import serializers
+from accounts.mixins import EagerLoadingSerializerMixin
 from .models import Ride, Booking, Rating
 
-class RideSerializer(serializers.ModelSerializer):
+class RideSerializer(EagerLoadingSerializerMixin, serializers.ModelSerializer):
     car_photo_url = serializers.SerializerMethodField()
     driver_name = serializers.SerializerMethodField()
     driver_phone = serializers.SerializerMethodField()
     car_model = serializers.SerializerMethodField()
+    distance_km = serializers.SerializerMethodField()
+    destination_distance_km = serializers.SerializerMethodField()
+    is_virtual = serializers.SerializerMethodField()
+
+    select_related_fields = ('driver__driverprofile',)
     
     class Meta:
         model = Ride
@@ -36,12 +42,28 @@ class RideSerializer(serializers.ModelSerializer):
         except:
             return None
 
+    def get_distance_km(self, obj):
+        """Distance from the searched origin (radius search only)"""
+        distance = getattr(obj, 'distance_km', None)
+        return round(distance, 2) if distance is not None else None
+
+    def get_is_virtual(self, obj):
+        """True for a recurring-ride occurrence that has no Ride row yet"""
+        return obj.pk is None
+
+    def get_destination_distance_km(self, obj):
+        """Distance from the searched destination (radius search only)"""
+        distance = getattr(obj, 'destination_distance_km', None)
+        return round(distance, 2) if distance is not None else None
 
-class BookingSerializer(serializers.ModelSerializer):
+
+class BookingSerializer(EagerLoadingSerializerMixin, serializers.ModelSerializer):
     ride = RideSerializer(read_only=True)  # Full ride object, not just ID
     passenger_name = serializers.CharField(source='passenger.username', read_only=True)
     passenger_phone = serializers.CharField(source='passenger.phone', read_only=True)
     driver_name = serializers.SerializerMethodField()  # ✅ ADDED: For chat on passenger side
+
+    select_related_fields = ('passenger', 'ride__driver__driverprofile')
     
     class Meta:
         model = Booking
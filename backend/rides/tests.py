@@ -1,3 +1,572 @@
-from django.test import TestCase
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.test import APIClient
+
+from accounts.models import User, Subscription
+from metrics.models import DailyMetrics, DriverStats
+from wallet import ledger
+from . import geofence, location, search_cache, trails
+from .models import Ride, Booking, SeatHold, RideSchedule
+
+
+def make_user(email, role):
+    user = User.objects.create_user(
+        email=email, username=email.split('@')[0], password='pass1234', role=role
+    )
+    Subscription.objects.create(
+        user=user, plan_type=role, expiry_date=date.today() + timedelta(days=30)
+    )
+    return user
+
+
+def make_ride(driver, seats):
+    return Ride.objects.create(
+        driver=driver,
+        start_location='Kigali',
+        destination='Musanze',
+        departure_time=timezone.now() + timedelta(days=1),
+        price_per_seat=2000,
+        available_seats=seats,
+    )
+
+
+class SeatReservationTests(TestCase):
+    def setUp(self):
+        self.driver = make_user('driver@example.com', 'driver')
+        self.ride = make_ride(self.driver, seats=3)
+
+    def test_reserve_seats_refuses_to_oversell(self):
+        self.assertTrue(Ride.objects.reserve_seats(self.ride.id, 2))
+        self.assertFalse(Ride.objects.reserve_seats(self.ride.id, 2))
+        self.assertTrue(Ride.objects.reserve_seats(self.ride.id, 1))
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.available_seats, 0)
+
+    def test_reserve_seats_ignores_inactive_rides(self):
+        Ride.objects.filter(id=self.ride.id).update(status='completed')
+        self.assertFalse(Ride.objects.reserve_seats(self.ride.id, 1))
+
+
+class BookingStatusTests(TestCase):
+    def setUp(self):
+        self.driver = make_user('driver@example.com', 'driver')
+        self.passenger = make_user('passenger@example.com', 'passenger')
+        self.ride = make_ride(self.driver, seats=2)
+        self.booking = Booking.objects.create(
+            ride=self.ride, passenger=self.passenger, seats_booked=1, total_price=2000,
+            status='confirmed', payment_status='paid',
+        )
+        ledger.charge_booking(self.booking)
+        self.client = APIClient()
+        self.client.force_authenticate(self.driver)
+
+    def update(self, new_status):
+        return self.client.post(f'/api/rides/booking/{self.booking.id}/update/', {'status': new_status})
+
+    def test_only_legal_transitions_are_accepted(self):
+        self.assertEqual(self.update('pending').status_code, 400)
+        self.assertEqual(self.update('bogus').status_code, 400)
+        self.assertEqual(self.update('cancelled').status_code, 200)
+        self.assertEqual(self.update('cancelled').status_code, 400)
+        self.assertEqual(self.update('rejected').status_code, 400)
+
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.payment_status, 'refunded')
+        self.assertEqual(ledger.balance_of(self.passenger), 2000)
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.available_seats, 3)
+
+    def test_paid_out_booking_is_not_marked_refunded(self):
+        ledger.payout_booking(self.booking, self.driver.id)
+        Booking.objects.filter(id=self.booking.id).update(status='completed')
+
+        self.assertEqual(self.update('cancelled').status_code, 400)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.payment_status, 'paid')
+        self.assertEqual(ledger.balance_of(self.passenger), 0)
+
+    def test_reject_releases_seats_once(self):
+        Booking.objects.filter(id=self.booking.id).update(status='pending')
+        reject = f'/api/rides/bookings/{self.booking.id}/reject/'
+        self.assertEqual(self.client.post(reject).status_code, 200)
+        self.assertEqual(self.client.post(reject).status_code, 400)
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.available_seats, 3)
+
+
+class BookingListQueryTests(TestCase):
+    def setUp(self):
+        self.passenger = make_user('passenger@example.com', 'passenger')
+        self.client = APIClient()
+        self.client.force_authenticate(self.passenger)
+
+    def book_rides(self, count):
+        for _ in range(count):
+            driver = make_user(f'driver{Booking.objects.count()}@example.com', 'driver')
+            Booking.objects.create(
+                ride=make_ride(driver, seats=3), passenger=self.passenger,
+                seats_booked=1, total_price=2000,
+            )
+
+    def test_query_count_does_not_grow_with_the_page(self):
+        # Subscription check, then one query for the bookings with their
+        # passengers, rides, drivers and driver profiles
+        for count in (1, 10):
+            self.book_rides(count - Booking.objects.count())
+            with self.assertNumQueries(2):
+                response = self.client.get('/api/rides/my-bookings/', {'page_size': 20})
+            self.assertEqual(len(response.data['results']), count)
+
+
+class RideCompletionTests(TestCase):
+    def test_completing_twice_counts_and_pays_once(self):
+        driver = make_user('driver@example.com', 'driver')
+        passenger = make_user('passenger@example.com', 'passenger')
+        ride = make_ride(driver, seats=3)
+        booking = Booking.objects.create(
+            ride=ride, passenger=passenger, seats_booked=1, total_price=2000,
+            status='confirmed', payment_status='paid',
+        )
+        ledger.charge_booking(booking)
+        client = APIClient()
+        client.force_authenticate(driver)
+
+        self.assertEqual(client.post(f'/api/rides/complete/{ride.id}/').status_code, 200)
+        self.assertEqual(client.post(f'/api/rides/complete/{ride.id}/').status_code, 400)
+
+        stats = DriverStats.objects.get(driver=driver)
+        self.assertEqual((stats.completed_rides, stats.earnings), (1, 2000))
+        self.assertEqual(DailyMetrics.objects.get().rides_completed, 1)
+        self.assertEqual(ledger.balance_of(driver), 2000)
+
+
+class SeatHoldPaymentTests(TestCase):
+    """A hold whose payment completes after the sweeper expired it"""
+
+    def setUp(self):
+        cache.clear()
+        self.driver = make_user('driver@example.com', 'driver')
+        self.passenger = make_user('passenger@example.com', 'passenger')
+        self.ride = make_ride(self.driver, seats=2)
+        Ride.objects.reserve_seats(self.ride.id, 2)
+        self.hold = SeatHold.objects.create(
+            ride=self.ride, passenger=self.passenger, seats=2, total_price=4000,
+            payment_reference='momo-ref', expires_at=timezone.now() - timedelta(minutes=1),
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.passenger)
+        patcher = mock.patch('rides.views.MTNMoMoService')
+        self.momo = patcher.start().return_value
+        self.momo.check_payment_status.return_value = {'success': True, 'status': 'SUCCESSFUL'}
+        self.addCleanup(patcher.stop)
+
+    def confirm(self):
+        return self.client.post(f'/api/rides/holds/{self.hold.id}/confirm/', {}, format='json')
+
+    def expire(self):
+        past_grace = timezone.now() + timedelta(seconds=settings.SEAT_HOLD_PAYMENT_GRACE_SECONDS)
+        SeatHold.objects.release_expired(now=past_grace)
+
+    def test_sweeper_leaves_a_hold_with_payment_in_flight(self):
+        SeatHold.objects.release_expired()
+        self.hold.refresh_from_db()
+        self.assertEqual(self.hold.status, 'active')
+
+        self.assertEqual(self.confirm().status_code, 201)
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.available_seats, 0)
+
+    def test_late_payment_takes_the_seats_again_when_free(self):
+        self.expire()
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.available_seats, 2)
+
+        response = self.confirm()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['seats_booked'], 2)
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.available_seats, 0)
+        self.assertEqual(ledger.balance_of(self.passenger), 0)
+
+    def test_late_payment_is_refunded_once_when_seats_are_gone(self):
+        self.expire()
+        Ride.objects.reserve_seats(self.ride.id, 1)
+
+        self.assertEqual(self.confirm().status_code, 409)
+        self.assertEqual(self.confirm().status_code, 409)
+        self.hold.refresh_from_db()
+        self.assertEqual(self.hold.status, 'refunded')
+        self.assertFalse(Booking.objects.filter(passenger=self.passenger).exists())
+        self.assertEqual(ledger.balance_of(self.passenger), 4000)
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.available_seats, 1)
+
+    def test_sweeper_settles_paid_holds(self):
+        with mock.patch('rides.holds.MTNMoMoService') as momo:
+            momo.return_value.check_payment_status.return_value = {'success': True, 'status': 'SUCCESSFUL'}
+            call_command('release_expired_holds', stdout=StringIO())
+
+        self.hold.refresh_from_db()
+        self.assertEqual(self.hold.status, 'confirmed')
+        self.assertEqual(self.hold.booking.seats_booked, 2)
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.available_seats, 0)
+
+
+class ScheduledRideSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.driver = make_user('driver@example.com', 'driver')
+        passenger = make_user('passenger@example.com', 'passenger')
+        first = (timezone.now() + timedelta(days=1)).replace(microsecond=0)
+        self.schedule = RideSchedule.objects.create(
+            driver=self.driver, start_location='Kigali', destination='Huye',
+            first_departure=first, end_date=first + timedelta(days=6),
+            price_per_seat=3000, available_seats=4, schedule_type='monthly',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(passenger)
+
+    def test_booked_occurrence_is_listed_once_with_real_seats(self):
+        departure = self.schedule.first_departure
+        ride = self.schedule.materialize_occurrence(departure)
+        self.assertEqual(self.schedule.materialize_occurrence(departure), ride)
+        self.assertEqual(DailyMetrics.objects.get().rides_created, 1)
+        Ride.objects.reserve_seats(ride.id, 3)
+
+        rows = self.client.get('/api/rides/search/', {
+            'start_location': 'Kigali', 'include_scheduled': 'true',
+        }).data
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['id'], ride.id)
+        self.assertEqual(rows[0]['available_seats'], 1)
+
+    @mock.patch('rides.views.SearchRideView.MAX_VIRTUAL_OCCURRENCES', 5)
+    def test_occurrences_of_several_schedules_are_merged_by_departure(self):
+        first = self.schedule.first_departure
+        schedules = [
+            RideSchedule.objects.create(
+                driver=self.driver, start_location='Kigali', destination='Rubavu',
+                first_departure=first + timedelta(hours=hours), end_date=first + timedelta(days=30),
+                price_per_seat=3000, available_seats=4, schedule_type='daily',
+            )
+            for hours in (2, 1)
+        ]
+        now = timezone.now()
+        expected = sorted(
+            (departure, schedule.id)
+            for schedule in schedules
+            for departure in schedule.occurrences(now, now + timedelta(days=30))
+        )[:5]
+
+        rows = self.client.get('/api/rides/search/', {
+            'start_location': 'Kigali', 'destination': 'Rubavu', 'include_scheduled': 'true',
+        }).data
+        self.assertEqual(
+            [(parse_datetime(row['departure_time']), row['schedule']) for row in rows], expected
+        )
+        self.assertEqual({row['schedule'] for row in rows}, {schedule.id for schedule in schedules})
+
+
+class RideTrailTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_polyline_matches_the_reference_encoding(self):
+        # Example from Google's polyline algorithm documentation
+        points = [(38.5, -120.2), (40.7, -120.95), (43.252, -126.453)]
+        encoded = trails.encode_polyline(points)
+        self.assertEqual(encoded, '_p~iF~ps|U_ulLnnqC_mqNvxq`@')
+        self.assertEqual(trails.decode_polyline(encoded), points)
+
+    def test_simplify_drops_points_within_tolerance_only(self):
+        # North along a meridian (~1.1 m jitter), then a sharp turn east
+        road = [(-1.95 + i * 0.001, 30.06 + (0.00001 if i % 2 else 0)) for i in range(11)]
+        corner = road[-1]
+        road += [(corner[0], corner[1] + i * 0.001) for i in range(1, 11)]
+
+        simplified = trails.simplify(road, tolerance_m=10)
+        self.assertEqual(simplified, [road[0], corner, road[-1]])
+        # The jitter is kept under a tighter tolerance, the straight leg isn't
+        self.assertEqual(trails.simplify(road, tolerance_m=0.5), road[:11] + [road[-1]])
+
+    @override_settings(LOCATION_TTL_SECONDS=1, LOCATION_MIN_INTERVAL_SECONDS=0)
+    def test_trail_outlives_the_live_track(self):
+        pings = [{'lat': -1.95 + i * 0.01, 'lng': 30.06} for i in range(4)]
+        for ping in pings[:2]:
+            location.record_location(1, 2, location.make_point(ping), keep_trail=True)
+        time.sleep(1.1)
+        for ping in pings[2:]:
+            location.record_location(1, 2, location.make_point(ping), keep_trail=True)
+
+        points, _ = trails.load_trail(1, 2)
+        self.assertEqual(points, [(p['lat'], p['lng']) for p in pings])
+
+
+class LiveLocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.driver = make_user('driver@example.com', 'driver')
+        self.passenger = make_user('passenger@example.com', 'passenger')
+        self.ride = make_ride(self.driver, seats=3)
+        self.driver_client = APIClient()
+        self.driver_client.force_authenticate(self.driver)
+        self.passenger_client = APIClient()
+        self.passenger_client.force_authenticate(self.passenger)
+
+    def ping(self, client, lat=-1.95):
+        return client.post('/api/rides/location/', {'ride_id': self.ride.id, 'lat': lat, 'lng': 30.06})
+
+    def test_booking_changes_reset_the_ride_context(self):
+        self.assertEqual(location.ride_context(self.ride.id)['passengers'], {})
+
+        booking_id = self.passenger_client.post('/api/rides/book/', {
+            'ride': self.ride.id, 'seats_booked': 1, 'payment_confirmed': True,
+        }, format='json').data['id']
+        self.assertEqual(self.ping(self.passenger_client).status_code, 202)
+
+        self.driver_client.post(f'/api/rides/bookings/{booking_id}/reject/')
+        self.assertEqual(self.ping(self.passenger_client).status_code, 403)
+
+    def test_pings_inside_the_interval_are_coalesced(self):
+        first = self.ping(self.driver_client, lat=-1.95)
+        second = self.ping(self.driver_client, lat=-1.96)
+
+        self.assertFalse(first.data['coalesced'])
+        self.assertTrue(second.data['coalesced'])
+        self.assertEqual(location.latest(self.ride.id, self.driver.id)['lat'], -1.96)
+        self.assertEqual([p['lat'] for p in location.history(self.ride.id, self.driver.id)], [-1.95])
+
+    def test_pings_from_outsiders_are_refused(self):
+        outsider = APIClient()
+        outsider.force_authenticate(make_user('other@example.com', 'passenger'))
+        self.assertEqual(self.ping(outsider).status_code, 403)
+        self.assertIsNone(location.latest(self.ride.id, self.driver.id))
+
+    @override_settings(LOCATION_MIN_INTERVAL_SECONDS=0, LOCATION_BUFFER_SIZE=3)
+    def test_ring_buffer_keeps_the_newest_points(self):
+        for i in range(5):
+            point = {'lat': -1.95 + i * 0.01, 'lng': 30.06, 't': 1000.0 + i}
+            self.assertTrue(location.record_location(self.ride.id, self.driver.id, point))
+
+        self.assertEqual(location.track_length(self.ride.id, self.driver.id), 5)
+        self.assertEqual([p['t'] for p in location.history(self.ride.id, self.driver.id)], [1002.0, 1003.0, 1004.0])
+
+
+@unittest.skipUnless(
+    connection.vendor == 'postgresql',
+    "needs row-level locking; SQLite refuses concurrent writers instead of queueing them"
+)
+class ConcurrentBookingTests(TransactionTestCase):
+    SEATS = 10
+    ATTEMPTS = 200
+
+    def setUp(self):
+        self.driver = make_user('driver@example.com', 'driver')
+        self.passenger = make_user('passenger@example.com', 'passenger')
+        self.ride = make_ride(self.driver, seats=self.SEATS)
+
+    def _book(self, _):
+        client = APIClient()
+        client.force_authenticate(self.passenger)
+        try:
+            response = client.post('/api/rides/book/', {
+                'ride': self.ride.id,
+                'seats_booked': 1,
+                'payment_confirmed': True,
+            }, format='json')
+            return response.status_code
+        finally:
+            connection.close()
+
+    def test_parallel_bookings_sell_exactly_the_available_seats(self):
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            results = list(pool.map(self._book, range(self.ATTEMPTS)))
+
+        self.ride.refresh_from_db()
+        booked = Booking.objects.filter(ride=self.ride).aggregate(
+            total=Sum('seats_booked')
+        )['total'] or 0
+
+        self.assertEqual(results.count(201), self.SEATS)
+        self.assertEqual(results.count(400), self.ATTEMPTS - self.SEATS)
+        self.assertEqual(booked, self.SEATS)
+        self.assertEqual(self.ride.available_seats, 0)
+
+
+class GeofenceTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        driver = make_user('driver@example.com', 'driver')
+        passenger = make_user('passenger@example.com', 'passenger')
+        self.ride = make_ride(driver, seats=3)
+        self.booking = Booking.objects.create(
+            ride=self.ride, passenger=passenger, seats_booked=1, total_price=2000,
+            status='confirmed',
+            pickup_latitude=-1.9441, pickup_longitude=30.0619,
+            dropoff_latitude=-1.4995, dropoff_longitude=29.6344,
+        )
+
+    def crossings(self, lat, lng):
+        return [
+            (fence['kind'], stage)
+            for fence, stage, _ in geofence.evaluate(self.ride.id, lat, lng)
+        ]
+
+    def test_stages_only_move_forward_once(self):
+        ARRIVING, AT_STOP, PICKED_UP = geofence.ARRIVING, geofence.AT_STOP, geofence.PICKED_UP
+        self.assertEqual(self.crossings(-1.9700, 30.0619), [])
+        self.assertEqual(self.crossings(-1.9470, 30.0619), [('pickup', ARRIVING)])
+        self.assertEqual(self.crossings(-1.9460, 30.0619), [])
+        self.assertEqual(self.crossings(-1.9442, 30.0619), [('pickup', AT_STOP)])
+        self.assertEqual(self.crossings(-1.9443, 30.0620), [])
+        self.assertEqual(self.crossings(-1.9300, 30.0400), [('pickup', PICKED_UP)])
+        self.assertEqual(self.crossings(-1.9442, 30.0619), [])
+        self.assertEqual(self.crossings(-1.4996, 29.6344), [('dropoff', AT_STOP)])
+
+    def test_accepted_booking_gets_fences_without_resetting_progress(self):
+        self.assertEqual(self.crossings(-1.9470, 30.0619), [('pickup', geofence.ARRIVING)])
+        other = Booking.objects.create(
+            ride=self.ride, passenger=make_user('other@example.com', 'passenger'),
+            seats_booked=1, total_price=2000,
+            pickup_latitude=-1.9445, pickup_longitude=30.0619,
+        )
+        client = APIClient()
+        client.force_authenticate(self.ride.driver)
+        client.post(f'/api/rides/bookings/{other.id}/accept/')
+
+        crossed = geofence.evaluate(self.ride.id, -1.9470, 30.0619)
+        self.assertEqual(
+            [(fence['booking_id'], fence['kind'], stage) for fence, stage, _ in crossed],
+            [(other.id, 'pickup', geofence.ARRIVING)],
+        )
+
+
+class SearchCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_searches_all_register_their_pairs(self):
+        bucket = search_cache._current_bucket()
+        pairs = [('kigali', f'town {i}') for i in range(40)]
+        with ThreadPoolExecutor(max_workers=10) as pool:
+            list(pool.map(lambda pair: search_cache._remember_pair(pair, bucket), pairs * 2))
+
+        self.assertEqual(search_cache._known_pairs(), set(pairs))
+
+    def test_invalidation_bumps_only_matching_pairs(self):
+        bucket = search_cache._current_bucket()
+        tags = {}
+        for pair in [('kigali', 'musanze'), ('kigali', ''), ('huye', 'musanze')]:
+            search_cache._remember_pair(pair, bucket)
+            tags[pair] = search_cache._pair_tag(*pair)
+        before = search_cache._tag_versions(list(tags.values()))
+
+        search_cache.invalidate_ride(Ride(start_location='Kigali', destination='Musanze'))
+
+        after = cache.get_many(list(tags.values()))
+        self.assertNotEqual(after[tags['kigali', 'musanze']], before[tags['kigali', 'musanze']])
+        self.assertNotEqual(after[tags['kigali', '']], before[tags['kigali', '']])
+        self.assertEqual(after[tags['huye', 'musanze']], before[tags['huye', 'musanze']])
+
+    def test_spellings_sharing_a_key_get_the_same_rides(self):
+        driver = make_user('driver@example.com', 'driver')
+        ride = make_ride(driver, seats=3)
+        Ride.objects.filter(id=ride.id).update(start_location='Kigali City')
+        client = APIClient()
+        client.force_authenticate(make_user('passenger@example.com', 'passenger'))
+
+        for term in ('  kigali   CITY ', 'Kigali City'):
+            with self.subTest(term=term):
+                cache.clear()
+                rows = client.get('/api/rides/search/', {'start_location': term}).data
+                self.assertEqual([row['id'] for row in rows], [ride.id])
+
+
+class RadiusSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.driver = make_user('driver@example.com', 'driver')
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('passenger@example.com', 'passenger'))
+
+    def ride_at(self, lat, lng, hours=24):
+        ride = make_ride(self.driver, 3)
+        ride.start_latitude, ride.start_longitude = lat, lng
+        ride.departure_time = timezone.now() + timedelta(hours=hours)
+        ride.save()
+        return ride
+
+    def search(self, **params):
+        return self.client.get('/api/rides/search/', {
+            'start_lat': -1.95, 'start_lng': 30.06, 'radius_km': 10, **params,
+        })
+
+    def test_pages_follow_distance_order(self):
+        rides = [self.ride_at(-1.95 + i * 0.01, 30.06, hours=24 - i) for i in range(5)]
+
+        seen, cursor = [], None
+        while True:
+            params = {'page_size': 2}
+            if cursor:
+                params['cursor'] = cursor
+            data = self.search(**params).data
+            seen += [row['id'] for row in data['results']]
+            if data['next'] is None:
+                break
+            cursor = data['next_cursor']
+
+        self.assertEqual(seen, [ride.id for ride in rides])
+
+    @override_settings(API_UNPAGED_MAX_ITEMS=2)
+    def test_unpaged_list_is_capped_with_a_next_link(self):
+        rides = [self.ride_at(-1.95 + i * 0.01, 30.06) for i in range(3)]
+
+        response = self.search()
+        self.assertEqual([row['id'] for row in response.data], [rides[0].id, rides[1].id])
+        self.assertIn('rel="next"', response['Link'])
+
+        cached = self.search()
+        self.assertEqual(cached.data, response.data)
+        self.assertEqual(cached['X-Next-Cursor'], response['X-Next-Cursor'])
+
+        rest = self.search(cursor=response['X-Next-Cursor']).data
+        self.assertEqual([row['id'] for row in rest['results']], [rides[2].id])
+
+    def test_radius_edge_and_distance_order(self):
+        # 0.09 degrees of latitude is about 10.01 km
+        far = self.ride_at(-1.95 + 0.0895, 30.06)
+        self.ride_at(-1.95 + 0.0905, 30.06)
+        self.ride_at(-1.95, 30.06 - 0.0905)
+        near = self.ride_at(-1.95 + 0.02, 30.06)
+        middle = self.ride_at(-1.95, 30.06 + 0.05)
+
+        rows = self.search().data
+        self.assertEqual([row['id'] for row in rows], [near.id, middle.id, far.id])
+        distances = [row['distance_km'] for row in rows]
+        self.assertEqual(distances, sorted(distances))
+        self.assertLessEqual(distances[-1], 10)
+
+    def test_out_of_range_parameters_are_refused(self):
+        for params in (
+            {'radius_km': 0},
+            {'radius_km': 1000},
+            {'start_lat': 91},
+            {'start_lng': 'east'},
+        ):
+            with self.subTest(**params):
+                self.assertEqual(self.search(**params).status_code, 400)
+        self.assertEqual(self.client.get('/api/rides/search/', {'start_lat': -1.95}).status_code, 400)
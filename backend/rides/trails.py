@@ -0,0 +1,149 @@
+"""
+Compact route records for completed rides.
+
+While a ride is live the driver's accepted location points are kept in the
+cache (rides.location). When the ride is completed they are simplified with
+Douglas-Peucker to within RIDE_TRAIL_TOLERANCE_METERS of the raw path and
+stored on the ride as an encoded polyline (Google's format, 1e-5 degrees),
+so an hour of pings becomes a few hundred bytes.
+"""
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .geo import EARTH_RADIUS_KM, haversine_km
+from . import location
+
+FETCH_BATCH = 500
+
+
+def _project(points):
+    """Equirectangular projection to metres around the first point"""
+    lat0 = math.radians(points[0][0])
+    scale = EARTH_RADIUS_KM * 1000 * math.pi / 180
+    return [
+        (lng * scale * math.cos(lat0), lat * scale)
+        for lat, lng in points
+    ]
+
+
+def _distance_to_segment(p, a, b):
+    (px, py), (ax, ay), (bx, by) = p, a, b
+    dx, dy = bx - ax, by - ay
+    if dx == 0 and dy == 0:
+        return math.hypot(px - ax, py - ay)
+    t = max(0, min(1, ((px - ax) * dx + (py - ay) * dy) / (dx * dx + dy * dy)))
+    return math.hypot(px - (ax + t * dx), py - (ay + t * dy))
+
+
+def simplify(points, tolerance_m):
+    """
+    Douglas-Peucker over (lat, lng) points; keeps every point further than
+    tolerance_m from the simplified line. Iterative, so long trails can't
+    hit the recursion limit.
+    """
+    if len(points) < 3:
+        return list(points)
+
+    projected = _project(points)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+
+    while stack:
+        first, last = stack.pop()
+        furthest, max_distance = None, tolerance_m
+        for i in range(first + 1, last):
+            distance = _distance_to_segment(projected[i], projected[first], projected[last])
+            if distance > max_distance:
+                furthest, max_distance = i, distance
+        if furthest is not None:
+            keep[furthest] = True
+            stack.append((first, furthest))
+            stack.append((furthest, last))
+
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def _encode_value(value):
+    value = ~(value << 1) if value < 0 else value << 1
+    chunks = []
+    while value >= 0x20:
+        chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+        value >>= 5
+    chunks.append(chr(value + 63))
+    return ''.join(chunks)
+
+
+def encode_polyline(points):
+    """Encode (lat, lng) points as a polyline string"""
+    encoded = []
+    prev_lat = prev_lng = 0
+    for lat, lng in points:
+        lat_e5 = int(round(lat * 1e5))
+        lng_e5 = int(round(lng * 1e5))
+        encoded.append(_encode_value(lat_e5 - prev_lat))
+        encoded.append(_encode_value(lng_e5 - prev_lng))
+        prev_lat, prev_lng = lat_e5, lng_e5
+    return ''.join(encoded)
+
+
+def decode_polyline(encoded):
+    """Inverse of encode_polyline"""
+    points = []
+    index = lat = lng = 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            result = shift = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lng += deltas[1]
+        points.append((lat / 1e5, lng / 1e5))
+    return points
+
+
+def path_length_km(points):
+    return sum(
+        haversine_km(a[0], a[1], b[0], b[1])
+        for a, b in zip(points, points[1:])
+    )
+
+
+def load_trail(ride_id, driver_id):
+    """Raw trail points of a ride in order, and their cache keys"""
+    keys = [
+        location.trail_point_key(ride_id, driver_id, seq)
+        for seq in range(1, location.track_length(ride_id, driver_id) + 1)
+    ]
+    points = []
+    for start in range(0, len(keys), FETCH_BATCH):
+        batch = keys[start:start + FETCH_BATCH]
+        found = cache.get_many(batch)
+        points.extend(found[key] for key in batch if key in found)
+    return [(p['lat'], p['lng']) for p in points], keys
+
+
+def close_trail(ride):
+    """
+    Simplify and store the driver's trail on a finished ride, then drop the
+    raw points. Returns the number of raw points, 0 if nothing was tracked.
+    """
+    raw, keys = load_trail(ride.id, ride.driver_id)
+    if raw:
+        simplified = simplify(raw, settings.RIDE_TRAIL_TOLERANCE_METERS)
+        ride.route_polyline = encode_polyline(simplified)
+        ride.route_distance_km = round(path_length_km(raw), 2)
+        ride.save(update_fields=['route_polyline', 'route_distance_km'])
+    if keys:
+        for start in range(0, len(keys), FETCH_BATCH):
+            cache.delete_many(keys[start:start + FETCH_BATCH])
+    return len(raw)
@@ -7,6 +7,7 @@ from .views import (
     CreateBookingView,
     UpdateBookingStatusView,
     CompleteRideView,
+    CancelRideView,
     CreateRatingView,
     MyBookingsView,  # ADD THIS
     MyRideBookingsView,  # ADD THIS
@@ -15,20 +16,33 @@ from .views import (
     GetReceiptDataView,
     AcceptBookingView,
     RejectBookingView,
+    CreateSeatHoldView,
+    ConfirmSeatHoldView,
+    ReleaseSeatHoldView,
+    CreateScheduledRideView,
+    UpdateLocationView,
+    GetLocationView,
 )
 
 urlpatterns = [
     path('create/', CreateRideView.as_view(), name='create_ride'),
     path('search/', SearchRideView.as_view(), name='search_ride'),
+    path('schedule/', CreateScheduledRideView.as_view(), name='create_scheduled_ride'),
     path('book/', CreateBookingView.as_view(), name='create_booking'),
+    path('holds/', CreateSeatHoldView.as_view(), name='create_seat_hold'),
+    path('holds/<int:hold_id>/confirm/', ConfirmSeatHoldView.as_view(), name='confirm_seat_hold'),
+    path('holds/<int:hold_id>/release/', ReleaseSeatHoldView.as_view(), name='release_seat_hold'),
     path('booking/<int:booking_id>/update/', UpdateBookingStatusView.as_view(), name='update_booking_status'),
     path('complete/<int:ride_id>/', CompleteRideView.as_view(), name='complete_ride'),
+    path('cancel/<int:ride_id>/', CancelRideView.as_view(), name='cancel_ride'),
     path('rate/<int:booking_id>/', CreateRatingView.as_view(), name='create_rating'),
     path('my-rides-with-bookings/', MyRidesWithBookingsView.as_view(), name='my_rides_with_bookings'),
     path('receipt/<int:booking_id>/', GenerateReceiptView.as_view(), name='generate_receipt'),
     path('receipt/<int:booking_id>/data/', GetReceiptDataView.as_view(), name='receipt_data'),
     path('bookings/<int:booking_id>/accept/', AcceptBookingView.as_view(), name='accept_booking'),
     path('bookings/<int:booking_id>/reject/', RejectBookingView.as_view(), name='reject_booking'),
+    path('location/', UpdateLocationView.as_view(), name='update_location'),
+    path('bookings/<int:booking_id>/location/', GetLocationView.as_view(), name='get_location'),
     
     # Booking history
     path('my-bookings/', MyBookingsView.as_view(), name='my_bookings'),  # ADD THIS
@@ -1,13 +1,23 @@
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
 from rest_framework.response import Response
 from django.utils import timezone
+from django.db import transaction
+from django.db.models import Q
 from accounts.permissions import HasActiveSubscription
-from accounts.models import Notification
-from .models import Ride, Booking, Rating
+from accounts.pagination import CreatedAtPagination, DepartureTimePagination, SortedListPagination
+from accounts.mixins import EagerLoadingViewMixin
+from .models import Ride, Booking, Rating, SeatHold, RideSchedule
 from .serializers import RideSerializer, BookingSerializer, RatingSerializer
-from accounts.notifications import send_push_notification
+from .geo import covering_cells, haversine_km
+from . import geofence, holds, location, search_cache, trails
+from metrics import rollup
+from wallet import ledger, topups
+from accounts.notifications import (
+    create_notification, send_push_notification, send_bulk_push_notification,
+)
 from accounts.models import DriverProfile
 from rest_framework.exceptions import PermissionDenied
 from reportlab.lib.pagesizes import letter
@@ -17,7 +27,12 @@ from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph,
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.enums import TA_CENTER, TA_RIGHT
 from django.http import HttpResponse
+from django.conf import settings
 from io import BytesIO
+from datetime import datetime, timedelta
+from itertools import islice, repeat
+import heapq
+from wallet.momo_service import MTNMoMoService
 
 
 class CreateRideView(generics.CreateAPIView):
@@ -54,6 +69,8 @@ class CreateRideView(generics.CreateAPIView):
                 driver=self.request.user,
                 car_photo=driver_profile.car_photo_front if driver_profile.car_photo_front else None
             )
+            rollup.rides_created(1)
+            search_cache.invalidate_ride(ride)
             return
         
         # ===================================
@@ -70,17 +87,42 @@ class CreateRideView(generics.CreateAPIView):
                 driver=self.request.user,
                 car_photo=driver_profile.car_photo_front if driver_profile.car_photo_front else None
             )
+            rollup.rides_created(1)
+            search_cache.invalidate_ride(ride)
             
         except DriverProfile.DoesNotExist:
             raise PermissionDenied("Driver profile not found. Please upload your documents.")
 
-class SearchRideView(generics.ListAPIView):
+# Pagination headers of capped plain-list responses, kept with cached results
+PAGE_HEADERS = ('Link', 'X-Next-Cursor')
+
+
+class SearchRideView(EagerLoadingViewMixin, generics.ListAPIView):
+    """
+    Search active rides.
+
+    Text mode (start_location/destination) matches on location names.
+    Radius mode (start_lat/start_lng, optionally dest_lat/dest_lng) returns
+    rides starting within radius_km of the origin and, if given, ending
+    within dest_radius_km of the destination, nearest first, paged by a
+    cursor over (distance, departure_time, id) like the text mode.
+
+    In text mode, include_scheduled=true also returns occurrences of
+    recurring rides beyond the materialized window (up to `until`), marked
+    is_virtual; book them with `schedule` + `departure_time`.
+    """
     serializer_class = RideSerializer
     permission_classes = [IsAuthenticated, HasActiveSubscription]
+    pagination_class = DepartureTimePagination
+
+    DEFAULT_RADIUS_KM = 5
+    MAX_RADIUS_KM = 100
+    MAX_VIRTUAL_OCCURRENCES = 100
 
     def get_queryset(self):
-        start = self.request.query_params.get('start_location')
-        destination = self.request.query_params.get('destination')
+        # The same terms the result cache is keyed and invalidated on
+        start = search_cache.normalize_term(self.request.query_params.get('start_location'))
+        destination = search_cache.normalize_term(self.request.query_params.get('destination'))
 
         queryset = Ride.objects.filter(
             status='active',
@@ -95,6 +137,173 @@ class SearchRideView(generics.ListAPIView):
 
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        key = search_cache.cache_key(request, self.DEFAULT_RADIUS_KM)
+        cached = search_cache.get(key)
+        if cached is not None:
+            data, headers = cached
+            return Response(data, headers=headers)
+
+        response = self.search(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            headers = {name: response[name] for name in PAGE_HEADERS if response.has_header(name)}
+            search_cache.store(key, (response.data, headers))
+        return response
+
+    def search(self, request, *args, **kwargs):
+        try:
+            origin = self._parse_point('start_lat', 'start_lng', 'radius_km')
+            target = self._parse_point('dest_lat', 'dest_lng', 'dest_radius_km')
+        except (TypeError, ValueError):
+            return Response(
+                {"error": "Invalid coordinates or radius"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if origin is None and target is None:
+            response = super().list(request, *args, **kwargs)
+            if request.query_params.get('include_scheduled') in ('1', 'true'):
+                self._append_virtual_occurrences(response)
+            return response
+
+        rides = self._search_by_radius(origin, target)
+        paginator = SortedListPagination()
+        page = paginator.paginate_list(rides, request, self._radius_sort_key)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    def _parse_point(self, lat_param, lng_param, radius_param):
+        """Read a (lat, lng, radius_km) triple from the query string, or None"""
+        params = self.request.query_params
+        if params.get(lat_param) is None and params.get(lng_param) is None:
+            return None
+
+        lat = float(params.get(lat_param))
+        lng = float(params.get(lng_param))
+        radius = float(params.get(radius_param, self.DEFAULT_RADIUS_KM))
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError("Coordinates out of range")
+        if not (0 < radius <= self.MAX_RADIUS_KM):
+            raise ValueError("Radius out of range")
+        return lat, lng, radius
+
+    def _search_by_radius(self, origin, target):
+        """Probe the geohash index, then refine and order by exact distance"""
+        queryset = self.filter_queryset(self.get_queryset())
+        if origin is not None:
+            queryset = queryset.filter(self._cells_q('start_geohash', origin))
+        if target is not None:
+            queryset = queryset.filter(self._cells_q('destination_geohash', target))
+
+        results = []
+        for ride in queryset:
+            if origin is not None:
+                ride.distance_km = haversine_km(
+                    origin[0], origin[1], ride.start_latitude, ride.start_longitude
+                )
+                if ride.distance_km > origin[2]:
+                    continue
+            if target is not None:
+                ride.destination_distance_km = haversine_km(
+                    target[0], target[1],
+                    ride.destination_latitude, ride.destination_longitude
+                )
+                if ride.destination_distance_km > target[2]:
+                    continue
+            results.append(ride)
+
+        results.sort(key=self._radius_sort_key)
+        return results
+
+    @staticmethod
+    def _radius_sort_key(ride):
+        """
+        Nearest first in 100 m steps, then soonest departure; numeric so it
+        doubles as the page cursor
+        """
+        return (
+            int(getattr(ride, 'distance_km', 0) * 10),
+            int(getattr(ride, 'destination_distance_km', 0) * 10),
+            ride.departure_time.timestamp(),
+            ride.id,
+        )
+
+    def _append_virtual_occurrences(self, response):
+        """
+        Add not-yet-materialized occurrences of recurring rides. They all
+        depart after the materialized window, so they go after the last page.
+        """
+        if response.has_header('X-Next-Cursor'):
+            return
+        if isinstance(response.data, dict):
+            if response.data.get('next') is not None:
+                return
+            rows = response.data['results']
+        else:
+            rows = response.data
+
+        rides = self._virtual_occurrences()
+        rows.extend(self.get_serializer(rides, many=True).data)
+
+    def _virtual_occurrences(self):
+        params = self.request.query_params
+        now = timezone.now()
+        horizon = now + timedelta(days=settings.RIDE_SCHEDULE_MAX_SEARCH_DAYS)
+        try:
+            until = parse_iso_datetime(params['until']) if params.get('until') else None
+        except ValueError:
+            until = None
+        until = min(until or now + timedelta(days=settings.RIDE_SCHEDULE_SEARCH_DAYS), horizon)
+
+        schedules = RideSchedule.objects.filter(
+            is_active=True,
+            end_date__gte=now,
+        ).filter(
+            Q(materialized_until__isnull=True) | Q(materialized_until__lt=until)
+        ).select_related('driver__driverprofile')
+
+        start = search_cache.normalize_term(params.get('start_location'))
+        destination = search_cache.normalize_term(params.get('destination'))
+        if start:
+            schedules = schedules.filter(start_location__icontains=start)
+        if destination:
+            schedules = schedules.filter(destination__icontains=destination)
+
+        schedules = list(schedules)
+        # Occurrences materialized ahead of the schedule (e.g. booked ones)
+        # are real rides the main query already returned
+        materialized = set(
+            Ride.objects.filter(
+                schedule__in=schedules, departure_time__gt=now, departure_time__lte=until
+            ).values_list('schedule_id', 'departure_time')
+        )
+
+        # Each schedule yields in departure order, so merging the streams
+        # gives the soonest occurrences overall without expanding them all
+        streams = [
+            zip(schedule.occurrences(max(schedule.materialized_until or now, now), until), repeat(schedule))
+            for schedule in schedules
+        ]
+        occurrences = (
+            (departure, schedule)
+            for departure, schedule in heapq.merge(*streams, key=lambda pair: pair[0])
+            if (schedule.id, departure) not in materialized
+        )
+
+        rides = []
+        for departure, schedule in islice(occurrences, self.MAX_VIRTUAL_OCCURRENCES):
+            ride = schedule.build_ride(departure)
+            ride.driver = schedule.driver
+            rides.append(ride)
+        return rides
+
+    @staticmethod
+    def _cells_q(field, point):
+        query = Q()
+        for cell in covering_cells(*point):
+            query |= Q(**{f'{field}__startswith': cell})
+        return query
+
     def get_serializer_context(self):
         """Pass request to serializer for building absolute URLs"""
         context = super().get_serializer_context()
@@ -102,17 +311,103 @@ class SearchRideView(generics.ListAPIView):
         return context
 
 
+def parse_iso_datetime(value):
+    """Parse an ISO 8601 string from the app into an aware datetime"""
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def get_bookable_ride(data):
+    """
+    The active ride a booking request refers to: either `ride` (an id) or a
+    not-yet-materialized occurrence given as `schedule` + `departure_time`.
+    """
+    if not data.get('ride') and data.get('schedule'):
+        try:
+            schedule = RideSchedule.objects.get(id=data.get('schedule'), is_active=True)
+            departure_time = parse_iso_datetime(data.get('departure_time') or '')
+        except (RideSchedule.DoesNotExist, ValueError):
+            return None
+        ride = schedule.materialize_occurrence(departure_time)
+        return ride if ride is not None and ride.status == 'active' else None
+
+    try:
+        return Ride.objects.select_related('driver').get(id=data.get('ride'), status='active')
+    except (Ride.DoesNotExist, ValueError):
+        return None
+
+
+def parse_stop_points(data):
+    """
+    Optional pickup/drop-off coordinates of a booking request as Booking
+    field values; raises ValueError on a half-given or out-of-range pair.
+    """
+    fields = {}
+    for stop in ('pickup', 'dropoff'):
+        lat, lng = data.get(f'{stop}_lat'), data.get(f'{stop}_lng')
+        if lat is None and lng is None:
+            continue
+        lat, lng = float(lat), float(lng)
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValueError(f"{stop} coordinates out of range")
+        fields[f'{stop}_latitude'] = lat
+        fields[f'{stop}_longitude'] = lng
+    return fields
+
+
+def notify_new_booking(booking):
+    """Tell the passenger and the driver about a new paid booking"""
+    # Create in-app notifications
+    create_notification(
+        user=booking.passenger,
+        title="Ride Confirmed 🚗",
+        message=f"Your ride to {booking.ride.destination} has been confirmed."
+    )
+    create_notification(
+        user=booking.ride.driver,
+        title="New Booking 📢",
+        message=f"{booking.passenger.email} booked {booking.seats_booked} seat(s) for your ride to {booking.ride.destination}."
+    )
+
+    # Send push notification to driver
+    send_push_notification(
+        user=booking.ride.driver,
+        title="New Booking! 🎉",
+        body=f"{booking.passenger.username} booked {booking.seats_booked} seat(s) for your ride to {booking.ride.destination}",
+        data={
+            "type": "new_booking",
+            "booking_id": str(booking.id),
+            "ride_id": str(booking.ride.id),
+        }
+    )
+
+    # Send push notification to passenger
+    send_push_notification(
+        user=booking.passenger,
+        title="Booking Confirmed! ✅",
+        body=f"Your booking for {booking.ride.start_location} → {booking.ride.destination} is confirmed",
+        data={
+            "type": "booking_confirmed",
+            "booking_id": str(booking.id),
+        }
+    )
+
+
 class CreateBookingView(generics.CreateAPIView):
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated, HasActiveSubscription]
 
     def create(self, request, *args, **kwargs):
-        ride_id = request.data.get('ride')
-        seats_requested = int(request.data.get('seats_booked', 0))
         payment_confirmed = request.data.get('payment_confirmed', False)
+        # A MoMo top-up reference is verified and credited to the wallet,
+        # then the booking is paid from there
+        payment_reference = request.data.get('transaction_id')
+        pay_from_wallet = request.data.get('payment_method') == 'wallet' or bool(payment_reference)
 
         # Check payment confirmation
-        if not payment_confirmed:
+        if not payment_confirmed and not pay_from_wallet:
             return Response(
                 {"error": "Payment required before booking"},
                 status=status.HTTP_400_BAD_REQUEST
@@ -125,110 +420,316 @@ class CreateBookingView(generics.CreateAPIView):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        # Get the ride
         try:
-            ride = Ride.objects.get(id=ride_id, status='active')
-        except Ride.DoesNotExist:
+            seats_requested = int(request.data.get('seats_booked', 0))
+        except (TypeError, ValueError):
+            seats_requested = 0
+        if seats_requested < 1:
             return Response(
-                {"error": "Ride not found"}, 
+                {"error": "seats_booked must be at least 1"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Check available seats
-        if ride.available_seats < seats_requested:
+        try:
+            stop_points = parse_stop_points(request.data)
+        except (TypeError, ValueError):
             return Response(
-                {"error": "Not enough seats available"}, 
+                {"error": "Invalid pickup or dropoff coordinates"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Calculate total price
-        total_price = ride.price_per_seat * seats_requested
+        # Get the ride
+        ride = get_bookable_ride(request.data)
+        if ride is None:
+            return Response(
+                {"error": "Ride not found"}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-        # Create booking
-        booking = Booking.objects.create(
-            ride=ride,
-            passenger=request.user,
-            seats_booked=seats_requested,
-            total_price=total_price,
-            payment_status='paid'
-        )
+        if payment_reference:
+            topup, momo_status = topups.confirm(request.user, payment_reference)
+            if topup is None:
+                return Response(
+                    {"error": "Payment not found"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if momo_status != 'SUCCESSFUL':
+                return Response(
+                    {"error": "Payment not completed yet", "status": momo_status},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-        # Reduce available seats
-        ride.available_seats -= seats_requested
-        ride.save()
+        # Take the seats and create the booking together: the conditional
+        # decrement fails instead of overselling when seats run out.
+        with transaction.atomic():
+            if not Ride.objects.reserve_seats(ride.id, seats_requested):
+                return Response(
+                    {"error": "Not enough seats available"}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-        # Create in-app notifications
-        Notification.objects.create(
-            user=booking.passenger,
-            title="Ride Confirmed 🚗",
-            message=f"Your ride to {booking.ride.destination} has been confirmed."
-        )
-        Notification.objects.create(
-            user=booking.ride.driver,
-            title="New Booking 📢",
-            message=f"{booking.passenger.email} booked {booking.seats_booked} seat(s) for your ride to {booking.ride.destination}."
-        )
+            booking = Booking.objects.create(
+                ride=ride,
+                passenger=request.user,
+                seats_booked=seats_requested,
+                total_price=ride.price_per_seat * seats_requested,
+                # payment_confirmed alone is the client's word: no money moves
+                payment_status='paid' if pay_from_wallet else 'pending',
+                **stop_points
+            )
+            if pay_from_wallet:
+                try:
+                    ledger.charge_booking(booking, from_wallet=True)
+                except ledger.InsufficientFunds:
+                    transaction.set_rollback(True)
+                    return Response(
+                        {"error": "Insufficient wallet balance"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
 
-        # Send push notification to driver
-        send_push_notification(
-            user=booking.ride.driver,
-            title="New Booking! 🎉",
-            body=f"{request.user.username} booked {booking.seats_booked} seat(s) for your ride to {booking.ride.destination}",
-            data={
-                "type": "new_booking",
-                "booking_id": str(booking.id),
-                "ride_id": str(booking.ride.id),
-            }
-        )
+        ride.refresh_from_db(fields=['available_seats'])
+        search_cache.invalidate_ride(ride)
+        location.forget_ride(ride.id)
 
-        # Send push notification to passenger
-        send_push_notification(
-            user=request.user,
-            title="Booking Confirmed! ✅",
-            body=f"Your booking for {booking.ride.start_location} → {booking.ride.destination} is confirmed",
-            data={
-                "type": "booking_confirmed",
-                "booking_id": str(booking.id),
-            }
-        )
+        notify_new_booking(booking)
 
         serializer = BookingSerializer(booking)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class UpdateBookingStatusView(APIView):
+class CreateSeatHoldView(APIView):
+    """
+    Reserve seats for a short time and start the MoMo payment.
+
+    The seats are taken immediately, so the passenger cannot pay and then
+    find the ride full. Confirm the hold once payment succeeds; holds that
+    are never confirmed are reclaimed by `manage.py release_expired_holds`.
+    """
+    permission_classes = [IsAuthenticated, HasActiveSubscription]
+
+    def post(self, request):
+        phone_number = request.data.get('phone_number')
+
+        if not phone_number:
+            return Response(
+                {"error": "Phone number is required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        if request.user.is_restricted:
+            return Response(
+                {"error": "Your account is temporarily restricted due to low rating."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        try:
+            seats_requested = int(request.data.get('seats_booked', 0))
+        except (TypeError, ValueError):
+            seats_requested = 0
+        if seats_requested < 1:
+            return Response(
+                {"error": "seats_booked must be at least 1"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        ride = get_bookable_ride(request.data)
+        if ride is None:
+            return Response(
+                {"error": "Ride not found"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        total_price = ride.price_per_seat * seats_requested
+        with transaction.atomic():
+            if not Ride.objects.reserve_seats(ride.id, seats_requested):
+                return Response(
+                    {"error": "Not enough seats available"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            hold = SeatHold.objects.create(
+                ride=ride,
+                passenger=request.user,
+                seats=seats_requested,
+                total_price=total_price,
+                phone_number=phone_number,
+                expires_at=timezone.now() + timedelta(seconds=settings.SEAT_HOLD_TTL_SECONDS),
+            )
+        search_cache.invalidate_ride(ride)
+
+        result = MTNMoMoService().request_to_pay(phone_number, float(total_price))
+        if not result.get('success'):
+            hold.release()
+            search_cache.invalidate_ride(ride)
+            return Response(
+                {"error": result.get('error', 'Payment failed')},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        hold.payment_reference = result.get('reference_id', '')
+        hold.save(update_fields=['payment_reference'])
+
+        return Response({
+            "hold_id": hold.id,
+            "ride": ride.id,
+            "seats": hold.seats,
+            "total_price": str(hold.total_price),
+            "expires_at": hold.expires_at,
+            "transaction_id": hold.payment_reference,
+            "message": "Seats reserved. Please check your phone and enter PIN.",
+        }, status=status.HTTP_201_CREATED)
+
+
+REFUNDED_HOLD_MESSAGE = "Your seats were released before the payment completed and are no longer available. The payment has been refunded to your wallet."
+
+
+class ConfirmSeatHoldView(APIView):
+    """Turn a paid hold into a booking"""
     permission_classes = [IsAuthenticated]
 
-    def post(self, request, booking_id=None):
-        if booking_id is None:
-            booking_id = request.data.get("booking_id")
-        new_status = request.data.get("status")
+    def post(self, request, hold_id):
+        try:
+            hold = SeatHold.objects.select_related('ride__driver').get(
+                id=hold_id, passenger=request.user
+            )
+        except SeatHold.DoesNotExist:
+            return Response(
+                {"error": "Hold not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if hold.status == 'confirmed':
+            return Response(BookingSerializer(hold.booking).data)
+        if hold.status == 'refunded':
+            return Response(
+                {"error": REFUNDED_HOLD_MESSAGE},
+                status=status.HTTP_409_CONFLICT
+            )
 
-        # Get booking
         try:
-            booking = Booking.objects.get(id=booking_id)
-        except Booking.DoesNotExist:
+            stop_points = parse_stop_points(request.data)
+        except (TypeError, ValueError):
             return Response(
-                {"error": "Booking not found"}, 
+                {"error": "Invalid pickup or dropoff coordinates"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        payment = MTNMoMoService().check_payment_status(hold.payment_reference)
+        payment_status = payment.get('status')
+        if payment_status == 'FAILED':
+            hold.release()
+            search_cache.invalidate_ride(hold.ride)
+            return Response(
+                {"error": "Payment failed. Your seats have been released."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not payment.get('success') or payment_status != 'SUCCESSFUL':
+            if hold.status != 'active':
+                return Response(
+                    {"error": f"Hold is {hold.status}"},
+                    status=status.HTTP_409_CONFLICT
+                )
+            return Response(
+                {"error": "Payment not completed yet", "expires_at": hold.expires_at},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Paid: a booking if the seats are (still or again) free, else a
+        # refund to the wallet. The hold may have expired while MoMo was
+        # processing; that must never leave the passenger charged for nothing.
+        was_active = hold.status == 'active'
+        booking = holds.settle(hold, stop_points)
+        if booking is None:
+            return Response(
+                {"error": REFUNDED_HOLD_MESSAGE},
+                status=status.HTTP_409_CONFLICT
+            )
+        if not was_active:
+            search_cache.invalidate_ride(hold.ride)
+        location.forget_ride(hold.ride_id)
+
+        notify_new_booking(booking)
+
+        return Response(BookingSerializer(booking).data, status=status.HTTP_201_CREATED)
+
+
+class ReleaseSeatHoldView(APIView):
+    """Give up a hold before it expires (e.g. payment cancelled)"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, hold_id):
+        try:
+            hold = SeatHold.objects.select_related('ride').get(
+                id=hold_id, passenger=request.user
+            )
+        except SeatHold.DoesNotExist:
+            return Response(
+                {"error": "Hold not found"},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Check if user is the driver
-        if booking.ride.driver != request.user:
+        if not hold.release():
             return Response(
-                {"error": "Not allowed"}, 
-                status=status.HTTP_403_FORBIDDEN
+                {"error": f"Hold is {hold.status}"},
+                status=status.HTTP_409_CONFLICT
             )
+        search_cache.invalidate_ride(hold.ride)
+
+        return Response({"message": "Seats released"})
+
+
+class UpdateBookingStatusView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    # Status changes a driver may make
+    TRANSITIONS = {
+        'pending': ('confirmed', 'rejected'),
+        'confirmed': ('cancelled',),
+    }
+
+    def post(self, request, booking_id=None):
+        if booking_id is None:
+            booking_id = request.data.get("booking_id")
+        new_status = request.data.get("status")
 
-        # If rejecting, restore seats
-        if new_status == "rejected":
-            ride = booking.ride
-            ride.available_seats += booking.seats_booked
-            ride.save()
+        with transaction.atomic():
+            try:
+                booking = Booking.objects.select_for_update().select_related('ride').get(id=booking_id)
+            except Booking.DoesNotExist:
+                return Response(
+                    {"error": "Booking not found"}, 
+                    status=status.HTTP_404_NOT_FOUND
+                )
 
-        # Update booking status
-        booking.status = new_status
-        booking.save()
+            # Check if user is the driver
+            if booking.ride.driver_id != request.user.id:
+                return Response(
+                    {"error": "Not allowed"}, 
+                    status=status.HTTP_403_FORBIDDEN
+                )
+
+            old_status = booking.status
+            if new_status not in self.TRANSITIONS.get(old_status, ()):
+                return Response(
+                    {"error": f"Cannot change a {old_status} booking to {new_status}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            booking.status = new_status
+            if new_status in ("rejected", "cancelled"):
+                # Give the seats back and, if the money is still in escrow,
+                # the payment; only a posted refund marks the booking refunded
+                Ride.objects.release_seats(booking.ride_id, booking.seats_booked)
+                if booking.payment_status == "paid":
+                    _, refunded = ledger.refund_booking(booking)
+                    if refunded:
+                        booking.payment_status = "refunded"
+            booking.save()
+            rollup.booking_status_changed(booking, old_status, new_status)
+
+        if new_status in ("rejected", "cancelled"):
+            search_cache.invalidate_ride(booking.ride)
+        location.forget_ride(booking.ride_id)
+        geofence.forget_ride(booking.ride_id, keep_progress=True)
 
         # Send push notifications based on status
         if new_status == 'confirmed':
@@ -259,59 +760,135 @@ class CompleteRideView(APIView):
     permission_classes = [IsAuthenticated]
 
     def post(self, request, ride_id):
-        # Get ride
-        try:
-            ride = Ride.objects.get(id=ride_id)
-        except Ride.DoesNotExist:
-            return Response(
-                {"error": "Ride not found"}, 
-                status=status.HTTP_404_NOT_FOUND
-            )
-
-        # Check if user is the driver
-        if ride.driver != request.user:
-            return Response(
-                {"error": "Not allowed"}, 
-                status=status.HTTP_403_FORBIDDEN
-            )
+        # Mark ride and all confirmed bookings (in one statement) as completed.
+        # The ride row stays locked, so a repeated or concurrent complete sees
+        # the new status and never counts the ride or pays out twice.
+        with transaction.atomic():
+            try:
+                ride = Ride.objects.select_for_update().get(id=ride_id)
+            except Ride.DoesNotExist:
+                return Response(
+                    {"error": "Ride not found"}, 
+                    status=status.HTTP_404_NOT_FOUND
+                )
 
-        # Mark ride as completed
-        ride.status = "completed"
-        ride.save()
+            # Check if user is the driver
+            if ride.driver_id != request.user.id:
+                return Response(
+                    {"error": "Not allowed"}, 
+                    status=status.HTTP_403_FORBIDDEN
+                )
 
-        # Update all confirmed bookings
-        confirmed_bookings = ride.bookings.filter(status="confirmed")
-        for booking in confirmed_bookings:
-            booking.status = "completed"
-            booking.save()
+            if ride.status != "active":
+                return Response(
+                    {"error": f"Ride is already {ride.status}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-            # Create in-app notifications
-            Notification.objects.create(
-                user=booking.passenger,
-                title="Ride Completed ✅",
-                message=f"Your ride to {booking.ride.destination} has been marked as completed."
+            ride.status = "completed"
+            ride.save(update_fields=['status'])
+            confirmed_bookings = list(
+                ride.bookings.filter(status="confirmed").select_related('passenger')
             )
-
-            # Send push notification to passenger
-            send_push_notification(
-                user=booking.passenger,
-                title="Ride Completed! ⭐",
-                body=f"Your ride is complete. Please rate your driver!",
-                data={
+            ride.bookings.filter(id__in=[b.id for b in confirmed_bookings]).update(status="completed")
+            rollup.ride_completed(ride, earnings=sum(b.total_price for b in confirmed_bookings))
+            for booking in confirmed_bookings:
+                if booking.payment_status == "paid":
+                    ledger.payout_booking(booking, ride.driver_id)
+        search_cache.invalidate_ride(ride)
+        location.forget_ride(ride.id)
+        geofence.forget_ride(ride.id)
+        trails.close_trail(ride)
+
+        notices = [
+            (
+                booking.passenger,
+                "Ride Completed! ⭐",
+                f"Your ride to {ride.destination} is complete. Please rate your driver!",
+                {
                     "type": "ride_completed",
                     "booking_id": str(booking.id),
                     "ride_id": str(ride.id),
-                }
+                },
             )
+            for booking in confirmed_bookings
+        ]
+        notices.append((
+            ride.driver,
+            "Ride Completed ✅",
+            f"Your ride to {ride.destination} has been marked as completed.",
+            {"type": "ride_completed", "ride_id": str(ride.id)},
+        ))
+        send_bulk_push_notification(notices)
 
-        # Notification for driver
-        Notification.objects.create(
-            user=ride.driver,
-            title="Ride Completed ✅",
-            message=f"Your ride to {ride.destination} has been marked as completed."
+        return Response({"message": "Ride completed successfully"})
+
+
+class CancelRideView(APIView):
+    """Driver cancels an upcoming ride; every booking on it is cancelled"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, ride_id):
+        with transaction.atomic():
+            try:
+                ride = Ride.objects.select_for_update().get(id=ride_id)
+            except Ride.DoesNotExist:
+                return Response(
+                    {"error": "Ride not found"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+
+            if ride.driver_id != request.user.id:
+                return Response(
+                    {"error": "Not allowed"},
+                    status=status.HTTP_403_FORBIDDEN
+                )
+
+            if ride.status != "active":
+                return Response(
+                    {"error": f"Ride is already {ride.status}"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            ride.status = "cancelled"
+            ride.save(update_fields=['status'])
+
+            bookings = list(
+                ride.bookings.filter(status__in=["pending", "confirmed"]).select_related('passenger')
+            )
+            booking_ids = [b.id for b in bookings]
+            # Only bookings whose refund was actually posted are marked refunded
+            refunded_ids = [
+                booking.id for booking in bookings
+                if booking.payment_status == "paid" and ledger.refund_booking(booking)[1]
+            ]
+            Booking.objects.filter(id__in=refunded_ids).update(payment_status="refunded")
+            Booking.objects.filter(id__in=booking_ids).update(status="cancelled")
+            ride.seat_holds.filter(status="active").update(status="released")
+            rollup.count_bookings([b for b in bookings if b.status == "confirmed"], -1)
+
+        search_cache.invalidate_ride(ride)
+        location.forget_ride(ride.id)
+        geofence.forget_ride(ride.id)
+
+        send_bulk_push_notification(
+            (
+                booking.passenger,
+                "Ride Cancelled ❌",
+                f"Your ride {ride.start_location} → {ride.destination} was cancelled by the driver.",
+                {
+                    "type": "ride_cancelled",
+                    "booking_id": str(booking.id),
+                    "ride_id": str(ride.id),
+                },
+            )
+            for booking in bookings
         )
 
-        return Response({"message": "Ride completed successfully"})
+        return Response({
+            "message": "Ride cancelled",
+            "cancelled_bookings": len(bookings),
+        })
 
 
 class CreateRatingView(APIView):
@@ -352,28 +929,27 @@ class CreateRatingView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Create rating
-        rating = Rating.objects.create(
-            booking=booking,
-            reviewer=request.user,
-            reviewee=reviewee,
-            score=score,
-            comment=request.data.get("comment", "")
-        )
-
-        # Evaluate trust level
-        reviewee.evaluate_trust_status()
+        # Create rating and update the reviewee's totals and trust level
+        with transaction.atomic():
+            rating = Rating.objects.create(
+                booking=booking,
+                reviewer=request.user,
+                reviewee=reviewee,
+                score=score,
+                comment=request.data.get("comment", "")
+            )
+            reviewee.add_rating(score)
 
         # Send warnings if necessary
         if reviewee.is_warned and not reviewee.is_restricted:
-            Notification.objects.create(
+            create_notification(
                 user=reviewee,
                 title="Account Warning ⚠️",
                 message="Your rating has fallen below 3. Please improve your behavior."
             )
 
         if reviewee.is_restricted:
-            Notification.objects.create(
+            create_notification(
                 user=reviewee,
                 title="Account Restricted 🚫",
                 message="Your account is temporarily restricted due to very low rating."
@@ -383,10 +959,11 @@ class CreateRatingView(APIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class MyBookingsView(generics.ListAPIView):
+class MyBookingsView(EagerLoadingViewMixin, generics.ListAPIView):
     """Get current user's bookings (for passengers)"""
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated, HasActiveSubscription]
+    pagination_class = CreatedAtPagination
 
     def get_queryset(self):
         return Booking.objects.filter(
@@ -394,10 +971,11 @@ class MyBookingsView(generics.ListAPIView):
         ).select_related('ride', 'ride__driver').order_by('-created_at')
 
 
-class MyRideBookingsView(generics.ListAPIView):
+class MyRideBookingsView(EagerLoadingViewMixin, generics.ListAPIView):
     """Get bookings for rides created by current user (for drivers)"""
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated, HasActiveSubscription]
+    pagination_class = CreatedAtPagination
 
     def get_queryset(self):
         return Booking.objects.filter(
@@ -410,9 +988,14 @@ class MyRidesWithBookingsView(APIView):
     permission_classes = [IsAuthenticated, HasActiveSubscription]
 
     def get(self, request):
-        rides = Ride.objects.filter(
-            driver=request.user
+        rides = RideSerializer.setup_eager_loading(
+            Ride.objects.filter(driver=request.user)
         ).prefetch_related('bookings__passenger').order_by('-created_at')
+
+        paginator = CreatedAtPagination()
+        page = paginator.paginate_queryset(rides, request, view=self)
+        if page is not None:
+            rides = page
         
         result = []
         for ride in rides:
@@ -440,7 +1023,9 @@ class MyRidesWithBookingsView(APIView):
             
             ride_data['bookings'] = bookings_data
             result.append(ride_data)
-        
+
+        if page is not None:
+            return paginator.get_paginated_response(result)
         return Response(result)
 
 
@@ -643,7 +1228,7 @@ class AcceptBookingView(APIView):
 
     def post(self, request, booking_id):
         try:
-            booking = Booking.objects.select_related('ride', 'passenger').get(id=booking_id)
+            booking = BookingSerializer.setup_eager_loading(Booking.objects).get(id=booking_id)
             
             # Only the driver can accept
             if booking.ride.driver != request.user:
@@ -660,8 +1245,12 @@ class AcceptBookingView(APIView):
                 )
             
             # Accept booking
-            booking.status = 'confirmed'
-            booking.save()
+            with transaction.atomic():
+                booking.status = 'confirmed'
+                booking.save()
+                rollup.count_bookings([booking], 1)
+            location.forget_ride(booking.ride_id)
+            geofence.forget_ride(booking.ride_id, keep_progress=True)
             
             # Send notification to passenger
             send_push_notification(
@@ -689,7 +1278,7 @@ class RejectBookingView(APIView):
 
     def post(self, request, booking_id):
         try:
-            booking = Booking.objects.select_related('ride', 'passenger').get(id=booking_id)
+            booking = BookingSerializer.setup_eager_loading(Booking.objects).get(id=booking_id)
             
             # Only the driver can reject
             if booking.ride.driver != request.user:
@@ -705,13 +1294,27 @@ class RejectBookingView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Reject booking
-            booking.status = 'cancelled'
-            booking.save()
-            
-            # Restore seats to ride
-            booking.ride.available_seats += booking.seats_booked
-            booking.ride.save()
+            # Reject booking; a paid one goes back to the passenger's wallet.
+            # The conditional update makes a repeated reject a no-op.
+            with transaction.atomic():
+                if not Booking.objects.filter(id=booking.id, status='pending').update(status='cancelled'):
+                    return Response(
+                        {"error": "Booking is no longer pending"},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+                booking.status = 'cancelled'
+                if booking.payment_status == 'paid':
+                    _, refunded = ledger.refund_booking(booking)
+                    if refunded:
+                        booking.payment_status = 'refunded'
+                        Booking.objects.filter(id=booking.id).update(payment_status='refunded')
+
+                # Restore seats to ride
+                Ride.objects.release_seats(booking.ride_id, booking.seats_booked)
+            booking.ride.refresh_from_db(fields=['available_seats'])
+            search_cache.invalidate_ride(booking.ride)
+            location.forget_ride(booking.ride_id)
+            geofence.forget_ride(booking.ride_id, keep_progress=True)
             
             # Send notification to passenger
             send_push_notification(
@@ -740,7 +1343,13 @@ class ScheduleBookingView(APIView):
         # Create recurring bookings based on schedule_type
         pass            
 class CreateScheduledRideView(APIView):
-    """Create recurring rides (daily, weekend, monthly)"""
+    """
+    Create recurring rides (daily, weekend, monthly)
+
+    The schedule is stored as a rule; only the next
+    RIDE_SCHEDULE_WINDOW_DAYS of rides are created now, and
+    `manage.py materialize_scheduled_rides` rolls the window forward.
+    """
     permission_classes = [IsAuthenticated]
     
     def post(self, request):
@@ -758,57 +1367,54 @@ class CreateScheduledRideView(APIView):
                 {"error": "All fields required"},
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+        if schedule_type not in dict(RideSchedule.SCHEDULE_CHOICES):
+            return Response(
+                {"error": "schedule_type must be daily, weekend or monthly"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         try:
-            departure_time = datetime.fromisoformat(departure_time_str.replace('Z', '+00:00'))
-            end_date = datetime.fromisoformat(end_date_str.replace('Z', '+00:00'))
-            
-            created_rides = []
-            current_date = departure_time
-            
-            while current_date <= end_date:
-                # Check schedule type
-                should_create = False
-                
-                if schedule_type == 'daily':
-                    # Monday to Friday (0-4)
-                    if current_date.weekday() < 5:
-                        should_create = True
-                        
-                elif schedule_type == 'weekend':
-                    # Saturday and Sunday (5-6)
-                    if current_date.weekday() >= 5:
-                        should_create = True
-                        
-                elif schedule_type == 'monthly':
-                    # Same day each month
-                    should_create = True
-                    
-                if should_create:
-                    ride = Ride.objects.create(
-                        driver=request.user,
-                        start_location=start_location,
-                        destination=destination,
-                        departure_time=current_date,
-                        price_per_seat=price_per_seat,
-                        available_seats=available_seats,
-                        status='active'
-                    )
-                    created_rides.append({
-                        'id': ride.id,
-                        'date': current_date.strftime('%Y-%m-%d'),
-                    })
-                
-                # Increment date
-                if schedule_type == 'monthly':
-                    current_date = current_date + relativedelta(months=1)
-                else:
-                    current_date = current_date + timedelta(days=1)
+            departure_time = parse_iso_datetime(departure_time_str)
+            end_date = parse_iso_datetime(end_date_str)
+
+            if end_date < departure_time:
+                return Response(
+                    {"error": "end_date must be after departure_time"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
+            schedule = RideSchedule.objects.create(
+                driver=request.user,
+                start_location=start_location,
+                destination=destination,
+                start_latitude=request.data.get('start_latitude'),
+                start_longitude=request.data.get('start_longitude'),
+                destination_latitude=request.data.get('destination_latitude'),
+                destination_longitude=request.data.get('destination_longitude'),
+                first_departure=departure_time,
+                end_date=end_date,
+                price_per_seat=price_per_seat,
+                available_seats=available_seats,
+                schedule_type=schedule_type,
+            )
+
+            window_end = timezone.now() + timedelta(days=settings.RIDE_SCHEDULE_WINDOW_DAYS)
+            materialized = schedule.materialize(window_end)
+            if materialized:
+                search_cache.invalidate_ride(materialized[0])
+
+            created_rides = [
+                {'id': ride_id, 'date': departure.strftime('%Y-%m-%d')}
+                for ride_id, departure in schedule.rides.order_by('departure_time').values_list('id', 'departure_time')
+            ]
             
             return Response({
                 "message": f"{len(created_rides)} rides created successfully",
+                "schedule_id": schedule.id,
                 "rides_created": len(created_rides),
-                "rides": created_rides
+                "rides": created_rides,
+                "materialized_until": schedule.materialized_until,
             }, status=status.HTTP_201_CREATED)
             
         except Exception as e:
@@ -818,16 +1424,87 @@ class CreateScheduledRideView(APIView):
             )
 
 class UpdateLocationView(APIView):
-    """Update user's real-time location"""
+    """
+    Update user's real-time location
+
+    POST {"ride_id" or "booking_id", "lat", "lng", "heading"?, "speed"?,
+    "accuracy"?}. Authenticated from the token alone and served from the
+    cache (rides.location), so steady pings never query the database.
+    """
+    authentication_classes = [JWTStatelessUserAuthentication]
+    permission_classes = [IsAuthenticated]
+
     def post(self, request):
-        # Store lat/lng in cache or DB
-        pass
+        ride_id = request.data.get('ride_id')
+        try:
+            if ride_id is None and request.data.get('booking_id') is not None:
+                ride_id = location.ride_for_booking(int(request.data['booking_id']))
+            ride_id = int(ride_id)
+            point = location.make_point(request.data)
+        except (KeyError, TypeError, ValueError):
+            return Response(
+                {"error": "ride_id or booking_id, lat and lng are required"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        context = location.ride_context(ride_id)
+        # Stateless token users carry the id claim as a string
+        user_id = int(request.user.id)
+        if context is None:
+            return Response(
+                {"error": "Ride is not active"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if not location.is_participant(context, user_id):
+            return Response(
+                {"error": "You are not part of this ride"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        is_driver = user_id == context['driver_id']
+        appended = location.record_location(ride_id, user_id, point, keep_trail=is_driver)
+        if appended:
+            location.publish_location(context, ride_id, user_id, point)
+            if is_driver:
+                geofence.notify_crossings(
+                    ride_id, geofence.evaluate(ride_id, point['lat'], point['lng'])
+                )
+
+        return Response({"accepted": True, "coalesced": not appended}, status=status.HTTP_202_ACCEPTED)
+
 
 class GetLocationView(APIView):
     """Get other person's location"""
+    authentication_classes = [JWTStatelessUserAuthentication]
+    permission_classes = [IsAuthenticated]
+
     def get(self, request, booking_id):
-        # Return driver & passenger locations
-        pass
+        ride_id = location.ride_for_booking(booking_id)
+        context = location.ride_context(ride_id) if ride_id else None
+        if context is None:
+            return Response(
+                {"error": "No active ride for this booking"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        passenger_id = next(
+            (p for p, b in context['passengers'].items() if b == booking_id), None
+        )
+        if int(request.user.id) not in (context['driver_id'], passenger_id):
+            return Response(
+                {"error": "You are not part of this booking"},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        data = {
+            "ride_id": ride_id,
+            "driver": location.latest(ride_id, context['driver_id']),
+            "passenger": location.latest(ride_id, passenger_id),
+        }
+        if request.query_params.get('history') in ('1', 'true'):
+            data["driver_history"] = location.history(ride_id, context['driver_id'])
+        return Response(data)
+
 
 class SOSAlertView(APIView):
     """Handle SOS emergency"""
@@ -1,3 +1,42 @@
 from django.contrib import admin
+from . import ledger
+from .models import LedgerAccount, LedgerTransaction, LedgerEntry, TopUpRequest
 
-# Register your models here.
+
+@admin.register(LedgerAccount)
+class LedgerAccountAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "user", "code", "current_balance", "updated_at")
+    search_fields = ("user__email", "code")
+    readonly_fields = ("balance",)
+
+    @admin.display(description="Balance")
+    def current_balance(self, obj):
+        return ledger.balance_of_account(obj)
+
+
+class LedgerEntryInline(admin.TabularInline):
+    model = LedgerEntry
+    extra = 0
+    can_delete = False
+    readonly_fields = ("account", "amount", "balance_after", "created_at")
+
+
+@admin.register(LedgerTransaction)
+class LedgerTransactionAdmin(admin.ModelAdmin):
+    list_display = ("reference", "kind", "booking", "created_at")
+    list_filter = ("kind",)
+    search_fields = ("reference",)
+    inlines = [LedgerEntryInline]
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(TopUpRequest)
+class TopUpRequestAdmin(admin.ModelAdmin):
+    list_display = ("reference", "user", "amount", "method", "status", "created_at")
+    list_filter = ("status", "method")
+    search_fields = ("reference", "user__email")
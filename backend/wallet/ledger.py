@@ -0,0 +1,184 @@
+"""
+Double-entry wallet ledger.
+
+Every money movement is a LedgerTransaction whose entries sum to zero:
+
+    topup       external -> user wallet
+    charge      user wallet (or external, when paid by MoMo) -> escrow
+    payout      escrow -> driver wallet, when the ride completes
+    refund      escrow -> passenger wallet, when a paid booking is cancelled
+                (external -> wallet for a paid seat hold whose seats were gone)
+    withdrawal  user wallet -> external
+                (reversed external -> wallet if MoMo refuses the payout)
+
+post() locks the user wallets involved (in id order, so concurrent postings
+can't deadlock), refuses to take one below zero, appends the entries and
+moves each wallet's balance snapshot in the same transaction. The system
+accounts are never locked or updated: every charge, payout and refund
+touches one of them, so a snapshot there would serialize all payment
+traffic on a single row. Their balance is the sum of their entries
+(balance_of_account). References are unique, so retrying a posting is a
+no-op.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
+
+from .models import LedgerAccount, LedgerTransaction, LedgerEntry
+
+CENT = Decimal('0.01')
+
+
+class InsufficientFunds(Exception):
+    pass
+
+
+def parse_amount(value):
+    """Positive Decimal amount from request data; raises ValueError"""
+    try:
+        amount = Decimal(str(value)).quantize(CENT)
+    except (InvalidOperation, TypeError):
+        raise ValueError("Invalid amount")
+    if not amount.is_finite() or amount <= 0:
+        raise ValueError("Invalid amount")
+    return amount
+
+
+def wallet_for(user_id):
+    account, _ = LedgerAccount.objects.get_or_create(user_id=user_id)
+    return account
+
+
+def system_account(code):
+    account, _ = LedgerAccount.objects.get_or_create(code=code)
+    return account
+
+
+def balance_of(user):
+    """A user's wallet balance: one row, no entries read"""
+    balance = LedgerAccount.objects.filter(user=user).values_list('balance', flat=True).first()
+    return balance if balance is not None else Decimal('0.00')
+
+
+def balance_of_account(account):
+    """Snapshot for a wallet; system accounts are summed from their entries"""
+    if account.user_id is not None:
+        return account.balance
+    total = account.entries.aggregate(total=Sum('amount'))['total']
+    return total if total is not None else Decimal('0.00')
+
+
+def post(kind, reference, legs, booking=None, memo='', precondition=None):
+    """
+    Post [(account, amount), ...] as one transaction. Returns
+    (transaction, created); an existing reference returns the original.
+    With a booking, its row is locked first so postings for one booking run
+    one at a time. precondition is checked once the locks are taken; if it
+    fails nothing is posted and (None, False) is returned.
+    """
+    if sum(amount for _, amount in legs) != 0:
+        raise ValueError(f"Ledger legs for {reference} don't balance")
+
+    with transaction.atomic():
+        if booking is not None:
+            list(type(booking).objects.select_for_update().filter(pk=booking.pk).values_list('pk'))
+
+        existing = LedgerTransaction.objects.filter(reference=reference).first()
+        if existing is not None:
+            return existing, False
+
+        wallets = {
+            account.id: account
+            for account in LedgerAccount.objects.select_for_update()
+            .filter(id__in={account.id for account, _ in legs if account.user_id is not None})
+            .order_by('id')
+        }
+        if precondition is not None and not precondition():
+            return None, False
+
+        balances = {account_id: account.balance for account_id, account in wallets.items()}
+        entries = []
+        for account, amount in legs:
+            balance_after = None
+            if account.id in balances:
+                balances[account.id] += amount
+                balance_after = balances[account.id]
+                if balance_after < 0:
+                    raise InsufficientFunds(f"Insufficient balance for {kind}")
+            entries.append(LedgerEntry(account_id=account.id, amount=amount, balance_after=balance_after))
+
+        try:
+            with transaction.atomic():
+                txn = LedgerTransaction.objects.create(kind=kind, reference=reference, booking=booking, memo=memo)
+        except IntegrityError:
+            # Posted concurrently under the same reference
+            return LedgerTransaction.objects.get(reference=reference), False
+
+        for entry in entries:
+            entry.transaction = txn
+        LedgerEntry.objects.bulk_create(entries)
+        for account_id, balance in balances.items():
+            LedgerAccount.objects.filter(id=account_id).update(balance=balance)
+        return txn, True
+
+
+def topup(user, amount, reference, memo=''):
+    return post('topup', f'topup:{reference}', [
+        (system_account(LedgerAccount.EXTERNAL), -amount),
+        (wallet_for(user.id), amount),
+    ], memo=memo)
+
+
+def withdraw(user, amount, reference, memo=''):
+    return post('withdrawal', f'withdrawal:{reference}', [
+        (wallet_for(user.id), -amount),
+        (system_account(LedgerAccount.EXTERNAL), amount),
+    ], memo=memo)
+
+
+def reverse_withdrawal(user, amount, reference, memo=''):
+    """Give back a withdrawal MoMo refused; posted under its own reference"""
+    return post('withdrawal_reversal', f'withdrawal-reversal:{reference}', [
+        (system_account(LedgerAccount.EXTERNAL), -amount),
+        (wallet_for(user.id), amount),
+    ], memo=memo)
+
+
+def charge_booking(booking, from_wallet=False):
+    """Move a booking's price into escrow, from the passenger's wallet or MoMo"""
+    source = wallet_for(booking.passenger_id) if from_wallet else system_account(LedgerAccount.EXTERNAL)
+    return post('charge', f'charge:{booking.id}', [
+        (source, -booking.total_price),
+        (system_account(LedgerAccount.ESCROW), booking.total_price),
+    ], booking=booking)
+
+
+def _held_in_escrow(booking):
+    """Charged, and neither paid out nor refunded yet (check under the booking lock)"""
+    kinds = set(LedgerTransaction.objects.filter(booking=booking).values_list('kind', flat=True))
+    return 'charge' in kinds and not kinds & {'payout', 'refund'}
+
+
+def payout_booking(booking, driver_id):
+    """Release a completed booking's escrow to the driver"""
+    return post('payout', f'payout:{booking.id}', [
+        (system_account(LedgerAccount.ESCROW), -booking.total_price),
+        (wallet_for(driver_id), booking.total_price),
+    ], booking=booking, precondition=lambda: _held_in_escrow(booking))
+
+
+def refund_booking(booking):
+    """Return a cancelled booking's escrow to the passenger's wallet"""
+    return post('refund', f'refund:{booking.id}', [
+        (system_account(LedgerAccount.ESCROW), -booking.total_price),
+        (wallet_for(booking.passenger_id), booking.total_price),
+    ], booking=booking, precondition=lambda: _held_in_escrow(booking))
+
+
+def refund_hold(hold):
+    """Credit a paid seat hold that could not become a booking to the passenger's wallet"""
+    return post('refund', f'hold-refund:{hold.id}', [
+        (system_account(LedgerAccount.EXTERNAL), -hold.total_price),
+        (wallet_for(hold.passenger_id), hold.total_price),
+    ], memo=f'Seat hold {hold.id}')
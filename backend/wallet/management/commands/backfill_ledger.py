@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand
+
+from rides.models import Booking
+from wallet import ledger
+
+
+class Command(BaseCommand):
+    help = "Post ledger transactions for bookings paid before the ledger existed"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--credit-refunds', action='store_true',
+            help="Also credit refunded bookings to passenger wallets (skipped by default)",
+        )
+        parser.add_argument(
+            '--credit-payouts', action='store_true',
+            help="Also pay completed bookings into driver wallets (skipped by default: bookings "
+                 "marked paid before the ledger were never verified with MoMo, and wallet "
+                 "money can be withdrawn)",
+        )
+
+    def handle(self, *args, **options):
+        statuses = ['paid', 'refunded'] if options['credit_refunds'] else ['paid']
+        bookings = Booking.objects.filter(payment_status__in=statuses).select_related('ride')
+
+        counts = {'charge': 0, 'payout': 0, 'refund': 0}
+        last_id = 0
+        while True:
+            batch = list(bookings.filter(id__gt=last_id).order_by('id')[:options['batch_size']])
+            if not batch:
+                break
+            for booking in batch:
+                # References are unique, so rerunning skips what was posted
+                _, created = ledger.charge_booking(booking)
+                counts['charge'] += created
+                if booking.payment_status == 'refunded':
+                    _, created = ledger.refund_booking(booking)
+                    counts['refund'] += created
+                elif (
+                    options['credit_payouts']
+                    and booking.status == 'completed' and booking.ride.status == 'completed'
+                ):
+                    _, created = ledger.payout_booking(booking, booking.ride.driver_id)
+                    counts['payout'] += created
+            last_id = batch[-1].id
+
+        self.stdout.write(
+            f"Posted {counts['charge']} charge(s), {counts['payout']} payout(s), {counts['refund']} refund(s)"
+        )
@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from wallet.models import LedgerAccount, LedgerTransaction, LedgerEntry
+
+
+class Command(BaseCommand):
+    help = "Check that the wallet ledger balances and that wallet snapshots match their entries"
+
+    def handle(self, *args, **options):
+        problems = []
+
+        unbalanced = (
+            LedgerEntry.objects.values('transaction__reference')
+            .annotate(total=Sum('amount')).exclude(total=0).order_by()
+        )
+        for row in unbalanced:
+            problems.append(f"Transaction {row['transaction__reference']} sums to {row['total']}")
+
+        for reference in LedgerTransaction.objects.filter(entries__isnull=True).values_list('reference', flat=True):
+            problems.append(f"Transaction {reference} has no entries")
+
+        money = DecimalField(max_digits=14, decimal_places=2)
+        latest = LedgerEntry.objects.filter(account=OuterRef('pk')).order_by('-id')
+        accounts = LedgerAccount.objects.annotate(
+            entries_total=Coalesce(Sum('entries__amount'), Value(0), output_field=money),
+            last_balance=Subquery(latest.values('balance_after')[:1], output_field=money),
+        )
+        wallets = accounts.filter(user__isnull=False)
+        for account in wallets.exclude(balance=F('entries_total')):
+            problems.append(
+                f"Account {account}: balance {account.balance} but entries sum to {account.entries_total}"
+            )
+        for account in wallets.filter(last_balance__isnull=False).exclude(balance=F('last_balance')):
+            problems.append(
+                f"Account {account}: balance {account.balance} but last entry left {account.last_balance}"
+            )
+        for account in wallets.filter(balance__lt=0):
+            problems.append(f"Account {account}: negative wallet balance {account.balance}")
+
+        # System accounts keep no snapshot; their totals come from the entries
+        system_totals = {
+            account.code: account.entries_total for account in accounts.filter(user__isnull=True)
+        }
+        total = (wallets.aggregate(total=Sum('balance'))['total'] or 0) + sum(system_totals.values())
+        if total != 0:
+            problems.append(f"Account balances sum to {total} instead of 0")
+
+        for problem in problems:
+            self.stderr.write(problem)
+        if problems:
+            raise CommandError(f"Ledger has {len(problems)} problem(s)")
+
+        totals = ", ".join(f"{code} {amount}" for code, amount in sorted(system_totals.items()))
+        self.stdout.write(
+            f"Ledger OK: {LedgerTransaction.objects.count()} transaction(s), "
+            f"{LedgerAccount.objects.count()} account(s)" + (f"; {totals}" if totals else "")
+        )
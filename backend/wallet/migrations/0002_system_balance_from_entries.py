@@ -0,0 +1,25 @@
+# Generated by Django 4.2 on 2026-10-17 21:30
+
+from django.db import migrations, models
+
+
+def drop_system_snapshots(apps, schema_editor):
+    # System balances are summed from entries from now on
+    LedgerAccount = apps.get_model('wallet', 'LedgerAccount')
+    LedgerAccount.objects.filter(user__isnull=True).update(balance=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0001_ledger'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ledgerentry',
+            name='balance_after',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=14, null=True),
+        ),
+        migrations.RunPython(drop_system_snapshots, migrations.RunPython.noop),
+    ]
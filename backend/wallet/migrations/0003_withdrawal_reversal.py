@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-17 21:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wallet', '0002_system_balance_from_entries'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ledgertransaction',
+            name='kind',
+            field=models.CharField(choices=[('topup', 'Top-up'), ('charge', 'Booking charge'), ('payout', 'Driver payout'), ('refund', 'Refund'), ('withdrawal', 'Withdrawal'), ('withdrawal_reversal', 'Withdrawal reversal')], max_length=20),
+        ),
+    ]
@@ -1,3 +1,131 @@
+from django.conf import settings
 from django.db import models
 
-# Create your models here.
+
+class LedgerAccount(models.Model):
+    """
+    A balance in the wallet ledger: either a user's wallet or a system
+    account (external money, escrow). For wallets `balance` is a snapshot of
+    the sum of the account's entries, updated with every posting so reads
+    are a single row lookup; reconcile_ledger checks it against the entries.
+    System accounts keep no snapshot (see wallet.ledger).
+    """
+    EXTERNAL = 'external'  # money outside the platform (MoMo, cards)
+    ESCROW = 'escrow'      # booking payments held until the ride completes
+
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='wallet_account'
+    )
+    code = models.CharField(max_length=20, unique=True, null=True, blank=True)
+    balance = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(user__isnull=False, code__isnull=True)
+                | models.Q(user__isnull=True, code__isnull=False),
+                name='ledger_account_user_or_code',
+            ),
+        ]
+
+    def __str__(self):
+        return self.code or f"Wallet: {self.user_id}"
+
+
+class AppendOnlyModel(models.Model):
+    """Rows are never changed or deleted once written"""
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError(f"{type(self).__name__} rows are append-only")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError(f"{type(self).__name__} rows are append-only")
+
+
+class LedgerTransaction(AppendOnlyModel):
+    """One balanced posting; `reference` makes each posting happen once"""
+    KIND_CHOICES = (
+        ('topup', 'Top-up'),
+        ('charge', 'Booking charge'),
+        ('payout', 'Driver payout'),
+        ('refund', 'Refund'),
+        ('withdrawal', 'Withdrawal'),
+        ('withdrawal_reversal', 'Withdrawal reversal'),
+    )
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    reference = models.CharField(max_length=100, unique=True)
+    booking = models.ForeignKey(
+        'rides.Booking',
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='ledger_transactions'
+    )
+    memo = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.kind} {self.reference}"
+
+
+class LedgerEntry(AppendOnlyModel):
+    """
+    One leg of a transaction. A positive amount credits the account, a
+    negative one debits it; the legs of a transaction sum to zero.
+    """
+    transaction = models.ForeignKey(
+        LedgerTransaction,
+        on_delete=models.PROTECT,
+        related_name='entries'
+    )
+    account = models.ForeignKey(
+        LedgerAccount,
+        on_delete=models.PROTECT,
+        related_name='entries'
+    )
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    # Wallet balance after this entry; null on system accounts
+    balance_after = models.DecimalField(max_digits=14, decimal_places=2, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = 'ledger entries'
+        indexes = [
+            models.Index(fields=['account', '-id']),
+        ]
+
+    def __str__(self):
+        return f"{self.account} {self.amount:+}"
+
+
+class TopUpRequest(models.Model):
+    """A MoMo collection started from AddMoneyView, credited once it succeeds"""
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('completed', 'Completed'),
+    )
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='topup_requests'
+    )
+    reference = models.CharField(max_length=100, unique=True)
+    amount = models.DecimalField(max_digits=14, decimal_places=2)
+    method = models.CharField(max_length=20)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Top-up {self.reference} ({self.status})"
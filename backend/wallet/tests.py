@@ -1,3 +1,173 @@
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.core.management import CommandError, call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User, Subscription
+from rides.models import Ride, Booking
+from . import ledger
+from .models import LedgerAccount, LedgerTransaction, TopUpRequest
+
+
+def make_user(email, role):
+    user = User.objects.create_user(
+        email=email, username=email.split('@')[0], password='pass1234', role=role
+    )
+    Subscription.objects.create(
+        user=user, plan_type=role, expiry_date=date.today() + timedelta(days=30)
+    )
+    return user
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.driver = make_user('driver@example.com', 'driver')
+        self.passenger = make_user('passenger@example.com', 'passenger')
+        self.ride = Ride.objects.create(
+            driver=self.driver,
+            start_location='Kigali',
+            destination='Musanze',
+            departure_time=timezone.now() + timedelta(days=1),
+            price_per_seat=2000,
+            available_seats=3,
+        )
+        self.booking = Booking.objects.create(
+            ride=self.ride, passenger=self.passenger, seats_booked=1,
+            total_price=Decimal('2000.00'), status='confirmed', payment_status='paid',
+        )
+
+    def reconcile(self):
+        call_command('reconcile_ledger', stdout=StringIO(), stderr=StringIO())
+
+    def test_unbalanced_legs_are_refused(self):
+        wallet = ledger.wallet_for(self.passenger.id)
+        external = ledger.system_account(LedgerAccount.EXTERNAL)
+        with self.assertRaises(ValueError):
+            ledger.post('topup', 'topup:bad', [(external, Decimal('-10')), (wallet, Decimal('20'))])
+        self.assertFalse(LedgerTransaction.objects.exists())
+
+    def test_overdraft_raises_and_posts_nothing(self):
+        ledger.topup(self.passenger, Decimal('500'), 'momo-1')
+        with self.assertRaises(ledger.InsufficientFunds):
+            ledger.charge_booking(self.booking, from_wallet=True)
+        self.assertEqual(ledger.balance_of(self.passenger), Decimal('500'))
+        self.assertFalse(LedgerTransaction.objects.filter(kind='charge').exists())
+
+    def test_reposting_a_reference_is_a_no_op(self):
+        _, created = ledger.topup(self.passenger, Decimal('3000'), 'momo-1')
+        self.assertTrue(created)
+        _, created = ledger.topup(self.passenger, Decimal('3000'), 'momo-1')
+        self.assertFalse(created)
+        self.assertEqual(ledger.balance_of(self.passenger), Decimal('3000'))
+
+    def test_refund_and_payout_are_mutually_exclusive(self):
+        ledger.charge_booking(self.booking)
+        _, created = ledger.refund_booking(self.booking)
+        self.assertTrue(created)
+        self.assertEqual(ledger.payout_booking(self.booking, self.driver.id), (None, False))
+
+        self.assertEqual(ledger.balance_of(self.passenger), Decimal('2000'))
+        self.assertEqual(ledger.balance_of(self.driver), Decimal('0'))
+        escrow = ledger.system_account(LedgerAccount.ESCROW)
+        self.assertEqual(ledger.balance_of_account(escrow), Decimal('0'))
+
+    def test_uncharged_booking_is_never_paid_out(self):
+        self.assertEqual(ledger.payout_booking(self.booking, self.driver.id), (None, False))
+        self.assertEqual(ledger.balance_of(self.driver), Decimal('0'))
+
+    def test_reconcile_passes_on_a_consistent_ledger(self):
+        ledger.topup(self.passenger, Decimal('5000'), 'momo-1')
+        ledger.charge_booking(self.booking, from_wallet=True)
+        ledger.payout_booking(self.booking, self.driver.id)
+        ledger.withdraw(self.driver, Decimal('1500'), 'out-1')
+        self.reconcile()
+
+    def test_reconcile_fails_on_a_drifted_snapshot(self):
+        ledger.topup(self.passenger, Decimal('5000'), 'momo-1')
+        LedgerAccount.objects.filter(user=self.passenger).update(balance=Decimal('9000'))
+        with self.assertRaises(CommandError):
+            self.reconcile()
+
+
+class WalletApiTests(TestCase):
+    def setUp(self):
+        self.driver = make_user('driver@example.com', 'driver')
+        self.passenger = make_user('passenger@example.com', 'passenger')
+        self.ride = Ride.objects.create(
+            driver=self.driver,
+            start_location='Kigali',
+            destination='Musanze',
+            departure_time=timezone.now() + timedelta(days=1),
+            price_per_seat=2000,
+            available_seats=3,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.passenger)
+
+    def book_from_wallet(self, seats):
+        return self.client.post('/api/rides/book/', {
+            'ride': self.ride.id, 'seats_booked': seats, 'payment_method': 'wallet',
+        }, format='json')
+
+    def test_wallet_booking_needs_enough_balance(self):
+        ledger.topup(self.passenger, Decimal('3000'), 'momo-1')
+
+        response = self.book_from_wallet(2)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Booking.objects.exists())
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.available_seats, 3)
+
+        self.assertEqual(self.book_from_wallet(1).status_code, 201)
+        self.assertEqual(ledger.balance_of(self.passenger), Decimal('1000'))
+
+    def test_client_payment_flag_moves_no_money(self):
+        response = self.client.post('/api/rides/book/', {
+            'ride': self.ride.id, 'seats_booked': 1, 'payment_confirmed': True,
+        }, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Booking.objects.get().payment_status, 'pending')
+        self.assertFalse(LedgerTransaction.objects.exists())
+
+    @mock.patch('wallet.topups.MTNMoMoService')
+    def test_booking_with_a_verified_momo_reference(self, momo):
+        momo.return_value.check_payment_status.return_value = {'success': True, 'status': 'SUCCESSFUL'}
+        other = make_user('other@example.com', 'passenger')
+        TopUpRequest.objects.create(user=other, reference='theirs', amount=5000, method='momo')
+        TopUpRequest.objects.create(user=self.passenger, reference='mine', amount=5000, method='momo')
+
+        def book(reference):
+            return self.client.post('/api/rides/book/', {
+                'ride': self.ride.id, 'seats_booked': 1, 'transaction_id': reference,
+            }, format='json')
+
+        self.assertEqual(book('theirs').status_code, 400)
+        self.assertEqual(book('mine').status_code, 201)
+        self.assertEqual(book('mine').status_code, 201)
+        self.assertEqual(book('mine').status_code, 400)
+
+        self.assertEqual(ledger.balance_of(self.passenger), Decimal('1000'))
+        self.assertEqual(ledger.balance_of(other), Decimal('0'))
+        self.assertEqual(Booking.objects.filter(payment_status='paid').count(), 2)
+
+    @mock.patch('wallet.views.MTNMoMoService')
+    def test_refused_withdrawal_is_reversed(self, momo):
+        momo.return_value.request_to_withdraw.return_value = {'success': False, 'error': 'MoMo down'}
+        ledger.topup(self.passenger, Decimal('8000'), 'momo-1')
+
+        response = self.client.post('/api/wallet/withdraw/', {
+            'amount': '6000', 'phone_number': '0788000000',
+        }, format='json')
 
-# Create your tests here.
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ledger.balance_of(self.passenger), Decimal('8000'))
+        self.assertEqual(
+            sorted(LedgerTransaction.objects.values_list('kind', flat=True)),
+            ['topup', 'withdrawal', 'withdrawal_reversal'],
+        )
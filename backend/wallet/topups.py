@@ -0,0 +1,36 @@
+"""
+MoMo top-ups.
+
+AddMoneyView starts a collection and records a TopUpRequest; the wallet is
+credited only once MoMo reports the payment successful. The ledger posting
+is keyed on the MoMo reference, so confirming twice credits once, and a
+reference can only ever be claimed by the user who started it.
+"""
+from django.db import transaction
+
+from . import ledger
+from .models import TopUpRequest
+from .momo_service import MTNMoMoService
+
+
+def confirm(user, reference):
+    """
+    Credit the user's top-up `reference` if MoMo reports it successful.
+    Returns (topup, momo_status): topup is None if the user never started
+    it; momo_status is 'SUCCESSFUL' once the wallet has been credited.
+    """
+    topup = TopUpRequest.objects.filter(reference=reference, user=user).first()
+    if topup is None:
+        return None, None
+    if topup.status == 'completed':
+        return topup, 'SUCCESSFUL'
+
+    result = MTNMoMoService().check_payment_status(reference)
+    if not result.get('success') or result.get('status') != 'SUCCESSFUL':
+        return topup, result.get('status')
+
+    with transaction.atomic():
+        ledger.topup(user, topup.amount, reference, memo=topup.method)
+        TopUpRequest.objects.filter(id=topup.id).update(status='completed')
+    topup.status = 'completed'
+    return topup, 'SUCCESSFUL'
@@ -1,10 +1,11 @@
 # Create new file: backend/wallet/urls.py
 
 from django.urls import path
-from .views import AddMoneyView, WithdrawMoneyView, WalletBalanceView
+from .views import AddMoneyView, ConfirmTopUpView, WithdrawMoneyView, WalletBalanceView
 
 urlpatterns = [
     path('add-money/', AddMoneyView.as_view(), name='add_money'),
+    path('add-money/<str:transaction_id>/confirm/', ConfirmTopUpView.as_view(), name='confirm_topup'),
     path('withdraw/', WithdrawMoneyView.as_view(), name='withdraw_money'),
     path('balance/', WalletBalanceView.as_view(), name='wallet_balance'),
 ]
\ No newline at end of file
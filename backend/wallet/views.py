@@ -4,9 +4,15 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
+from decimal import Decimal
 from .momo_service import MTNMoMoService
+from . import ledger, topups
+from .models import TopUpRequest
 import uuid
 
+MIN_TOPUP = Decimal('1000')
+MIN_WITHDRAWAL = Decimal('5000')
+
 class AddMoneyView(APIView):
     """Add money to wallet using MTN MoMo"""
     permission_classes = [IsAuthenticated]
@@ -29,28 +35,35 @@ class AddMoneyView(APIView):
             )
         
         try:
-            amount_float = float(amount)
-            if amount_float < 1000:
-                return Response(
-                    {"error": "Minimum amount is 1,000 RWF"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+            amount = ledger.parse_amount(amount)
         except ValueError:
             return Response(
                 {"error": "Invalid amount"},
                 status=status.HTTP_400_BAD_REQUEST
             )
+        if amount < MIN_TOPUP:
+            return Response(
+                {"error": "Minimum amount is 1,000 RWF"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         # Process payment based on method
         if method in ['momo', 'airtel']:
             momo = MTNMoMoService()
-            result = momo.request_to_pay(phone_number, amount_float)
+            result = momo.request_to_pay(phone_number, float(amount))
             
             if result.get('success'):
+                # Credited by ConfirmTopUpView once MoMo reports success
+                TopUpRequest.objects.create(
+                    user=request.user,
+                    reference=result.get('reference_id'),
+                    amount=amount,
+                    method=method
+                )
                 return Response({
                     "message": "Payment request sent. Please check your phone and enter PIN.",
                     "transaction_id": result.get('reference_id'),
-                    "amount": amount_float,
+                    "amount": str(amount),
                     "method": method,
                     "status": "pending"
                 }, status=status.HTTP_201_CREATED)
@@ -64,7 +77,7 @@ class AddMoneyView(APIView):
             return Response({
                 "message": "Payment method not yet supported",
                 "transaction_id": str(uuid.uuid4()),
-                "amount": amount_float,
+                "amount": str(amount),
                 "method": method,
                 "status": "pending"
             }, status=status.HTTP_201_CREATED)
@@ -92,44 +105,55 @@ class WithdrawMoneyView(APIView):
             )
         
         try:
-            amount_float = float(amount)
-            if amount_float < 5000:
-                return Response(
-                    {"error": "Minimum withdrawal amount is 5,000 RWF"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+            amount = ledger.parse_amount(amount)
         except ValueError:
             return Response(
                 {"error": "Invalid amount"},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # TODO: Check if user has sufficient balance
-        # For now, proceed with withdrawal
+        if amount < MIN_WITHDRAWAL:
+            return Response(
+                {"error": "Minimum withdrawal amount is 5,000 RWF"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         if method in ['momo', 'airtel']:
+            # Commit the debit before calling MoMo, so no lock is held over
+            # the network call and money never leaves without a debit; a
+            # refused payout is given back by a separate reversal posting
+            reference = uuid.uuid4()
+            memo = f"{method} {phone_number}"
+            try:
+                ledger.withdraw(request.user, amount, reference, memo=memo)
+            except ledger.InsufficientFunds:
+                return Response(
+                    {"error": "Insufficient wallet balance"},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
             momo = MTNMoMoService()
-            result = momo.request_to_withdraw(phone_number, amount_float)
-            
-            if result.get('success'):
-                return Response({
-                    "message": "Withdrawal request submitted successfully. Funds will be sent shortly.",
-                    "transaction_id": result.get('reference_id'),
-                    "amount": amount_float,
-                    "method": method,
-                    "status": "pending"
-                }, status=status.HTTP_201_CREATED)
-            else:
+            result = momo.request_to_withdraw(phone_number, float(amount))
+            if not result.get('success'):
+                ledger.reverse_withdrawal(request.user, amount, reference, memo=memo)
                 return Response({
                     "error": result.get('error', 'Withdrawal failed'),
                 }, status=status.HTTP_400_BAD_REQUEST)
+
+            return Response({
+                "message": "Withdrawal request submitted successfully. Funds will be sent shortly.",
+                "transaction_id": result.get('reference_id'),
+                "amount": str(amount),
+                "method": method,
+                "status": "pending",
+                "balance": str(ledger.balance_of(request.user)),
+            }, status=status.HTTP_201_CREATED)
         
         else:
             # Other methods - placeholder
             return Response({
                 "message": "Withdrawal method not yet supported",
                 "transaction_id": str(uuid.uuid4()),
-                "amount": amount_float,
+                "amount": str(amount),
                 "method": method,
                 "status": "pending"
             }, status=status.HTTP_201_CREATED)
@@ -146,30 +170,38 @@ class CheckPaymentStatusView(APIView):
         return Response(result)
 
 
+class ConfirmTopUpView(APIView):
+    """Credit the wallet once MoMo reports a top-up as successful"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, transaction_id):
+        topup, momo_status = topups.confirm(request.user, transaction_id)
+        if topup is None:
+            return Response(
+                {"error": "Top-up not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if momo_status != 'SUCCESSFUL':
+            return Response({
+                "error": "Payment not completed yet",
+                "status": momo_status,
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            "message": "Wallet topped up",
+            "transaction_id": transaction_id,
+            "amount": str(topup.amount),
+            "balance": str(ledger.balance_of(request.user)),
+            "currency": "RWF"
+        })
+
+
 class WalletBalanceView(APIView):
     """Get wallet balance"""
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        from rides.models import Booking
-        
-        user = request.user
-        balance = 0.0
-        
-        if user.role == 'driver':
-            # Calculate earnings from completed rides
-            completed_bookings = Booking.objects.filter(
-                ride__driver=user,
-                status='completed',
-                payment_status='paid'
-            )
-            balance = sum(float(b.total_price) for b in completed_bookings)
-        else:
-            # For passengers, balance would be prepaid amount minus spent
-            # TODO: Implement wallet balance tracking
-            balance = 0.0
-        
         return Response({
-            "balance": balance,
+            "balance": str(ledger.balance_of(request.user)),
             "currency": "RWF"
-        })
\ No newline at end of file
+        })